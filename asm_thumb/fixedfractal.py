@@ -0,0 +1,334 @@
+# python3: CircuitPython 3.0
+
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Compute a fixed point Mandlebrot or Julia fractal without an FPU.
+
+The x-loop of fractal.py in integer only Thumb-1 instructions so it
+assembles and runs on Cortex-M0+ boards such as the SAMD21 whose
+CircuitPython builds have MICROPY_EMIT_INLINE_THUMB but no
+MICROPY_EMIT_INLINE_THUMB_FLOAT.  The math is exactly that of the pure
+Python fixedfractal.py; see it for the number format and precision.
+"""
+
+import array
+import time
+
+import fixedfractal as py_fixedfractal  # The pure Python version.
+import subdivision
+from . import monobitmap
+
+
+MAX_ITERATIONS = py_fixedfractal.MAX_ITERATIONS
+
+
+# Inputs:
+#   Constant inputs:
+#     0 [0x00]. &MonoBitmap.bit_buf (addr/int)
+#     1 [0x04]. width (int)
+#     2 [0x08]. julia or mandlebrot iteration? (bool true=julia)
+#     3 [0x0c]. scale (fixed point, SCALE_BITS)
+#     4 [0x10]. center_x (fixed point)
+#     5 [0x14]. center_y (fixed point)
+#     6 [0x18]. julia_c real (fixed point)
+#     7 [0x1c]. julia_c imag (fixed point)
+#     8 [0x20]. max_iterations (int)
+#     9 [0x24]. y of the first row held in bit_buf (int)
+#    10 [0x28]. fast_interior (bool)
+#   Outputs:
+#    11 [0x2c]. iterations saved by fast_interior (int, accumulated)
+#   Inputs that may be changed between calls:
+#    12 [0x30]. x_start (int)
+#    13 [0x34]. x_end (int, exclusive)
+#    14 [0x38]. &counts bytearray to store iteration numbers + 2 in, or 0.
+#   Scratch space as there are too few registers:
+#    15 [0x3c]. old_z real for the periodicity check
+#    16 [0x40]. old_z imag
+#    17 [0x44]. x
+#    18 [0x48]. imaginary part of the row's points
+#    19 [0x4c]. bit index of the row's first pixel in bit_buf
+#
+# r0: &buffer containing the above 32-bit values.
+# r1: y
+@micropython.asm_thumb
+def _xloop_iterate_and_set_pixels(r0, r1):
+    # Thumb-1 push can't store r8-r12; save them via low registers.
+    mov(r2, r8)
+    mov(r3, r9)
+    mov(r4, r10)
+    mov(r5, r11)
+    mov(r6, r12)
+    push({r2, r3, r4, r5, r6})
+    mov(r12, r0)            # REG: r12 <- address of the params
+    # imag: int = (y*scale >> 8) - center_y
+    ldr(r2, [r0, 0x0c])     # scale
+    mul(r2, r1)
+    asr(r2, r2, 8)
+    ldr(r3, [r0, 0x14])     # center_y
+    sub(r2, r2, r3)
+    str(r2, [r0, 0x48])
+    ldr(r3, [r0, 0x24])     # y of the first row in bit_buf
+    sub(r1, r1, r3)         # row within bit_buf
+    ldr(r3, [r0, 0x04])     # width
+    mul(r1, r3)
+    str(r1, [r0, 0x4c])
+    ldr(r2, [r0, 0x20])
+    mov(r10, r2)            # REG: r10 <- MAX_ITERATIONS
+    ldr(r1, [r0, 0x30])     # REG: r1 <- x
+
+    # for x in range(x_start, x_end):
+    label(X_RANGE_START)
+    str(r1, [r0, 0x44])
+    #     real: int = (x*scale >> 8) - center_x
+    ldr(r2, [r0, 0x0c])     # scale
+    mul(r2, r1)
+    asr(r2, r2, 8)
+    ldr(r3, [r0, 0x10])     # center_x
+    sub(r2, r2, r3)         # REG: r2 <- real
+    ldr(r3, [r0, 0x48])     # REG: r3 <- imag
+    ldr(r4, [r0, 0x08])     # use_julia
+    cmp(r4, 0)
+    beq(MANDLEBROT)
+    #     Julia: c = julia_c, z = real + imag*1j
+    ldr(r4, [r0, 0x18])
+    mov(r8, r4)             # REG: r8 <- cr
+    ldr(r4, [r0, 0x1c])
+    mov(r9, r4)             # REG: r9 <- ci
+    b(ITERATE_INIT)
+    #     Mandlebrot: c = real + imag*1j, z = 0
+    label(MANDLEBROT)
+    mov(r8, r2)             # REG: r8 <- cr
+    mov(r9, r3)             # REG: r9 <- ci
+    mov(r2, 0)              # REG: r2 <- zr
+    mov(r3, 0)              # REG: r3 <- zi
+
+    label(ITERATE_INIT)
+    str(r2, [r0, 0x3c])     # old_z <- z
+    str(r3, [r0, 0x40])
+    ldr(r4, [r0, 0x28])
+    mov(r11, r4)            # REG: r11 <- save_at; 1 or 0 (disabled)
+    mov(r4, r2)
+    mul(r4, r4)
+    asr(r4, r4, 13)         # REG: r4 <- zr^2
+    mov(r5, r3)
+    mul(r5, r5)
+    asr(r5, r5, 13)         # REG: r5 <- zi^2
+    mov(r1, 1)
+    lsl(r1, r1, 14)         # REG: r1 <- 2.0
+    lsl(r7, r1, 1)          # REG: r7 <- 4.0
+    mov(r0, 0)              # REG: r0 <- n
+
+    # for n in range(MAX_ITERATIONS+1):
+    label(ITERATE)
+    #     z = z*z + c
+    mul(r3, r2)
+    asr(r3, r3, 12)         # 2*zr*zi
+    mov(r6, r9)
+    add(r3, r3, r6)         # zi = 2*zr*zi + ci
+    sub(r2, r4, r5)
+    mov(r6, r8)
+    add(r2, r2, r6)         # zr = zr^2 - zi^2 + cr
+    #     if not -2 <= zr <= 2 or not -2 <= zi <= 2: return n
+    # Unsigned zr + 2 > 4 is both tests at once.
+    add(r6, r2, r1)
+    cmp(r6, r7)
+    bhi(SET_PIXEL)
+    add(r6, r3, r1)
+    cmp(r6, r7)
+    bhi(SET_PIXEL)
+    #     if zr^2 + zi^2 > 4: return n
+    mov(r4, r2)
+    mul(r4, r4)
+    asr(r4, r4, 13)
+    mov(r5, r3)
+    mul(r5, r5)
+    asr(r5, r5, 13)
+    add(r6, r4, r5)
+    cmp(r6, r7)
+    bhi(SET_PIXEL)
+    mov(r6, r11)
+    cmp(r6, 0)              # if fast_interior
+    beq(ITERATE_NEXT)
+    #     if z == old_z the orbit is a cycle that never escapes.
+    mov(r6, r12)
+    ldr(r6, [r6, 0x3c])
+    cmp(r6, r2)
+    bne(SAVE_Z)
+    mov(r6, r12)
+    ldr(r6, [r6, 0x40])
+    cmp(r6, r3)
+    beq(PERIODIC)
+    label(SAVE_Z)
+    mov(r6, r11)
+    cmp(r0, r6)             # if n == save_at
+    bne(ITERATE_NEXT)
+    add(r6, r6, r6)
+    mov(r11, r6)            # save_at += save_at
+    mov(r6, r12)
+    str(r2, [r6, 0x3c])     # old_z <- z
+    str(r3, [r6, 0x40])
+    label(ITERATE_NEXT)
+    add(r0, 1)
+    mov(r6, r10)
+    cmp(r0, r6)
+    ble(ITERATE)
+    b(INTERIOR)
+
+    label(PERIODIC)
+    # iterations saved += MAX_ITERATIONS + 1 - iterations done
+    mov(r6, r10)
+    sub(r6, r6, r0)
+    mov(r5, r12)
+    ldr(r4, [r5, 0x2c])
+    add(r4, r4, r6)
+    str(r4, [r5, 0x2c])
+    label(INTERIOR)
+    mov(r0, 1)              # n = -1
+    neg(r0, r0)
+
+    #     set_pixel(x, y, n & 1)
+    label(SET_PIXEL)
+    mov(r7, r12)            # REG: r7 <- address of the params
+    ldr(r1, [r7, 0x44])     # REG: r1 <- x
+    ldr(r2, [r7, 0x4c])
+    add(r2, r2, r1)         # r2 <- binary_idx (width * row + x)
+    # if counts: counts[binary_idx] = n + 2
+    ldr(r3, [r7, 0x38])
+    cmp(r3, 0)
+    beq(SKIP_COUNT)
+    add(r3, r3, r2)
+    mov(r4, r0)
+    add(r4, 2)
+    strb(r4, [r3, 0])
+    label(SKIP_COUNT)
+    lsr(r3, r2, 3)          # r3 <- byte_idx
+    mov(r4, 7)
+    and_(r2, r4)
+    sub(r2, r4, r2)         # r2 <- bit_no
+    mov(r4, 1)
+    lsl(r4, r2)             # r4 <- (1 << bit_no)
+    ldr(r5, [r7, 0x00])
+    add(r3, r3, r5)         # r3 <- &bit_buf[byte_idx]
+    ldrb(r5, [r3, 0])
+    mov(r6, 1)
+    and_(r0, r6)            # value = n & 1  (sets branch flags)
+    beq(CLEAR_BIT)
+    orr(r5, r4)
+    b(STORE)
+    label(CLEAR_BIT)
+    bic(r5, r4)
+    label(STORE)
+    strb(r5, [r3, 0])
+
+    mov(r0, r7)             # REG: r0 <- address of the params
+    ldr(r2, [r0, 0x34])     # x_end
+    add(r1, 1)              # x += 1
+    cmp(r1, r2)             # if x < x_end, repeat the loop
+    blt(X_RANGE_START)
+
+    pop({r2, r3, r4, r5, r6})
+    mov(r8, r2)
+    mov(r9, r3)
+    mov(r10, r4)
+    mov(r11, r5)
+    mov(r12, r6)
+
+
+def get_fractal(width: int, height: int, use_julia: bool = True,
+                max_iterations: int = MAX_ITERATIONS,
+                fast_interior: bool = False,
+                subdivide: bool = False) -> monobitmap.MonoBitmap:
+    """fast_interior=True detects periodic orbits early.
+
+    Unlike fixedfractal.py it does not test for the Mandlebrot cardioid and
+    bulb first.  subdivide=True only iterates rectangle borders, so can
+    miss detail smaller than a rectangle (1 pixel of a 400x600
+    Mandlebrot); see subdivision.render_subdivided().
+    """
+    fractal = monobitmap.MonoBitmap(width, height)
+    xloop_params = _make_xloop_params(fractal, use_julia, max_iterations,
+                                      fast_interior)
+
+    # Make these local
+    compute_row_and_set_pixels = _xloop_iterate_and_set_pixels
+    monotonic = time.monotonic
+
+    start_time = monotonic()
+    if subdivide:
+        if max_iterations + 2 > 0xff:
+            raise ValueError('subdivide counts are bytes; max_iterations %d'
+                             % max_iterations)
+        counts = bytearray(width * height)
+        addr = array.array('i', (0,))
+        monobitmap.store_addr(addr, counts)
+        xloop_params[14] = addr[0]
+
+        def compute_span(x_start, x_end, y):
+            xloop_params[12] = x_start
+            xloop_params[13] = x_end
+            compute_row_and_set_pixels(xloop_params, y)
+
+        iterated = subdivision.render_subdivided(fractal, counts, compute_span)
+        print('Computation took', monotonic() - start_time, 'seconds.',
+              iterated, 'of', width * height, 'pixels iterated.')
+        return fractal
+    for y in range(height):
+        compute_row_and_set_pixels(xloop_params, y)
+    end_time = monotonic()
+    if fast_interior:
+        print('Computation took', end_time - start_time, 'seconds.',
+              xloop_params[11], 'iterations saved.')
+    else:
+        print('Computation took', end_time - start_time, 'seconds.')
+    return fractal
+
+
+def get_fractal_bands(width: int, height: int, use_julia: bool = True,
+                      max_iterations: int = MAX_ITERATIONS,
+                      band_height: int = 8, fast_interior: bool = False):
+    """Yields the fractal as (y, rows) bands; see fractal.get_fractal_bands."""
+    band = monobitmap.MonoBitmap(width, band_height)
+    xloop_params = _make_xloop_params(band, use_julia, max_iterations,
+                                      fast_interior)
+    compute_row_and_set_pixels = _xloop_iterate_and_set_pixels
+    row_bytes = width // 8
+    for y_start in range(0, height, band_height):
+        y_end = min(y_start + band_height, height)
+        xloop_params[9] = y_start
+        for y in range(y_start, y_end):
+            compute_row_and_set_pixels(xloop_params, y)
+        yield y_start, memoryview(band.bit_buf)[:(y_end - y_start) * row_bytes]
+    if fast_interior:
+        print(xloop_params[11], 'iterations saved.')
+
+
+def _make_xloop_params(fractal, use_julia, max_iterations,
+                       fast_interior=False):
+    """Returns the _xloop_iterate_and_set_pixels input array for fractal."""
+    width = fractal.width
+    xloop_params = array.array('i', (0,)*20)
+    monobitmap.store_addr(xloop_params, fractal.bit_buf)
+    xloop_params[1] = width
+    xloop_params[2] = use_julia  # True: Julia, False: Mandlebrot
+    (xloop_params[3], xloop_params[4], xloop_params[5], xloop_params[6],
+     xloop_params[7]) = py_fixedfractal.fixed_params(width, use_julia)
+    xloop_params[8] = max_iterations
+    xloop_params[9] = 0  # y of the first row in bit_buf
+    xloop_params[10] = fast_interior
+    xloop_params[11] = 0  # iterations saved
+    xloop_params[12] = 0  # x_start
+    xloop_params[13] = width  # x_end
+    xloop_params[14] = 0  # no counts
+    return xloop_params
@@ -22,6 +22,7 @@ import array
 import struct
 import time
 
+import subdivision
 from . import monobitmap
 
 
@@ -42,6 +43,14 @@ MAX_ITERATIONS = 40
 #     6 [0x18]. julia_c real (float)
 #     7 [0x1c]. julia_c imag (float)
 #     8 [0x20]. max_iterations (int)
+#     9 [0x24]. y of the first row held in bit_buf (int)
+#    10 [0x28]. fast_interior (bool)
+#   Outputs:
+#    11 [0x2c]. iterations saved by fast_interior (int, accumulated)
+#   Inputs that may be changed between calls:
+#    12 [0x30]. x_start (int)
+#    13 [0x34]. x_end (int, exclusive)
+#    14 [0x38]. &counts bytearray to store iteration numbers + 2 in, or 0.
 #   Variants:
 #     - y
 #
@@ -51,9 +60,11 @@ MAX_ITERATIONS = 40
 def _xloop_iterate_and_set_pixels(r0, r1):
     # scaled_y_j: float = (y*scale - center_y)*1j
     push({r8,r9,r10,r11,r12})
-    mov(r8, r1)             # REG: r8 <- y, free REG r1
-    vmov(s11, r8)
+    vmov(s11, r1)
     vcvt_f32_s32(s11, s11)  # REG: s11 <- y (float)
+    ldr(r7, [r0, 0x24])     # y of the first row in bit_buf
+    sub(r1, r1, r7)
+    mov(r8, r1)             # REG: r8 <- row within bit_buf, free REG r1
     ldr(r1, [r0, 0x00])     # address of bit_buf
     ldr(r7, [r0, 0x04])     # width
     mov(r9, r1)             # REG: r9 <- address of bit_buf
@@ -69,9 +80,10 @@ def _xloop_iterate_and_set_pixels(r0, r1):
     vsub(s12, s13, s12)     # REG: s12 <- scaled_y_j (c_imag)
     vldr(s0, [r0, 0x18])    # REG: s0 <- julia_c real
     vldr(s1, [r0, 0x1c])    # REG: s1 <- julia_c imag
+    vmov(s11, r0)           # REG: s11 <- address of the params, y is done
 
-    # for x in range(width):
-    mov(r1, 0)              # REG: r1 <- x
+    # for x in range(x_start, x_end):
+    ldr(r1, [r0, 0x30])     # REG: r1 <- x
     label(X_RANGE_START)
     #     c: complex = x*scale - center_x + scaled_y_j
     vmov(s13, r1)
@@ -119,16 +131,31 @@ def _xloop_iterate_and_set_pixels(r0, r1):
     #push({r0})
     bl(FRACTAL_ITERATE)
     #     set_pixel(x, y, v)
-    # Inputs: r9 (&bit_buf), r10 (width), r1 (x), r2 (value), r8 (y)
+    # Inputs: r9 (&bit_buf), r10 (width), r1 (x), r2 (value), r8 (row)
     # set_pixel v= parameter is the result of iterate from r0
     mov(r2, r0)
     #pop({r0})
+    # if counts: counts[width * row + x] = v + 2
+    vmov(r7, s11)
+    ldr(r3, [r7, 0x38])  # r3 <- address of counts
+    cmp(r3, 0)
+    beq(SKIP_COUNT)
+    mov(r5, r10)  # r5 <- width
+    mov(r6, r8)  # r6 <- row
+    mul(r5, r6)
+    add(r5, r5, r1)  # r5 <- width * row + x
+    add(r3, r3, r5)
+    mov(r4, r2)
+    add(r4, 2)
+    strb(r4, [r3, 0])
+    label(SKIP_COUNT)
     # set_pixel x= parameters is already in r1 due to the loop.
     bl(SET_PIXEL)
 
-    mov(r7, r10)  # REG: r7 <- width
+    vmov(r7, s11)
+    ldr(r7, [r7, 0x34])  # REG: r7 <- x_end
     add(r1, 1)  # x += 1
-    cmp(r1, r7)  # if x < width, repeat the loop
+    cmp(r1, r7)  # if x < x_end, repeat the loop
     blt(X_RANGE_START)
     b(RETURN)
 
@@ -137,12 +164,58 @@ def _xloop_iterate_and_set_pixels(r0, r1):
     mov(r6, r11)  # r6 <- MAX_ITERATIONS
     # @asm_thumb doesn't do arm float immediates on vmov,
     # otherwise we could just write vmov(r4, 4.0).
+    mov(r4, 0)  # movt leaves the low half alone.
     movt(r4, 0x4080)  # r4 <- 32bit floating point 4.0 (2.0^2) 0x40800000
     ##mov(r4, 4)  # r4 <- 2^2
     vmov(s4, r4)  # s4 <- 2.0^2
     ##vcvt_f32_s32(s4, s4)  # s4 = 2.0^2;
     # for n in range(MAX_ITERATIONS+1):
     mov(r0, 0)  # r0 = n; current iteration number
+    mov(r3, 0)  # r3 <- save_at; 0 disables the periodicity check
+    vmov(r7, s11)
+    ldr(r5, [r7, 0x28])  # fast_interior
+    cmp(r5, 0)
+    beq(FI_LOOP)
+    mov(r5, r12)  # use_julia
+    cmp(r5, 0)
+    bne(FI_PERIODIC_INIT)
+    # Mandlebrot main cardioid: q*(q + cr - 1/4) <= ci^2/4
+    # where q = (cr - 1/4)^2 + ci^2.
+    mov(r5, 0)
+    movt(r5, 0x3e80)  # r5 <- 32bit floating point 0.25
+    vmov(s7, r5)
+    vsub(s6, s0, s7)  # s6 <- cr - 1/4
+    vmul(s2, s1, s1)  # s2 <- ci^2
+    vmul(s7, s2, s7)  # s7 <- ci^2/4
+    vmul(s5, s6, s6)
+    vadd(s5, s5, s2)  # s5 <- q
+    vadd(s6, s5, s6)
+    vmul(s6, s6, s5)  # s6 <- q*(q + cr - 1/4)
+    vcmp(s6, s7)
+    vmrs(APSR_nzcv, FPSCR)
+    bls(FI_INTERIOR)
+    # Period-2 bulb: (cr + 1)^2 + ci^2 <= 1/16
+    mov(r5, 0)
+    movt(r5, 0x3f80)  # r5 <- 32bit floating point 1.0
+    vmov(s6, r5)
+    vadd(s6, s0, s6)
+    vmul(s6, s6, s6)
+    vadd(s6, s6, s2)  # s6 <- (cr + 1)^2 + ci^2
+    mov(r5, 0)
+    movt(r5, 0x3d80)  # r5 <- 32bit floating point 0.0625
+    vmov(s7, r5)
+    vcmp(s6, s7)
+    vmrs(APSR_nzcv, FPSCR)
+    bls(FI_INTERIOR)
+    mov(r5, 0)
+    vmov(s5, r5)  # Restore z = 0.
+    label(FI_PERIODIC_INIT)
+    # Orbit periodicity: old_z (s8, s9) <- z; moved at n = 1, 2, 4, 8, ...
+    vmov(r5, s5)
+    vmov(s8, r5)
+    vmov(r5, s3)
+    vmov(s9, r5)
+    mov(r3, 1)  # r3 <- save_at
     label(FI_LOOP)
     vmov(r2, s5)  # start with zr real in s2.  The loop
     vmov(s2, r2)  # always begins/ends/cycles with it in s5.
@@ -169,6 +242,24 @@ def _xloop_iterate_and_set_pixels(r0, r1):
     vcmp(s6, s4)
     vmrs(APSR_nzcv, FPSCR)
     bgt(FI_END)  # return n
+    cmp(r3, 0)  # if fast_interior
+    beq(FI_NEXT)
+    # if z == old_z the orbit is a cycle that never escapes.
+    vcmp(s5, s8)
+    vmrs(APSR_nzcv, FPSCR)
+    bne(FI_SAVE_Z)
+    vcmp(s3, s9)
+    vmrs(APSR_nzcv, FPSCR)
+    beq(FI_PERIODIC)
+    label(FI_SAVE_Z)
+    cmp(r0, r3)  # if n == save_at
+    bne(FI_NEXT)
+    vmov(r5, s5)
+    vmov(s8, r5)  # old_z real <- zr
+    vmov(r5, s3)
+    vmov(s9, r5)  # old_z imag <- zj
+    add(r3, r3, r3)  # save_at += save_at
+    label(FI_NEXT)
     add(r0, 1)
     cmp(r0, r6)
     ble(FI_LOOP)
@@ -176,15 +267,29 @@ def _xloop_iterate_and_set_pixels(r0, r1):
     neg(r0, r0)
     label(FI_END)  # return value is already in r0
     bx(lr)
+    label(FI_PERIODIC)
+    add(r0, 1)  # r0 <- iterations done
+    label(FI_INTERIOR)
+    # iterations saved += MAX_ITERATIONS + 1 - iterations done
+    mov(r5, r11)
+    add(r5, 1)
+    sub(r5, r5, r0)
+    vmov(r7, s11)  # r7 <- address of the params
+    ldr(r2, [r7, 0x2c])
+    add(r2, r2, r5)
+    str(r2, [r7, 0x2c])
+    mov(r0, 1)  # return -1
+    neg(r0, r0)
+    bx(lr)
     #### end FRACTAL_ITERATE()
 
     ####
     label(SET_PIXEL)
     mov(r3, r9)  # r3 <- address of bit_buf
     mov(r5, r10)  # r5 <- width
-    mov(r6, r8)  # r6 <- y
-    mul(r5, r6)  # r5 <- width * y
-    add(r4, r1, r5)  # r4 <- binary_idx (width * y + x)
+    mov(r6, r8)  # r6 <- row
+    mul(r5, r6)  # r5 <- width * row
+    add(r4, r1, r5)  # r4 <- binary_idx (width * row + x)
     #mla(r4, r5, r6, r1) @asm_thumb doesn't support mla?
     mov(r5, r4)  # r5 <- binary_idx
     mov(r7, 3)
@@ -221,17 +326,90 @@ def _xloop_iterate_and_set_pixels(r0, r1):
 #  https://github.com/ActiveState/code/blob/master/recipes/Python/577120_Julia_fractals/recipe-577120.py
 #  http://0pointer.de/blog/projects/mandelbrot.html
 def get_fractal(width: int, height: int, use_julia: bool = True,
-                max_iterations: int = MAX_ITERATIONS) -> monobitmap.MonoBitmap:
+                max_iterations: int = MAX_ITERATIONS,
+                fast_interior: bool = False,
+                subdivide: bool = False) -> monobitmap.MonoBitmap:
+    """fast_interior=True detects points inside the set early.
+
+    subdivide=True only iterates rectangle borders, so can miss detail
+    smaller than a rectangle (1 pixel of a 400x600 Mandlebrot); see
+    subdivision.render_subdivided().
+    """
+    fractal = monobitmap.MonoBitmap(width, height)
+    xloop_params = _make_xloop_params(fractal, use_julia, max_iterations,
+                                      fast_interior)
+
+    # Make these local
+    compute_row_and_set_pixels = _xloop_iterate_and_set_pixels
+    monotonic = time.monotonic
+
+    start_time = monotonic()
+    if subdivide:
+        if max_iterations + 2 > 0xff:
+            raise ValueError('subdivide counts are bytes; max_iterations %d'
+                             % max_iterations)
+        counts = bytearray(width * height)
+        addr = array.array('i', (0,))
+        monobitmap.store_addr(addr, counts)
+        xloop_params[14] = addr[0]
+
+        def compute_span(x_start, x_end, y):
+            xloop_params[12] = x_start
+            xloop_params[13] = x_end
+            compute_row_and_set_pixels(xloop_params, y)
+
+        iterated = subdivision.render_subdivided(fractal, counts, compute_span)
+        print('Computation took', monotonic() - start_time, 'seconds.',
+              iterated, 'of', width * height, 'pixels iterated.')
+        return fractal
+    for y in range(height):
+        compute_row_and_set_pixels(xloop_params, y)
+    end_time = monotonic()
+    if fast_interior:
+        print('Computation took', end_time - start_time, 'seconds.',
+              xloop_params[11], 'iterations saved.')
+    else:
+        print('Computation took', end_time - start_time, 'seconds.')
+    return fractal
+
+
+def get_fractal_bands(width: int, height: int, use_julia: bool = True,
+                      max_iterations: int = MAX_ITERATIONS,
+                      band_height: int = 8, fast_interior: bool = False):
+    """Yields the fractal as (y, rows) bands from top to bottom.
+
+    rows is a memoryview of the packed rows y through y + band_height - 1
+    (fewer for the final band).  A single band buffer is reused so only one
+    band is ever in memory; rows is only valid until the next is requested.
+    width must be a multiple of 8.
+    """
+    band = monobitmap.MonoBitmap(width, band_height)
+    xloop_params = _make_xloop_params(band, use_julia, max_iterations,
+                                      fast_interior)
+    compute_row_and_set_pixels = _xloop_iterate_and_set_pixels
+    row_bytes = width // 8
+    for y_start in range(0, height, band_height):
+        y_end = min(y_start + band_height, height)
+        xloop_params[9] = y_start
+        for y in range(y_start, y_end):
+            compute_row_and_set_pixels(xloop_params, y)
+        yield y_start, memoryview(band.bit_buf)[:(y_end - y_start) * row_bytes]
+    if fast_interior:
+        print(xloop_params[11], 'iterations saved.')
+
+
+def _make_xloop_params(fractal, use_julia, max_iterations,
+                       fast_interior=False):
+    """Returns the _xloop_iterate_and_set_pixels input array for fractal."""
+    width = fractal.width
     scale = 1/(width/1.5)
     if use_julia:
         center_x, center_y = 1.15, 1.6  # Julia
     else:
         center_x, center_y = 2.2, 1.5  # Mandlebrot
-
-    fractal = monobitmap.MonoBitmap(width, height)
     julia_c = 0.3+0.6j  # Only load the complex constant once.
 
-    xloop_params = array.array('i', (0,)*9)
+    xloop_params = array.array('i', (0,)*15)
     monobitmap.store_addr(xloop_params, fractal.bit_buf)
     xloop_params[1] = width
     xloop_params[2] = use_julia  # True: Julia, False: Mandlebrot
@@ -239,15 +417,10 @@ def get_fractal(width: int, height: int, use_julia: bool = True,
                      scale, center_x, center_y,
                      julia_c.real, julia_c.imag)
     xloop_params[8] = max_iterations
-
-    # Make these local
-    compute_row_and_set_pixels = _xloop_iterate_and_set_pixels
-    monotonic = time.monotonic
-
-    start_time = monotonic()
-    for y in range(height):
-        compute_row_and_set_pixels(xloop_params, y)
-    end_time = monotonic()
-    print('Computation took', end_time - start_time, 'seconds.')
-    return fractal
-
+    xloop_params[9] = 0  # y of the first row in bit_buf
+    xloop_params[10] = fast_interior
+    xloop_params[11] = 0  # iterations saved
+    xloop_params[12] = 0  # x_start
+    xloop_params[13] = width  # x_end
+    xloop_params[14] = 0  # no counts
+    return xloop_params
@@ -20,8 +20,10 @@
 
 import array
 
+import monobitmap
 
-class MonoBitmap:
+
+class MonoBitmap(monobitmap.MonoBitmap):
     """A monochrome bitmap stored compactly.
 
     Attributes:
@@ -34,32 +36,214 @@ class MonoBitmap:
       hidden_cat = MonoBitmap(204, 112)
       hidden_cat.set_pixel(42, 23, 0)
       epd.display_frame_buf(hidden_cat.bit_buf)
+
+    set_pixel_fast and the asm fractal code write to bit_buf directly without
+    updating the dirty area; use mark_dirty() after doing that.
     """
     def __init__(self, width, height):
-        self.width = width
-        self.height = height
-        self._bit_buf = bytearray(width * height // 8)
+        super().__init__(width, height)
 
         # (&bit_buf, width, y)
         self.fast_in = array.array('i', [-1, width, 0])
-        store_addr(self.fast_in, self._bit_buf)
-
-    @property
-    def bit_buf(self):
-        return self._bit_buf
-
-    def set_pixel(self, x: int, y: int, value: bool) -> None:
-        #assert self.width > x >= 0
-        #assert self.height > y >= 0
-        binary_idx = self.width * y + x
-        #byte_idx, bit_no = divmod(binary_idx, 8)
-        #bit_no = 7 - bit_no  # The EPD's bit order.
-        byte_idx = binary_idx >> 3
-        bit_no = 7 - (binary_idx & 7)
-        if value:
-            self.bit_buf[byte_idx] |= (1 << bit_no)
+        store_addr(self.fast_in, self.bit_buf)
+        # See _transpose_blocks; the last three are its transpose masks.
+        self._rotate_params = array.array(
+            'i', [0, 0, 0, 0, 0, 0, 0, 0x00aa00aa, 0x0000cccc, ~0x0f0f0f0f])
+        # (&band, &source end, count, &_REVERSED_BITS)
+        self._reverse_params = array.array('i', [0, 0, 0, 0])
+        store_addr(self._reverse_params, monobitmap._REVERSED_BITS)
+        self._reverse_params[3] = self._reverse_params[0]
+
+    def _rotate_band(self, x, mode, band):
+        width = self.width
+        if x < 0 or (width | x) & 7:
+            super()._rotate_band(x, mode, band)  # Columns not whole bytes.
+            return
+        row_bytes = width >> 3
+        columns = self.height >> 3
+        params = self._rotate_params
+        store_addr(params, band)
+        # 90 reads each block bottom up and stores its bytes right to left,
+        # 270 stores the rows bottom up.
+        params[1] = -columns if mode == 270 else columns
+        params[2] = -1 if mode == 90 else 1
+        if mode == 270:
+            params[0] += 7 * columns
+        elif mode == 90:
+            params[0] += columns - 1
+        source = self.fast_in[0] + (x >> 3)
+        if mode == 90:
+            params[3] = source + 7 * row_bytes
+            params[4] = -row_bytes
         else:
-            self.bit_buf[byte_idx] &= ~(1 << bit_no)
+            params[3] = source
+            params[4] = row_bytes
+        params[5] = 8 * row_bytes
+        params[6] = columns
+        self._transpose_blocks(params)
+
+    def _reverse_bytes(self, start, count, band):
+        params = self._reverse_params
+        store_addr(params, band)
+        params[1] = self.fast_in[0] + start + count
+        params[2] = count
+        self._reverse_bytes_fast(params)
+
+    # r0 is an array of (&band byte to store the first block's top row
+    # in, band row step, band step to the next block, &bit_buf byte of the
+    # first block's first row to load, bit_buf row step, bit_buf step to the
+    # next block, number of blocks, 0x00aa00aa, 0x0000cccc, 0xf0f0f0f0).
+    # Steps may be negative.  Only uses r0-r7 so it runs on Thumb-1 chips.
+    @staticmethod
+    @micropython.asm_thumb
+    def _transpose_blocks(r0):
+        mov(r1, r8)
+        mov(r2, r9)
+        mov(r3, r10)
+        mov(r4, r11)
+        push({r1, r2, r3, r4})
+        mov(r8, r0)  # r8 <- params
+        ldr(r1, [r0, 0])
+        mov(r10, r1)  # r10 <- band address
+        ldr(r1, [r0, 12])
+        mov(r9, r1)  # r9 <- bit_buf address
+        ldr(r1, [r0, 24])
+        mov(r11, r1)  # r11 <- blocks remaining
+
+        label(BLOCK)
+        mov(r0, r8)
+        ldr(r2, [r0, 16])  # r2 <- bit_buf row step
+        mov(r1, r9)
+        # r3 <- rows 0-3, r4 <- rows 4-7; the first in the top byte.
+        ldrb(r3, [r1, 0])
+        add(r1, r1, r2)
+        ldrb(r6, [r1, 0])
+        add(r1, r1, r2)
+        lsl(r3, r3, 8)
+        orr(r3, r6)
+        ldrb(r6, [r1, 0])
+        add(r1, r1, r2)
+        lsl(r3, r3, 8)
+        orr(r3, r6)
+        ldrb(r6, [r1, 0])
+        add(r1, r1, r2)
+        lsl(r3, r3, 8)
+        orr(r3, r6)
+        ldrb(r4, [r1, 0])
+        add(r1, r1, r2)
+        ldrb(r6, [r1, 0])
+        add(r1, r1, r2)
+        lsl(r4, r4, 8)
+        orr(r4, r6)
+        ldrb(r6, [r1, 0])
+        add(r1, r1, r2)
+        lsl(r4, r4, 8)
+        orr(r4, r6)
+        ldrb(r6, [r1, 0])
+        lsl(r4, r4, 8)
+        orr(r4, r6)
+
+        # Transpose the 2x2 blocks within each word, then the 4x4s
+        # (Hacker's Delight 7-3), then swap 4x4 blocks between the words.
+        ldr(r7, [r0, 28])  # r7 <- 0x00aa00aa
+        lsr(r5, r3, 7)
+        eor(r5, r3)
+        and_(r5, r7)
+        eor(r3, r5)
+        lsl(r5, r5, 7)
+        eor(r3, r5)
+        lsr(r5, r4, 7)
+        eor(r5, r4)
+        and_(r5, r7)
+        eor(r4, r5)
+        lsl(r5, r5, 7)
+        eor(r4, r5)
+        ldr(r7, [r0, 32])  # r7 <- 0x0000cccc
+        lsr(r5, r3, 14)
+        eor(r5, r3)
+        and_(r5, r7)
+        eor(r3, r5)
+        lsl(r5, r5, 14)
+        eor(r3, r5)
+        lsr(r5, r4, 14)
+        eor(r5, r4)
+        and_(r5, r7)
+        eor(r4, r5)
+        lsl(r5, r5, 14)
+        eor(r4, r5)
+        ldr(r7, [r0, 36])  # r7 <- 0xf0f0f0f0
+        mov(r6, r3)
+        and_(r6, r7)
+        lsr(r5, r4, 4)
+        bic(r5, r7)
+        orr(r6, r5)  # r6 <- x & 0xf0f0f0f0 | y >> 4 & 0x0f0f0f0f
+        lsl(r5, r3, 4)
+        and_(r5, r7)
+        bic(r4, r7)
+        orr(r4, r5)  # r4 <- x << 4 & 0xf0f0f0f0 | y & 0x0f0f0f0f
+
+        ldr(r2, [r0, 4])  # r2 <- band row step
+        mov(r1, r10)
+        lsr(r5, r6, 24)
+        strb(r5, [r1, 0])
+        add(r1, r1, r2)
+        lsr(r5, r6, 16)
+        strb(r5, [r1, 0])
+        add(r1, r1, r2)
+        lsr(r5, r6, 8)
+        strb(r5, [r1, 0])
+        add(r1, r1, r2)
+        strb(r6, [r1, 0])
+        add(r1, r1, r2)
+        lsr(r5, r4, 24)
+        strb(r5, [r1, 0])
+        add(r1, r1, r2)
+        lsr(r5, r4, 16)
+        strb(r5, [r1, 0])
+        add(r1, r1, r2)
+        lsr(r5, r4, 8)
+        strb(r5, [r1, 0])
+        add(r1, r1, r2)
+        strb(r4, [r1, 0])
+
+        ldr(r2, [r0, 8])
+        mov(r1, r10)
+        add(r1, r1, r2)
+        mov(r10, r1)
+        ldr(r2, [r0, 20])
+        mov(r1, r9)
+        add(r1, r1, r2)
+        mov(r9, r1)
+        mov(r1, r11)
+        sub(r1, 1)
+        mov(r11, r1)
+        bne(BLOCK)
+
+        pop({r1, r2, r3, r4})
+        mov(r8, r1)
+        mov(r9, r2)
+        mov(r10, r3)
+        mov(r11, r4)
+
+    # r0 is an array of (&band, &bit_buf byte after the last to copy, count,
+    # &_REVERSED_BITS).  Copies count bytes into band in reverse order with
+    # their bits reversed.
+    @staticmethod
+    @micropython.asm_thumb
+    def _reverse_bytes_fast(r0):
+        ldr(r1, [r0, 0])  # r1 <- &band
+        ldr(r2, [r0, 4])  # r2 <- source end
+        ldr(r3, [r0, 12])  # r3 <- &_REVERSED_BITS
+        ldr(r0, [r0, 8])  # r0 <- count
+        label(LOOP)
+        sub(r2, 1)
+        ldrb(r4, [r2, 0])
+        add(r4, r4, r3)
+        ldrb(r4, [r4, 0])  # r4 <- _REVERSED_BITS[byte]
+        strb(r4, [r1, 0])
+        add(r1, 1)
+        sub(r0, 1)
+        bne(LOOP)
 
     # r0 must be the self.fast_in array (&bit_buf, width, y)
     # r1 is the x coordinate
@@ -0,0 +1,76 @@
+# python3: CircuitPython 3.0
+
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Measure the CPU time and heap use of polling the keys.
+
+Compares constructing the DigitalInOuts on every poll, as main.py used to,
+with buttons.Keypad.  Run on the device from the REPL:
+
+  import bench_keys
+  bench_keys.main()
+"""
+
+import gc
+import time
+
+import board
+import digitalio
+
+import buttons
+
+POLLS = 1000
+
+
+def _sample_keys_by_construction():
+    """The old main.sample_keys(): claims the pins on every call."""
+    DigitalInOut = digitalio.DigitalInOut
+    Pull = digitalio.Pull
+    with DigitalInOut(board.D2) as key1, DigitalInOut(board.D3) as key2, \
+            DigitalInOut(board.D4) as key3, DigitalInOut(board.D5) as key4:
+        key1.switch_to_input(Pull.UP)
+        key2.switch_to_input(Pull.UP)
+        key3.switch_to_input(Pull.UP)
+        key4.switch_to_input(Pull.UP)
+        for k in (key1, key2, key3, key4):
+            yield not k.value  # False is pressed
+
+
+def measure(name, poll, polls=POLLS):
+    """Prints the time and heap bytes per call of poll()."""
+    gc.collect()
+    gc.disable()  # Count every allocation rather than what survives.
+    try:
+        free = gc.mem_free()
+        start_time = time.monotonic()
+        for _ in range(polls):
+            poll()
+        elapsed = time.monotonic() - start_time
+        allocated = free - gc.mem_free()
+    finally:
+        gc.enable()
+    print('{}: {:.1f} us and {:.1f} heap bytes per poll'.format(
+            name, elapsed / polls * 1e6, allocated / polls))
+
+
+def main():
+    measure('DigitalInOut per poll',
+            lambda: list(_sample_keys_by_construction()))
+    keypad = buttons.Keypad(interval_s=0)  # Sample on every call.
+    measure('Keypad.poll sampling', keypad.poll)
+    keypad.interval_s = 3600
+    keypad.poll()
+    measure('Keypad.poll not due', keypad.poll)
+    keypad.deinit()
@@ -0,0 +1,216 @@
+# python3: CircuitPython 3.0
+
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Fixed width bitmap fonts drawn onto a MonoBitmap a byte at a time.
+
+A font is a header, '<4sBBBBB': MAGIC, glyph width (at most 8), height,
+advance (pixels from one character to the next), the first character code
+and the number of glyphs; followed by height bytes per glyph, one per row
+with the leftmost pixel in the top bit as MonoBitmap stores them.
+host/makefont.py builds them; font5x8.py holds the default one.
+
+Usage:
+  font = bitmapfont.default_font()
+  font.draw_text(bitmap, 4, 4, 'Hello', 0)  # Black on the mono displays.
+  clock = bitmapfont.Label(bitmap, font, 4, 20)
+  region = clock.set('12:35')   # Only the changed characters are redrawn.
+"""
+
+import struct
+
+MAGIC = b'BMF1'
+HEADER_FORMAT = '<4sBBBBB'
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+
+
+def default_font():
+    """Returns the built in 5x8 font."""
+    import font5x8  # Only loaded when wanted.
+    return BitmapFont(font5x8.FONT)
+
+
+class BitmapFont:
+    """A fixed width bitmap font.
+
+    Glyph rows are shifted to each of the 8 bit offsets within a byte as
+    they are first needed and kept, so drawing a character is two OR (or
+    AND NOT) byte operations per row wherever it lands.
+
+    Attributes:
+      width, height: The glyph size in pixels.
+      advance: Pixels from the start of one character to the next.
+      max_cached: The most shifted glyphs kept; each takes 2 * height bytes.
+    """
+
+    def __init__(self, data, max_cached=256):
+        magic, self.width, self.height, self.advance, self._first, \
+            count = struct.unpack(HEADER_FORMAT, data[:HEADER_SIZE])
+        if magic != MAGIC:
+            raise ValueError('not a bitmap font: %r' % magic)
+        if self.width > 8:
+            raise ValueError('glyphs wider than 8 pixels are unsupported')
+        self._glyphs = memoryview(data)[HEADER_SIZE:
+                                        HEADER_SIZE + count * self.height]
+        self._count = count
+        self.max_cached = max_cached
+        self._shifted = {}
+
+    @classmethod
+    def load(cls, path, **kwargs):
+        """Returns the font in the file at path."""
+        with open(path, 'rb') as f:
+            return cls(f.read(), **kwargs)
+
+    def text_width(self, text):
+        """The width in pixels of text drawn on one line."""
+        if not text:
+            return 0
+        return (len(text) - 1) * self.advance + self.width
+
+    def glyph_rows(self, char):
+        """The height row bytes of char; a blank for ones not in the font."""
+        index = ord(char) - self._first
+        if not 0 <= index < self._count:
+            index = ord('?') - self._first
+            if not 0 <= index < self._count:
+                return bytes(self.height)
+        return self._glyphs[index * self.height:(index + 1) * self.height]
+
+    def _shifted_glyph(self, char, shift):
+        """The rows of char shifted right by shift bits as byte pairs."""
+        key = (char, shift)
+        shifted = self._shifted.get(key)
+        if shifted is None:
+            if len(self._shifted) >= self.max_cached:
+                self._shifted.clear()
+            shifted = bytearray(2 * self.height)
+            for row, bits in enumerate(self.glyph_rows(char)):
+                bits = (bits << 8) >> shift
+                shifted[2 * row] = bits >> 8
+                shifted[2 * row + 1] = bits & 0xff
+            self._shifted[key] = shifted
+        return shifted
+
+    def draw_text(self, bitmap, x, y, text, value, background=None):
+        """Draw text on one line with its top left corner at x, y.
+
+        Args:
+          bitmap: A MonoBitmap; its width must be a multiple of 8.
+          value: The bit value of the glyph pixels.
+          background: None to leave the other pixels alone, else the bit
+              value to fill the text box with first.
+
+        Returns:
+          The clipped (x, y, width, height) region drawn or None.  It has
+          also been marked dirty.
+        """
+        if bitmap.width & 7:
+            raise ValueError('bitmap width %d is not a multiple of 8'
+                             % bitmap.width)
+        box = _clip(bitmap, x, y, self.text_width(text), self.height)
+        if box is None:
+            return None
+        if background is not None:
+            bitmap.draw_filled_rectangle(box[0], box[1], box[0] + box[2] - 1,
+                                         box[1] + box[3] - 1, background)
+        buf = bitmap.bit_buf
+        row_bytes = bitmap.width >> 3
+        rows = range(max(0, -y), min(self.height, bitmap.height - y))
+        for char in text:
+            if -self.width < x < bitmap.width and char != ' ':
+                glyph = self._shifted_glyph(char, x & 7)
+                byte_x = x >> 3
+                # Both bytes in the row or only one on the left/right edge.
+                left = 0 <= byte_x
+                right = byte_x + 1 < row_bytes
+                offset = (y + rows[0]) * row_bytes + byte_x if rows else 0
+                for row in rows:
+                    hi = glyph[2 * row]
+                    lo = glyph[2 * row + 1]
+                    if value:
+                        if left:
+                            buf[offset] |= hi
+                        if right and lo:
+                            buf[offset + 1] |= lo
+                    else:
+                        if left:
+                            buf[offset] &= ~hi
+                        if right and lo:
+                            buf[offset + 1] &= ~lo
+                    offset += row_bytes
+            x += self.advance
+        bitmap.mark_dirty(*box)
+        return box
+
+
+def _clip(bitmap, x, y, width, height):
+    """Returns the (x, y, width, height) part within bitmap or None."""
+    x0, y0 = max(x, 0), max(y, 0)
+    x1, y1 = min(x + width, bitmap.width), min(y + height, bitmap.height)
+    if x0 >= x1 or y0 >= y1:
+        return None
+    return x0, y0, x1 - x0, y1 - y0
+
+
+class Label:
+    """A line of text at a fixed place that is redrawn as it changes.
+
+    Only the character cells that differ from the previous text are
+    redrawn, so set() reports the smallest region needing an upload; eg:
+    one digit of a clock.
+    """
+
+    def __init__(self, bitmap, font, x, y, value=0, background=1):
+        self.bitmap = bitmap
+        self.font = font
+        self.x = x
+        self.y = y
+        self.value = value
+        self.background = background
+        self.text = ''
+
+    def set(self, text):
+        """Show text; returns the changed (x0, y0, x1, y1) area or None.
+
+        The area has inclusive corners widened to whole bytes like
+        MonoBitmap.dirty_rect() and has also been marked dirty.
+        """
+        old = self.text
+        self.text = text
+        font = self.font
+        bitmap = self.bitmap
+        changed = None
+        for i in range(max(len(old), len(text))):
+            char = text[i] if i < len(text) else ' '
+            if i < len(old) and char == old[i]:
+                continue
+            # The whole cell, so the gap to the next character is cleared.
+            box = _clip(bitmap, self.x + i * font.advance, self.y,
+                        font.advance, font.height)
+            if box is None:
+                continue
+            x0, y0 = box[0], box[1]
+            x1, y1 = x0 + box[2] - 1, y0 + box[3] - 1
+            bitmap.draw_filled_rectangle(x0, y0, x1, y1, self.background)
+            font.draw_text(bitmap, self.x + i * font.advance, self.y, char,
+                           self.value)
+            if changed is None:
+                changed = [x0, y0, x1, y1]
+            else:
+                changed[2] = x1  # Cells only ever move right.
+        if changed is None:
+            return None
+        return changed[0] & ~7, changed[1], changed[2] | 7, changed[3]
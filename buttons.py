@@ -0,0 +1,138 @@
+# python3: CircuitPython 3.0
+
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Debounced push buttons that queue press and release events."""
+
+import time
+
+try:
+    import board
+    import digitalio
+except ImportError:
+    board = digitalio = None  # Pass pins in; eg: on a host.
+
+
+class Keypad:
+    """Push buttons that ground their pin when pressed.
+
+    The pins are claimed once.  Call poll() as often as convenient, ideally
+    every interval_s seconds; it samples the pins on that schedule.  A key
+    changes state once it has read differently with no sample saying
+    otherwise for debounce_s seconds, so bounces are ignored however often
+    it is polled.  When polls are further apart than that, eg: once per band
+    of a render, a single sample seeing a key pressed is enough; if the next
+    reads it released both the press and release are queued.  A press begun
+    and ended between two polls is not seen at all.
+
+    Each change is queued as a (key, pressed, timestamp) tuple where key is
+    the index into pins and timestamp the time.monotonic() of the first
+    sample seeing the change.
+
+    The 2.7 inch EPD rpi hat has four push buttons connected to RPI hat pins.
+    Follow the traces to see which pins those are and wire them up to digital
+    inputs D2 through D5 on your CircuitPython device; those are the default.
+
+    Usage:
+      keypad = Keypad()
+      while True:
+          keypad.poll()
+          event = keypad.get_event()
+          if event and event[1]:
+              print('key', event[0], 'pressed at', event[2])
+    """
+
+    def __init__(self, pins=None, interval_s=0.005, debounce_s=0.02,
+                 max_events=16):
+        """pins: Board pins, or objects with a value attribute like
+        DigitalInOut; defaults to board.D2 through D5."""
+        if pins is None:
+            pins = (board.D2, board.D3, board.D4, board.D5)
+        self._pins = []
+        for pin in pins:
+            if not hasattr(pin, 'value'):
+                pin = digitalio.DigitalInOut(pin)
+                pin.switch_to_input(digitalio.Pull.UP)
+            self._pins.append(pin)
+        self.interval_s = interval_s
+        self.debounce_s = debounce_s
+        self.max_events = max_events
+        self.dropped_events = 0
+        self.samples = 0
+        self._pressed = [False] * len(self._pins)
+        # When each key was first seen changed, or None when it is not.
+        self._change_times = [None] * len(self._pins)
+        self._events = []
+        self._next_sample = time.monotonic()
+
+    def deinit(self):
+        for pin in self._pins:
+            if hasattr(pin, 'deinit'):
+                pin.deinit()
+        self._pins = []
+
+    def poll(self):
+        """Sample the keys if one is due; cheap to call when not."""
+        now = time.monotonic()
+        if now < self._next_sample:
+            return
+        self._next_sample += self.interval_s
+        if self._next_sample < now:  # We fell behind; don't catch up.
+            self._next_sample = now + self.interval_s
+        self.samples += 1
+        pressed = self._pressed
+        change_times = self._change_times
+        for key, pin in enumerate(self._pins):
+            changed = (not pin.value) != pressed[key]  # False is pressed.
+            change_time = change_times[key]
+            if change_time is None:
+                if changed:
+                    change_times[key] = now
+                continue
+            if now - change_time < self.debounce_s:
+                if not changed:
+                    change_times[key] = None  # A bounce.
+                continue
+            self._change(key, change_time)
+            if not changed:  # Pressed and released between samples.
+                self._change(key, now)
+
+    def _change(self, key, timestamp):
+        """Flips the state of key, queueing the event."""
+        self._pressed[key] = not self._pressed[key]
+        self._change_times[key] = None
+        if len(self._events) < self.max_events:
+            self._events.append((key, self._pressed[key], timestamp))
+        else:
+            self.dropped_events += 1
+
+    def poll_while(self, condition):
+        """Keep polling until condition() is false; eg: epd.is_busy."""
+        while condition():
+            self.poll()
+            time.sleep(self.interval_s / 2)
+
+    def pressed(self, key):
+        """The debounced state of key."""
+        return self._pressed[key]
+
+    def get_event(self):
+        """Returns the oldest (key, pressed, timestamp) event or None."""
+        if self._events:
+            return self._events.pop(0)
+        return None
+
+    def clear_events(self):
+        self._events.clear()
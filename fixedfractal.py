@@ -0,0 +1,258 @@
+# python3: CircuitPython 3.0
+
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Compute a Mandlebrot or Julia fractal with fixed point integers.
+
+For boards without floating point hardware such as the SAMD21 (Cortex-M0+)
+where every float operation is a library call and every complex number a
+heap allocation.  Numbers are Q-format: the value times 2**FRACTION_BITS
+held in an int.  13 fraction bits keep every product under 2**30 so they
+stay MicroPython small ints rather than long ints: z is tested to be within
++/-2 before it is squared.
+
+Precision: values are truncated to 1/8192 (about 1/70th of a pixel on the
+176 pixel wide panels) at each step.  The shapes are the same as the float
+ones but the parity of the escape iteration, which picks the pixel color,
+is chaotic along the set boundary: about 3% of the Julia and 0.5% of the
+Mandlebrot pixels of the main.py frames differ from fractal.py's, scattered
+along the boundary.  asm_thumb/fixedfractal.py does exactly the same
+integer math so its output is identical to this.
+
+The API matches fractal.py, which uses this when HAVE_FPU is False.
+"""
+
+import time
+
+import monobitmap
+import subdivision
+
+
+MAX_ITERATIONS = 40  # As in fractal.py.
+FRACTION_BITS = 13  # The asm_thumb code has these shifts hard coded.
+SCALE_BITS = FRACTION_BITS + 8  # Extra bits for the per-pixel step.
+TWO = 2 << FRACTION_BITS
+FOUR = 4 << FRACTION_BITS
+
+
+def to_fixed(value, bits=FRACTION_BITS):
+    """Returns the float value as a fixed point int with bits fraction bits."""
+    return int(round(value * (1 << bits)))
+
+
+def fixed_params(width, use_julia):
+    """Returns (scale, center_x, center_y, julia_c real, julia_c imag).
+
+    The same values fractal.py uses; scale has SCALE_BITS fraction bits,
+    the others FRACTION_BITS.  Pixel x, y is the point
+    ((x*scale >> 8) - center_x, (y*scale >> 8) - center_y).
+    """
+    scale = 1/(width/1.5)
+    if use_julia:
+        center_x, center_y = 1.15, 1.6  # Julia
+    else:
+        center_x, center_y = 2.2, 1.5  # Mandlebrot
+    julia_c = 0.3+0.6j
+    return (to_fixed(scale, SCALE_BITS), to_fixed(center_x),
+            to_fixed(center_y), to_fixed(julia_c.real),
+            to_fixed(julia_c.imag))
+
+
+# The shifts by 13 and 12 are FRACTION_BITS and FRACTION_BITS - 1; literal
+# shifts and default argument constants avoid global lookups in the loop.
+def _fractal_iterate(cr, ci, zr=0, zi=0, max_iter1=MAX_ITERATIONS+1,
+                     _two=TWO, _four=FOUR, _range=range) -> int:
+    """fractal._fractal_iterate on fixed point c = cr + ci*j, z = zr + zi*j."""
+    zr2 = zr * zr >> 13
+    zi2 = zi * zi >> 13
+    for n in _range(max_iter1):
+        zi = (zr * zi >> 12) + ci  # 2*zr*zi + ci
+        zr = zr2 - zi2 + cr
+        if zr > _two or zr < -_two or zi > _two or zi < -_two:
+            return n
+        zr2 = zr * zr >> 13
+        zi2 = zi * zi >> 13
+        if zr2 + zi2 > _four:
+            return n
+    return -1
+
+
+def _fractal_iterate_interior(cr, ci, zr=0, zi=0, max_iter1=MAX_ITERATIONS+1,
+                              mandlebrot=False, _two=TWO, _four=FOUR,
+                              _range=range) -> int:
+    """_fractal_iterate that detects interior points early.
+
+    Returns values as fractal._fractal_iterate_interior() does.  Integer
+    orbits that return to a point repeat exactly, so cycles are found at
+    least as soon as with floats.
+    """
+    if mandlebrot:
+        y2 = ci * ci >> 13
+        # Only tested within boxes around them so the products stay small.
+        if -6144 <= cr <= 3072 and -6144 <= ci <= 6144:  # -3/4..3/8, 3/4
+            x = cr - 2048  # cr - 1/4
+            q = (x * x >> 13) + y2
+            if q * (q + x) >> 13 <= y2 >> 2:
+                return -2  # Main cardioid.
+        x = cr + 8192  # cr + 1
+        if -2048 <= x <= 2048 and (x * x >> 13) + y2 <= 512:  # 1/16
+            return -2  # Period-2 bulb.
+    old_zr = zr
+    old_zi = zi
+    save_at = 1
+    zr2 = zr * zr >> 13
+    zi2 = zi * zi >> 13
+    for n in _range(max_iter1):
+        zi = (zr * zi >> 12) + ci
+        zr = zr2 - zi2 + cr
+        if zr > _two or zr < -_two or zi > _two or zi < -_two:
+            return n
+        zr2 = zr * zr >> 13
+        zi2 = zi * zi >> 13
+        if zr2 + zi2 > _four:
+            return n
+        if zr == old_zr and zi == old_zi:
+            return -3 - n  # Periodic after n + 1 iterations.
+        if n == save_at:
+            old_zr = zr
+            old_zi = zi
+            save_at += save_at
+    return -2 - max_iter1
+
+
+def _compute_rows(fractal, y_start, y_end, use_julia, max_iterations,
+                  fast_interior=False):
+    """Compute rows y_start until y_end into fractal starting at its top.
+
+    Returns the number of iterations saved by fast_interior.
+    """
+    width = fractal.width
+    scale, center_x, center_y, julia_r, julia_i = fixed_params(width,
+                                                              use_julia)
+    set_row = fractal.set_row  # faster name lookup
+    iterate = _fractal_iterate  # faster name lookup
+    iterate_interior = _fractal_iterate_interior
+    max_iterations += 1
+    # Every row has the same real parts.
+    reals = [(x * scale >> 8) - center_x for x in range(width)]
+    row_bits = bytearray(width)  # Packed into the bitmap a row at a time.
+    saved = 0
+
+    for y in range(y_start, y_end):
+        imag = (y * scale >> 8) - center_y
+        for x in range(width):
+            real = reals[x]
+            if fast_interior:
+                if use_julia:
+                    n = iterate_interior(julia_r, julia_i, real, imag,
+                                         max_iterations)
+                else:
+                    n = iterate_interior(real, imag, 0, 0, max_iterations,
+                                         True)
+                if n < -1:
+                    saved += max_iterations + 2 + n
+                    n = -1
+            elif use_julia:
+                n = iterate(julia_r, julia_i, real, imag, max_iterations)
+            else:
+                n = iterate(real, imag, 0, 0, max_iterations)
+
+            row_bits[x] = n & 1
+
+        set_row(y - y_start, row_bits)
+        print('*', end='')
+    return saved
+
+
+def _make_compute_span(fractal, counts, use_julia, max_iterations,
+                       fast_interior):
+    """Returns a compute_span for subdivision.render_subdivided()."""
+    width = fractal.width
+    scale, center_x, center_y, julia_r, julia_i = fixed_params(width,
+                                                              use_julia)
+    # A new bitmap is all dirty already.
+    set_pixel = fractal.set_pixel_untracked
+    iterate = _fractal_iterate
+    iterate_interior = _fractal_iterate_interior
+    max_iterations += 1
+
+    def compute_span(x_start, x_end, y):
+        imag = (y * scale >> 8) - center_y
+        offset = y * width
+        for x in range(x_start, x_end):
+            real = (x * scale >> 8) - center_x
+            if fast_interior:
+                if use_julia:
+                    n = iterate_interior(julia_r, julia_i, real, imag,
+                                         max_iterations)
+                else:
+                    n = iterate_interior(real, imag, 0, 0, max_iterations,
+                                         True)
+                if n < -1:
+                    n = -1
+            elif use_julia:
+                n = iterate(julia_r, julia_i, real, imag, max_iterations)
+            else:
+                n = iterate(real, imag, 0, 0, max_iterations)
+            counts[offset + x] = n + 2
+            set_pixel(x, y, n & 1)
+
+    return compute_span
+
+
+def get_fractal(width, height, use_julia=True, max_iterations=MAX_ITERATIONS,
+                fast_interior=False, subdivide=False):
+    """fast_interior=True detects points inside the set early.
+
+    subdivide=True only iterates rectangle borders, so can miss detail
+    smaller than a rectangle (1 pixel of a 400x600 Mandlebrot); see
+    subdivision.render_subdivided().
+    """
+    bitmap = monobitmap.MonoBitmap(width, height)
+    start_time = time.monotonic()
+    if subdivide:
+        counts = subdivision.new_counts(width, height, max_iterations)
+        compute_span = _make_compute_span(bitmap, counts, use_julia,
+                                          max_iterations, fast_interior)
+        iterated = subdivision.render_subdivided(bitmap, counts, compute_span)
+        print('Computation took', time.monotonic() - start_time, 'seconds.',
+              iterated, 'of', width * height, 'pixels iterated.')
+        return bitmap
+    saved = _compute_rows(bitmap, 0, height, use_julia, max_iterations,
+                          fast_interior)
+    print()
+    if fast_interior:
+        print('Computation took', time.monotonic() - start_time, 'seconds.',
+              saved, 'iterations saved.')
+    else:
+        print('Computation took', time.monotonic() - start_time, 'seconds.')
+    return bitmap
+
+
+def get_fractal_bands(width, height, use_julia=True,
+                      max_iterations=MAX_ITERATIONS, band_height=8,
+                      fast_interior=False):
+    """Yields the fractal as (y, rows) bands; see fractal.get_fractal_bands."""
+    band = monobitmap.MonoBitmap(width, band_height)
+    row_bytes = width // 8
+    saved = 0
+    for y in range(0, height, band_height):
+        rows = min(band_height, height - y)
+        saved += _compute_rows(band, y, y + rows, use_julia, max_iterations,
+                               fast_interior)
+        yield y, memoryview(band.bit_buf)[:rows * row_bytes]
+    print()
+    if fast_interior:
+        print(saved, 'iterations saved.')
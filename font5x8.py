@@ -0,0 +1,69 @@
+# python3: CircuitPython 3.0
+
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Generated by host/makefont.py from host/font5x8.txt; do not edit.
+
+FONT = (
+    b'BMF1\x05\x08\x06 _\x00\x00\x00\x00\x00\x00\x00'
+    b'\x00     \x00 \x00PPP\x00\x00\x00\x00'
+    b'\x00PP\xf8P\xf8PP\x00 x\xa0p(\xf0 '
+    b'\x00\xc0\xc8\x10 @\x98\x18\x00`\x90\xa0@\xa8\x90h'
+    b'\x00   \x00\x00\x00\x00\x00\x10 @@@ \x10'
+    b'\x00@ \x10\x10\x10 @\x00\x00 \xa8p\xa8 \x00'
+    b'\x00\x00  \xf8  \x00\x00\x00\x00\x00\x00\x00` '
+    b'@\x00\x00\x00\xf8\x00\x00\x00\x00\x00\x00\x00\x00\x00``'
+    b'\x00\x00\x08\x10 @\x80\x00\x00p\x88\x98\xa8\xc8\x88p'
+    b'\x00 `    p\x00p\x88\x08\x10 @\xf8'
+    b'\x00\xf8\x10 \x10\x08\x88p\x00\x100P\x90\xf8\x10\x10'
+    b'\x00\xf8\x80\xf0\x08\x08\x88p\x000@\x80\xf0\x88\x88p'
+    b'\x00\xf8\x08\x10 @@@\x00p\x88\x88p\x88\x88p'
+    b'\x00p\x88\x88x\x08\x10`\x00\x00``\x00``\x00'
+    b'\x00\x00``\x00` @\x00\x10 @\x80@ \x10'
+    b'\x00\x00\x00\xf8\x00\xf8\x00\x00\x00@ \x10\x08\x10 @'
+    b'\x00p\x88\x08\x10 \x00 \x00p\x88\x08h\xa8\xa8p'
+    b'\x00p\x88\x88\xf8\x88\x88\x88\x00\xf0\x88\x88\xf0\x88\x88\xf0'
+    b'\x00p\x88\x80\x80\x80\x88p\x00\xe0\x90\x88\x88\x88\x90\xe0'
+    b'\x00\xf8\x80\x80\xf0\x80\x80\xf8\x00\xf8\x80\x80\xf0\x80\x80\x80'
+    b'\x00p\x88\x80\xb8\x88\x88x\x00\x88\x88\x88\xf8\x88\x88\x88'
+    b'\x00p     p\x008\x10\x10\x10\x10\x90`'
+    b'\x00\x88\x90\xa0\xc0\xa0\x90\x88\x00\x80\x80\x80\x80\x80\x80\xf8'
+    b'\x00\x88\xd8\xa8\xa8\x88\x88\x88\x00\x88\x88\xc8\xa8\x98\x88\x88'
+    b'\x00p\x88\x88\x88\x88\x88p\x00\xf0\x88\x88\xf0\x80\x80\x80'
+    b'\x00p\x88\x88\x88\xa8\x90h\x00\xf0\x88\x88\xf0\xa0\x90\x88'
+    b'\x00x\x80\x80p\x08\x08\xf0\x00\xf8      '
+    b'\x00\x88\x88\x88\x88\x88\x88p\x00\x88\x88\x88\x88\x88P '
+    b'\x00\x88\x88\x88\xa8\xa8\xa8P\x00\x88\x88P P\x88\x88'
+    b'\x00\x88\x88\x88P   \x00\xf8\x08\x10 @\x80\xf8'
+    b'\x00p@@@@@p\x00\x00\x80@ \x10\x08\x00'
+    b'\x00p\x10\x10\x10\x10\x10p\x00 P\x88\x00\x00\x00\x00'
+    b'\x00\x00\x00\x00\x00\x00\x00\xf8\x00@ \x10\x00\x00\x00\x00'
+    b'\x00\x00\x00p\x08x\x88x\x00\x80\x80\xb0\xc8\x88\x88\xf0'
+    b'\x00\x00\x00p\x80\x80\x88p\x00\x08\x08h\x98\x88\x88x'
+    b'\x00\x00\x00p\x88\xf8\x80p\x000H@\xe0@@@'
+    b'\x00\x00\x00x\x88\x88x\x08p\x80\x80\xb0\xc8\x88\x88\x88'
+    b'\x00 \x00`   p\x00\x10\x000\x10\x10\x10\x90'
+    b'`\x80\x80\x90\xa0\xc0\xa0\x90\x00`     p'
+    b'\x00\x00\x00\xd0\xa8\xa8\x88\x88\x00\x00\x00\xb0\xc8\x88\x88\x88'
+    b'\x00\x00\x00p\x88\x88\x88p\x00\x00\x00\xf0\x88\x88\xf0\x80'
+    b'\x80\x00\x00x\x88\x88x\x08\x08\x00\x00\xb0\xc8\x80\x80\x80'
+    b'\x00\x00\x00x\x80p\x08\xf0\x00@@\xe0@@H0'
+    b'\x00\x00\x00\x88\x88\x88\x98h\x00\x00\x00\x88\x88\x88P '
+    b'\x00\x00\x00\x88\x88\xa8\xa8P\x00\x00\x00\x88P P\x88'
+    b'\x00\x00\x00\x88\x88\x88x\x08p\x00\x00\xf8\x10 @\xf8'
+    b'\x00\x10  @  \x10\x00       '
+    b'\x00@  \x10  @\x00\x00\x00@\xa8\x10\x00\x00'
+    b'\x00'
+)
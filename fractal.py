@@ -21,10 +21,33 @@
 import time
 
 import monobitmap
+import subdivision
 
 
 MAX_ITERATIONS = 40
 
+# os.uname().machine substrings of chips without floating point hardware.
+NO_FPU_CHIPS = ('samd21', 'samd11', 'rp2040', 'nrf51', 'stm32f0', 'stm32l0',
+                'esp8266')
+
+
+def _have_fpu():
+    """Whether floats are computed in hardware; assumed so if unknown."""
+    try:
+        import os
+        machine = os.uname().machine.lower()
+    except (ImportError, AttributeError):
+        return True
+    for chip in NO_FPU_CHIPS:
+        if chip in machine:
+            return False
+    return True
+
+
+# False selects fixedfractal.py by default; it is dramatically faster
+# without an FPU.
+HAVE_FPU = _have_fpu()
+
 
 # Avoiding the builtin abs lookup in the loop is ~10% faster.
 # Avoiding the builtin range lookup gains another ~3%.
@@ -37,6 +60,43 @@ def _fractal_iterate(c, z=0, max_iter1=MAX_ITERATIONS+1,
     return -1
 
 
+def _fractal_iterate_interior(c, z=0, max_iter1=MAX_ITERATIONS+1,
+                              mandlebrot=False, _abs=abs, _range=range) -> int:
+    """_fractal_iterate that detects interior points early.
+
+    Returns n when z escapes.  Interior points return -2 - k where k is the
+    number of iterations done before they were detected; treat them as -1
+    with max_iter1 - k iterations saved.
+
+    Points in the Mandlebrot main cardioid or period-2 bulb are detected
+    without iterating.  Otherwise the orbit is compared to a saved point that
+    is moved to n = 1, 2, 4, 8, ...; z returning to it exactly means the orbit
+    is a cycle that will never escape, so the result is the same as
+    _fractal_iterate's.
+    """
+    if mandlebrot:
+        x = c.real - 0.25
+        y2 = c.imag * c.imag
+        q = x*x + y2
+        if q*(q + x) <= y2*0.25:
+            return -2  # Main cardioid.
+        x = c.real + 1
+        if x*x + y2 <= 0.0625:
+            return -2  # Period-2 bulb.
+    old_z = z
+    save_at = 1
+    for n in _range(max_iter1):
+        z = z * z + c
+        if _abs(z) > 2:
+            return n
+        if z == old_z:
+            return -3 - n  # Periodic after n + 1 iterations.
+        if n == save_at:
+            old_z = z
+            save_at += save_at
+    return -2 - max_iter1
+
+
 # Created based on looking up how others have written Mandlebrot and Julia
 # fractal computations in Python.  Well known algorithms.  Python's
 # built-in complex number support makes them easy to express in code.
@@ -45,33 +105,153 @@ def _fractal_iterate(c, z=0, max_iter1=MAX_ITERATIONS+1,
 #  https://github.com/ActiveState/code/blob/master/recipes/Python/579143_Mandelbrot_Set_made_simple/recipe-579143.py
 #  https://github.com/ActiveState/code/blob/master/recipes/Python/577120_Julia_fractals/recipe-577120.py
 #  http://0pointer.de/blog/projects/mandelbrot.html
-def get_fractal(width, height, use_julia=True, max_iterations=MAX_ITERATIONS):
+def get_fractal(width, height, use_julia=True, max_iterations=MAX_ITERATIONS,
+                fast_interior=False, subdivide=False, fixed_point=None):
+    """fast_interior=True detects points inside the set early.
+
+    subdivide=True only iterates rectangle borders, so can miss detail
+    smaller than a rectangle (1 pixel of a 400x600 Mandlebrot); see
+    subdivision.render_subdivided().
+    fixed_point=True computes with fixedfractal.py's integers instead of
+    floats; None does so when not HAVE_FPU.
+    """
+    if fixed_point is None:
+        fixed_point = not HAVE_FPU
+    if fixed_point:
+        import fixedfractal
+        return fixedfractal.get_fractal(width, height, use_julia,
+                                        max_iterations, fast_interior,
+                                        subdivide)
+    fractal = monobitmap.MonoBitmap(width, height)
+    start_time = time.monotonic()
+    if subdivide:
+        counts = subdivision.new_counts(width, height, max_iterations)
+        compute_span = _make_compute_span(fractal, counts, use_julia,
+                                          max_iterations, fast_interior)
+        iterated = subdivision.render_subdivided(fractal, counts, compute_span)
+        print('Computation took', time.monotonic() - start_time, 'seconds.',
+              iterated, 'of', width * height, 'pixels iterated.')
+        return fractal
+    saved = _compute_rows(fractal, 0, height, use_julia, max_iterations,
+                          fast_interior)
+    print()
+    if fast_interior:
+        print('Computation took', time.monotonic() - start_time, 'seconds.',
+              saved, 'iterations saved.')
+    else:
+        print('Computation took', time.monotonic() - start_time, 'seconds.')
+    return fractal
+
+
+def get_fractal_bands(width, height, use_julia=True,
+                      max_iterations=MAX_ITERATIONS, band_height=8,
+                      fast_interior=False, fixed_point=None):
+    """Yields the fractal as (y, rows) bands from top to bottom.
+
+    rows is a memoryview of the packed rows y through y + band_height - 1
+    (fewer for the final band).  A single band buffer is reused so only one
+    band is ever in memory; rows is only valid until the next is requested.
+    width must be a multiple of 8.  fixed_point is as for get_fractal().
+    """
+    if fixed_point is None:
+        fixed_point = not HAVE_FPU
+    if fixed_point:
+        import fixedfractal
+        yield from fixedfractal.get_fractal_bands(
+                width, height, use_julia, max_iterations, band_height,
+                fast_interior)
+        return
+    band = monobitmap.MonoBitmap(width, band_height)
+    row_bytes = width // 8
+    saved = 0
+    for y in range(0, height, band_height):
+        rows = min(band_height, height - y)
+        saved += _compute_rows(band, y, y + rows, use_julia, max_iterations,
+                               fast_interior)
+        yield y, memoryview(band.bit_buf)[:rows * row_bytes]
+    print()
+    if fast_interior:
+        print(saved, 'iterations saved.')
+
+
+def _compute_rows(fractal, y_start, y_end, use_julia, max_iterations,
+                  fast_interior=False):
+    """Compute rows y_start until y_end into fractal starting at its top.
+
+    Returns the number of iterations saved by fast_interior.
+    """
+    width = fractal.width
     scale = 1/(width/1.5)
     if use_julia:
         center_x, center_y = 1.15, 1.6  # Julia
     else:
         center_x, center_y = 2.2, 1.5  # Mandlebrot
 
-    fractal = monobitmap.MonoBitmap(width, height)
-    set_pixel = fractal.set_pixel  # faster name lookup
+    set_row = fractal.set_row  # faster name lookup
     iterate = _fractal_iterate  # faster name lookup
+    iterate_interior = _fractal_iterate_interior
     julia_c = 0.3+0.6j  # Only load the complex constant once.
     max_iterations += 1
+    row_bits = bytearray(width)  # Packed into the bitmap a row at a time.
+    saved = 0
 
-    start_time = time.monotonic()
-    for y in range(height):
+    for y in range(y_start, y_end):
         scaled_y_j_m_cx = (y*scale - center_y)*1j - center_x
         for x in range(width):
             c = x*scale + scaled_y_j_m_cx
-            if use_julia:
+            if fast_interior:
+                if use_julia:
+                    n = iterate_interior(julia_c, c, max_iterations)
+                else:
+                    n = iterate_interior(c, 0, max_iterations, True)
+                if n < -1:
+                    saved += max_iterations + 2 + n
+                    n = -1
+            elif use_julia:
                 n = iterate(julia_c, c, max_iter1=max_iterations)  # Julia
             else:
                 n = iterate(c, max_iter1=max_iterations)  # Mandlebrot
 
-            set_pixel(x, y, n & 1)
+            row_bits[x] = n & 1
 
+        set_row(y - y_start, row_bits)
         print('*', end='')
-    print()
-    print('Computation took', time.monotonic() - start_time, 'seconds.')
-    return fractal
+    return saved
+
+
+def _make_compute_span(fractal, counts, use_julia, max_iterations,
+                       fast_interior):
+    """Returns a compute_span for subdivision.render_subdivided()."""
+    width = fractal.width
+    scale = 1/(width/1.5)
+    if use_julia:
+        center_x, center_y = 1.15, 1.6  # Julia
+    else:
+        center_x, center_y = 2.2, 1.5  # Mandlebrot
+    # A new bitmap is all dirty already.
+    set_pixel = fractal.set_pixel_untracked
+    iterate = _fractal_iterate
+    iterate_interior = _fractal_iterate_interior
+    julia_c = 0.3+0.6j
+    max_iterations += 1
+
+    def compute_span(x_start, x_end, y):
+        scaled_y_j_m_cx = (y*scale - center_y)*1j - center_x
+        offset = y * width
+        for x in range(x_start, x_end):
+            c = x*scale + scaled_y_j_m_cx
+            if fast_interior:
+                if use_julia:
+                    n = iterate_interior(julia_c, c, max_iterations)
+                else:
+                    n = iterate_interior(c, 0, max_iterations, True)
+                if n < -1:
+                    n = -1
+            elif use_julia:
+                n = iterate(julia_c, c, max_iter1=max_iterations)  # Julia
+            else:
+                n = iterate(c, max_iter1=max_iterations)  # Mandlebrot
+            counts[offset + x] = n + 2
+            set_pixel(x, y, n & 1)
 
+    return compute_span
@@ -0,0 +1,198 @@
+# python3: CircuitPython 3.0
+
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""A cache of rendered frame buffers keyed by what they were rendered from.
+
+Computing a fractal takes seconds; reading it back takes milliseconds.
+Frames are kept in RAM, least recently used first out once their total size
+would exceed max_bytes, and optionally as files of the raw packed bit_buf
+in a directory on flash so they survive a reset.
+
+CIRCUITPY is read-only to code unless boot.py remounts it writable (and
+then it is read-only over USB); the flash store quietly only reads when it
+can't write.  host/framecache.py maps the files on a host.
+
+Usage:
+  cache = framecache.FrameCache(directory='/frames')
+  key = framecache.frame_key('fractal', 176, 264, 'julia', 40, 'asmfractal')
+  frame = cache.get(key)
+  if frame is None:
+      frame = get_fractal(176, 264).bit_buf
+      cache.put(key, frame)
+  epd.display_frame_buf(frame)
+"""
+
+import os
+
+FILE_SUFFIX = '.bin'
+
+
+def frame_key(*params):
+    """Returns the cache key for a frame rendered with params.
+
+    Also the file name in the flash store so keep params short: names,
+    numbers and booleans.
+    """
+    return '_'.join(str(param) for param in params)
+
+
+class FrameCache:
+    """An LRU cache of frame buffers in RAM backed by an optional directory.
+
+    Frames returned are the cache's own buffers; do not modify them.
+
+    Attributes:
+      max_bytes: The most frame bytes kept in RAM; 0 to not keep any.
+      directory: Where frames are stored on flash or None.
+      hits, flash_hits, misses: Counts of get() results.
+    """
+
+    def __init__(self, max_bytes=12*1024, directory=None):
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.hits = self.flash_hits = self.misses = 0
+        self._frames = {}
+        self._lru = []  # Keys, least recently used first.
+        self._bytes = 0
+        self._writable = directory is not None
+        if directory is not None:
+            try:
+                os.mkdir(directory)
+            except OSError:
+                pass  # It exists or flash is read-only; put() finds out.
+
+    def __contains__(self, key):
+        return key in self._frames or self._stored_size(key) is not None
+
+    def get(self, key, size=None):
+        """Returns the frame for key or None if it isn't cached.
+
+        size: The expected number of bytes; a stored file of another size
+            is ignored.
+        """
+        frame = self._frames.get(key)
+        if frame is not None:
+            self._lru.remove(key)
+            self._lru.append(key)
+            self.hits += 1
+            return frame
+        stored_size = self._stored_size(key)
+        if stored_size is None or (size is not None and stored_size != size):
+            self.misses += 1
+            return None
+        frame = bytearray(stored_size)
+        with open(self._path(key), 'rb') as f:
+            f.readinto(frame)
+        self.flash_hits += 1
+        self._remember(key, frame)
+        return frame
+
+    def put(self, key, frame):
+        """Cache a copy of frame, a buffer like bit_buf, under key."""
+        frame = bytearray(frame)
+        self._remember(key, frame)
+        if self._writable:
+            self._store(key, (frame,))
+
+    def capture_bands(self, key, bands, size):
+        """Yields bands, caching the frame they make up under key.
+
+        bands: (y, rows) tuples of a size byte frame from top to bottom as
+            EPD.display_bands() takes; eg: fractal.get_fractal_bands().  The
+            frame is cached once the last band has been consumed.
+        """
+        frame = bytearray(size) if size <= self.max_bytes else None
+        f = None
+        if self._writable:
+            f = self._open_for_writing(key)
+        offset = 0
+        try:
+            for y, rows in bands:
+                if frame is not None:
+                    frame[offset:offset + len(rows)] = rows
+                if f is not None:
+                    f.write(rows)
+                offset += len(rows)
+                yield y, rows
+        finally:
+            if f is not None:
+                f.close()
+                if offset == size:
+                    self._commit(key)
+                else:  # Abandoned part way.
+                    self._remove(self._path(key) + '.tmp')
+        if frame is not None and offset == size:
+            self._remember(key, frame)
+
+    def discard(self, key):
+        """Forget key in RAM and on flash."""
+        if key in self._frames:
+            self._bytes -= len(self._frames.pop(key))
+            self._lru.remove(key)
+        if self._writable:
+            self._remove(self._path(key))
+
+    def _remember(self, key, frame):
+        if key in self._frames:
+            self._bytes -= len(self._frames.pop(key))
+            self._lru.remove(key)
+        if len(frame) > self.max_bytes:
+            return
+        while self._bytes + len(frame) > self.max_bytes:
+            self._bytes -= len(self._frames.pop(self._lru.pop(0)))
+        self._frames[key] = frame
+        self._lru.append(key)
+        self._bytes += len(frame)
+
+    def _path(self, key):
+        return self.directory + '/' + key + FILE_SUFFIX
+
+    def _stored_size(self, key):
+        if self.directory is None:
+            return None
+        try:
+            return os.stat(self._path(key))[6]
+        except OSError:
+            return None
+
+    def _open_for_writing(self, key):
+        """Returns a file to write key's frame to or None if read-only."""
+        try:
+            return open(self._path(key) + '.tmp', 'wb')
+        except OSError:
+            self._writable = False
+            return None
+
+    def _store(self, key, chunks):
+        f = self._open_for_writing(key)
+        if f is None:
+            return
+        with f:
+            for chunk in chunks:
+                f.write(chunk)
+        self._commit(key)
+
+    def _commit(self, key):
+        """Replaces key's file with the one just written."""
+        path = self._path(key)
+        self._remove(path)
+        os.rename(path + '.tmp', path)
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
@@ -0,0 +1,206 @@
+# python3: CircuitPython 3.0
+
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Compressed frame files streamed to a display band by band.
+
+E-paper frames are mostly long runs of white and rows much like the one
+above, so a frame file stores each plane run length encoded a byte (8
+pixels) at a time.  Decoding only ever needs one band of rows in RAM; the
+bands go straight to the driver's display_bands().  host/framefile.py
+writes them.
+
+The file is a header:
+
+  MAGIC, width, height, number of planes, 0  ('<4sHHBB')
+  the encoded length of each plane         ('<I' each)
+
+followed by each encoded plane.  Planes hold packed rows in the order and
+bit order of MonoBitmap.bit_buf: one for a monochrome frame, the black then
+the red plane of a TriColorBitmap for a color one.  Each plane is a series
+of operations, a control byte c followed by any data:
+
+  c <= LITERAL_MAX:  c + 1 bytes to copy follow.
+  c <= RUN_MAX:      c - LITERAL_MAX + 1 copies of the byte that follows.
+  otherwise:         c - RUN_MAX bytes are those one row above (zeros above
+                     the first row); never more than a row.
+
+Usage:
+  with open('/frames/julia.epf', 'rb') as f:
+      framefile.display(epd, f)
+"""
+
+import struct
+
+MAGIC = b'EPF1'
+HEADER_FORMAT = '<4sHHBB'
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+LITERAL_MAX = 0x7f  # 1 to 128 literal bytes.
+RUN_MAX = 0xbf  # 2 to 65 repeats.
+MAX_RUN = RUN_MAX - LITERAL_MAX + 1
+MAX_COPY = 0xff - RUN_MAX
+
+_LITERAL, _RUN, _COPY = 0, 1, 2
+_SOLID = (memoryview(bytes(MAX_RUN)), memoryview(b'\xff' * MAX_RUN))
+
+
+class Header:
+    """The header of a frame file.
+
+    Attributes:
+      width, height: The frame size in pixels.
+      planes: The number of planes.
+      plane_sizes: The encoded size in bytes of each plane.
+      plane_offsets: The file offset of each encoded plane.
+    """
+
+    def __init__(self, width, height, plane_sizes, data_offset):
+        self.width = width
+        self.height = height
+        self.planes = len(plane_sizes)
+        self.plane_sizes = plane_sizes
+        self.plane_offsets = []
+        for size in plane_sizes:
+            self.plane_offsets.append(data_offset)
+            data_offset += size
+
+    @property
+    def plane_bytes(self):
+        """The decoded size in bytes of each plane."""
+        return self.width * self.height // 8
+
+
+def read_header(f):
+    """Returns the Header of the frame file f read from its start."""
+    f.seek(0)
+    magic, width, height, planes, _ = struct.unpack(HEADER_FORMAT,
+                                                    f.read(HEADER_SIZE))
+    if magic != MAGIC:
+        raise ValueError('not a frame file: %r' % magic)
+    plane_sizes = struct.unpack('<%dI' % planes, f.read(4 * planes))
+    return Header(width, height, plane_sizes, HEADER_SIZE + 4 * planes)
+
+
+class _Input:
+    """Reads the encoded bytes of a plane a chunk at a time."""
+
+    def __init__(self, f, size):
+        self._f = f
+        self._remaining = size
+        self._chunk = memoryview(bytearray(64))
+        self.buf = self._chunk
+        self.pos = self.len = 0
+
+    def fill(self):
+        """Read the next chunk into buf once pos reaches len."""
+        length = min(len(self._chunk), self._remaining)
+        self.len = self._f.readinto(self._chunk[:length]) if length else 0
+        if not self.len:
+            raise ValueError('frame file plane ends early')
+        self._remaining -= self.len
+        self.pos = 0
+
+    def byte(self):
+        if self.pos == self.len:
+            self.fill()
+        self.pos += 1
+        return self.buf[self.pos - 1]
+
+
+def plane_bands(f, header, plane=0, band_height=8):
+    """Yields a plane of the frame file f as (y, rows) bands.
+
+    Like fractal.get_fractal_bands(), rows is a memoryview of a buffer that
+    is reused; it is only valid until the next band is requested.  The file
+    is read from the start of the plane when the first band is requested,
+    so the bands of several planes may be consumed one plane after another.
+    """
+    row_bytes = header.width // 8
+    # The row above the band followed by the band.
+    band = memoryview(bytearray(row_bytes * (band_height + 1)))
+    f.seek(header.plane_offsets[plane])
+    encoded = _Input(f, header.plane_sizes[plane])
+    op = count = value = 0
+    for y in range(0, header.height, band_height):
+        pos = row_bytes
+        end = pos + min(band_height, header.height - y) * row_bytes
+        while pos < end:
+            if not count:
+                control = encoded.byte()
+                if control <= LITERAL_MAX:
+                    op, count = _LITERAL, control + 1
+                elif control <= RUN_MAX:
+                    op, count = _RUN, control - LITERAL_MAX + 1
+                    value = encoded.byte()
+                else:
+                    op, count = _COPY, control - RUN_MAX
+            n = min(count, end - pos)
+            if op == _LITERAL:
+                if encoded.pos == encoded.len:
+                    encoded.fill()
+                n = min(n, encoded.len - encoded.pos)
+                band[pos:pos + n] = encoded.buf[encoded.pos:encoded.pos + n]
+                encoded.pos += n
+            elif op == _RUN:
+                if value == 0 or value == 0xff:  # White or black.
+                    band[pos:pos + n] = _SOLID[value & 1][:n]
+                else:
+                    for i in range(pos, pos + n):
+                        band[i] = value
+            else:
+                band[pos:pos + n] = band[pos - row_bytes:pos - row_bytes + n]
+            pos += n
+            count -= n
+        yield y, band[row_bytes:end]
+        band[:row_bytes] = band[end - row_bytes:end]
+
+
+def display(epd, f, **kwargs):
+    """Stream the frame file f to epd and display it.
+
+    kwargs are passed to a monochrome epd's display_bands().
+    """
+    header = read_header(f)
+    if (header.width, header.height) != (epd.width, epd.height):
+        raise ValueError('%dx%d frame for a %dx%d display' % (
+                header.width, header.height, epd.width, epd.height))
+    if getattr(epd, 'colors', 2) > 2:
+        bands = [None, None]
+        for plane in range(min(header.planes, 2)):
+            bands[plane] = plane_bands(f, header, plane)
+        epd.display_bands(*bands)
+    else:
+        epd.display_bands(plane_bands(f, header), **kwargs)
+
+
+def load(f, planes=None):
+    """Decode every plane of the frame file f.
+
+    Returns a list with a memoryview of plane_bytes per plane, eg: to
+    use as the bit_buf of a MonoBitmap.  planes: A buffer to decode into
+    rather than a new one, eg: the buf of a TriColorBitmap.
+    """
+    header = read_header(f)
+    size = header.plane_bytes
+    if planes is None:
+        planes = bytearray(size * header.planes)
+    planes = memoryview(planes)
+    for plane in range(header.planes):
+        start = plane * size
+        for y, rows in plane_bands(f, header, plane):
+            offset = start + y * header.width // 8
+            planes[offset:offset + len(rows)] = rows
+    return [planes[plane * size:(plane + 1) * size]
+            for plane in range(header.planes)]
@@ -0,0 +1,261 @@
+# python3: CPython 3 (host side only)
+
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""End to end benchmark of every panel driver with every fractal backend.
+
+Each fractal is computed, packed into a MonoBitmap and displayed on a
+simulated panel (see third_party/waveshare/epdsim.py).  For each phase:
+
+  compute_s: Computing the bitmap with the backend (best of --repeat).
+  packing_s: Packing the unpacked pixels into a MonoBitmap (best of).
+  spi_bytes, spi_commands, spi_transactions (CS toggles), refreshes.
+  transfer_s: Time displaying it, not counting waiting for BUSY.
+  busy_wait_s: Time the driver spent in wait_until_idle.
+  ram_ok: The panel RAM matches the bitmap after the refresh.
+
+Usage:
+  python3 -m host.bench                     # a table
+  python3 -m host.bench --json              # JSON on stdout
+  python3 -m host.bench --save host/bench_baseline.json
+  python3 -m host.bench --compare           # exit 1 on a regression
+
+Counters regress if they grow at all, times if they grow by more than
+--tolerance plus --slack seconds.  Times depend on the host; --save a new
+baseline when changing machines.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import time
+
+import fixedfractal
+import fractal
+import monobitmap
+from host import npfractal
+from third_party.waveshare import color_epd1in54
+from third_party.waveshare import color_epd2in13
+from third_party.waveshare import epd2in7
+from third_party.waveshare import epd2in9
+from third_party.waveshare import epd2in13
+from third_party.waveshare import epdsim
+
+PANELS = {
+    'epd2in7': epd2in7.EPD,
+    'epd2in9': epd2in9.EPD,
+    'epd2in13': epd2in13.EPD,
+    'color_epd2in13': color_epd2in13.EPD,
+    'color_epd1in54': color_epd1in54.EPD,
+}
+
+FRACTALS = {'julia': True, 'mandlebrot': False}
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__),
+                                'bench_baseline.json')
+
+COUNTERS = ('spi_bytes', 'spi_commands', 'spi_transactions', 'refreshes')
+TIMES = ('compute_s', 'packing_s', 'transfer_s', 'busy_wait_s')
+
+
+def _python_rows(bitmap):
+    """The bitmap unpacked as one bytearray of 0 and 1 values per row."""
+    buf = bitmap.bit_buf
+    rows = []
+    for y in range(bitmap.height):
+        bits = range(y * bitmap.width, (y + 1) * bitmap.width)
+        rows.append(bytearray((buf[i >> 3] >> (7 - (i & 7))) & 1
+                              for i in bits))
+    return rows
+
+
+def _pack_python(width, height, rows):
+    bitmap = monobitmap.MonoBitmap(width, height)
+    for y, row in enumerate(rows):
+        bitmap.set_row(y, row)
+    return bitmap
+
+
+def _numpy_rows(bitmap):
+    numpy = npfractal.numpy
+    return numpy.unpackbits(numpy.frombuffer(bytes(bitmap.bit_buf),
+                                             dtype=numpy.uint8))
+
+
+def _pack_numpy(width, height, bits):
+    bitmap = monobitmap.MonoBitmap(width, height)
+    bitmap.set_span(0, 0, bits)
+    return bitmap
+
+
+# name: (get_fractal, unpack, pack)
+BACKENDS = {
+    'python': (fractal.get_fractal, _python_rows, _pack_python),
+    'python_interior': (
+            lambda w, h, j: fractal.get_fractal(w, h, j, fast_interior=True),
+            _python_rows, _pack_python),
+    'python_subdivide': (
+            lambda w, h, j: fractal.get_fractal(w, h, j, subdivide=True),
+            _python_rows, _pack_python),
+    'python_fixed': (fixedfractal.get_fractal, _python_rows, _pack_python),
+    'numpy': (npfractal.get_fractal, _numpy_rows, _pack_numpy),
+}
+
+
+def _best_of(repeat, func, *args):
+    best = None
+    for _ in range(repeat):
+        with contextlib.redirect_stdout(io.StringIO()):  # Progress chatter.
+            start_time = time.monotonic()
+            result = func(*args)
+            elapsed = time.monotonic() - start_time
+        if best is None or elapsed < best:
+            best = elapsed
+    return best, result
+
+
+def run_one(epd_class, backend, use_julia, repeat=3, refresh_s=0.05):
+    """Returns a dict of the measurements of one panel/backend/fractal."""
+    get_fractal, unpack, pack = BACKENDS[backend]
+    width, height = epd_class.width, epd_class.height
+    compute_s, bitmap = _best_of(repeat, get_fractal, width, height,
+                                 use_julia)
+    packing_s, packed = _best_of(repeat, pack, width, height, unpack(bitmap))
+    assert packed.bit_buf == bitmap.bit_buf, backend
+
+    panel = epdsim.install(epd_class, refresh_s=refresh_s)
+    epd = epd_class()
+    epd.init()
+    busy_wait = [0.0]
+    wait_until_idle = epd.wait_until_idle
+
+    def timed_wait_until_idle():
+        start_time = time.monotonic()
+        wait_until_idle()
+        busy_wait[0] += time.monotonic() - start_time
+
+    epd.wait_until_idle = timed_wait_until_idle
+    frame = bytes(bitmap.bit_buf)
+    if getattr(epd, 'colors', 2) > 2:
+        # As main.py does: Julia in black, Mandlebrot in red.
+        frames = (frame, None) if use_julia else (None, frame)
+        stats = panel.measure(epd.display_frames, *frames)
+        ram_ok = panel.displayed[0 if use_julia else 1] == frame
+    else:
+        stats = panel.measure(epd.display_frame_buf, frame,
+                              fast_ghosting=True)
+        ram_ok = frame in panel.displayed
+    return {
+        'compute_s': compute_s,
+        'packing_s': packing_s,
+        'spi_bytes': stats.bytes,
+        'spi_commands': stats.commands,
+        'spi_transactions': stats.cs_toggles,
+        'refreshes': stats.refreshes,
+        'transfer_s': stats.elapsed_s - busy_wait[0],
+        'busy_wait_s': busy_wait[0],
+        'ram_ok': ram_ok,
+    }
+
+
+def run(panels, backends, repeat=3, refresh_s=0.05):
+    """Returns {'panel/backend/fractal': run_one() dict}."""
+    results = {}
+    for panel in panels:
+        for backend in backends:
+            for name, use_julia in FRACTALS.items():
+                results['/'.join((panel, backend, name))] = run_one(
+                        PANELS[panel], backend, use_julia, repeat, refresh_s)
+    return results
+
+
+def compare(baseline, results, tolerance=0.5, slack=0.01):
+    """Returns a list of lines describing regressions from baseline."""
+    regressions = []
+    for key, result in sorted(results.items()):
+        if not result['ram_ok']:
+            regressions.append('%s: panel RAM does not match' % key)
+        old = baseline.get(key)
+        if old is None:
+            continue  # New; nothing to compare with.
+        for name in COUNTERS:
+            if result[name] > old[name]:
+                regressions.append('%s: %s %d -> %d' % (
+                        key, name, old[name], result[name]))
+        for name in TIMES:
+            if result[name] > old[name] * (1 + tolerance) + slack:
+                regressions.append('%s: %s %.4f -> %.4f' % (
+                        key, name, old[name], result[name]))
+    return regressions
+
+
+def print_table(results):
+    print('{:42} {:>9} {:>9} {:>7} {:>5} {:>9} {:>9}  {}'.format(
+            'panel/backend/fractal', 'compute', 'packing', 'bytes', 'cs',
+            'transfer', 'busy', 'RAM'))
+    for key, r in results.items():
+        print('{:42} {:9.4f} {:9.4f} {:7} {:5} {:9.4f} {:9.4f}  {}'.format(
+                key, r['compute_s'], r['packing_s'], r['spi_bytes'],
+                r['spi_transactions'], r['transfer_s'], r['busy_wait_s'],
+                'ok' if r['ram_ok'] else 'MISMATCH'))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--panels', nargs='+', choices=sorted(PANELS),
+                        default=list(PANELS))
+    backends = [name for name in BACKENDS
+                if npfractal.numpy or not name.startswith('numpy')]
+    parser.add_argument('--backends', nargs='+', choices=sorted(BACKENDS),
+                        default=backends)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--refresh-s', type=float, default=0.05,
+                        help='simulated refresh BUSY time')
+    parser.add_argument('--json', action='store_true')
+    parser.add_argument('--save', metavar='PATH')
+    parser.add_argument('--compare', nargs='?', const=DEFAULT_BASELINE,
+                        metavar='BASELINE')
+    parser.add_argument('--tolerance', type=float, default=0.5)
+    parser.add_argument('--slack', type=float, default=0.01,
+                        help='seconds added to the tolerance')
+    args = parser.parse_args(argv)
+
+    results = run(args.panels, args.backends, args.repeat, args.refresh_s)
+    if args.json:
+        json.dump(results, sys.stdout, indent=1, sort_keys=True)
+        print()
+    else:
+        print_table(results)
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=1, sort_keys=True)
+            f.write('\n')
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, results, args.tolerance, args.slack)
+        for line in regressions:
+            print('REGRESSION', line, file=sys.stderr)
+        if regressions:
+            return 1
+        print('No regressions from', args.compare, file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
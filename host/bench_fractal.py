@@ -0,0 +1,67 @@
+# python3: CPython 3 (host side only)
+
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Time the fractal engines against each other at each panel size.
+
+  python3 -m host.bench_fractal
+"""
+
+import contextlib
+import io
+import time
+
+import fractal
+from host import npfractal
+from host import parfractal
+from third_party.waveshare import epd2in7
+from third_party.waveshare import epd2in9
+from third_party.waveshare import epd2in13
+
+PANELS = (('2.7"', epd2in7.EPD), ('2.9"', epd2in9.EPD),
+          ('2.13"', epd2in13.EPD))
+
+
+def _time(get_fractal, *args, **kwargs):
+    with contextlib.redirect_stdout(io.StringIO()):  # Progress chatter.
+        start_time = time.monotonic()
+        bitmap = get_fractal(*args, **kwargs)
+        return time.monotonic() - start_time, bitmap
+
+
+def main():
+    if npfractal.numpy is None:
+        print('NumPy is not installed; npfractal falls back to fractal.')
+    print('{:6} {:10} {:>9} {:>9} {:>8} {:>9} {:>11}  {}'.format(
+        'panel', 'fractal', 'scalar s', 'numpy s', 'speedup', 'pool s',
+        'pure pool s', 'identical'))
+    for name, epd_class in PANELS:
+        for use_julia in (True, False):
+            args = (epd_class.width, epd_class.height, use_julia)
+            scalar_s, expected = _time(fractal.get_fractal, *args)
+            numpy_s, actual = _time(npfractal.get_fractal, *args)
+            pool_s, pooled = _time(parfractal.get_fractal, *args)
+            # The pool without NumPy, as on a host without it.
+            pure_s, pure = _time(parfractal.get_fractal, *args,
+                                 use_numpy=False)
+            print('{:6} {:10} {:9.3f} {:9.3f} {:7.1f}x {:9.3f} {:11.3f}  {}'
+                  .format(name, 'Julia' if use_julia else 'Mandlebrot',
+                          scalar_s, numpy_s, scalar_s / numpy_s, pool_s,
+                          pure_s, actual.bit_buf == expected.bit_buf ==
+                          pooled.bit_buf == pure.bit_buf))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+# python3: CPython 3 (host side only)
+
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Measure each panel driver's init() until the panel is ready.
+
+  python3 -m host.bench_init
+
+A first init(), sleep() and a wake, init() after sleep(), are measured on a
+simulated panel (see third_party/waveshare/epdsim.py) with time.sleep()
+adding up the requested delays rather than waiting:
+
+  delay_ms: The driver's fixed delays, mostly the reset pulse.
+  claims: SPI bus claims, each a lock and configure of the bus.
+  cs, bytes: SPI chip select transactions and bytes on the wire.
+  wire_ms: Those bytes at the 2 MHz SPI clock.
+  host_ms: CPU time issuing it all under CPython.  A board spends far
+      longer per transaction; count those.
+  ready_ms: delay_ms + wire_ms, the least time before a frame can be sent.
+"""
+
+import contextlib
+import time
+
+from third_party.waveshare import color_epd1in54
+from third_party.waveshare import color_epd2in13
+from third_party.waveshare import epd2in7
+from third_party.waveshare import epd2in9
+from third_party.waveshare import epd2in13
+from third_party.waveshare import epdsim
+
+PANELS = (('epd2in7', epd2in7.EPD), ('epd2in9', epd2in9.EPD),
+          ('epd2in13', epd2in13.EPD), ('color_epd2in13', color_epd2in13.EPD),
+          ('color_epd1in54', color_epd1in54.EPD))
+SPI_HZ = 2000000
+
+
+@contextlib.contextmanager
+def _counted_sleeps():
+    """Replaces time.sleep() with one adding to the yielded [seconds]."""
+    slept = [0.0]
+    sleep = time.sleep
+
+    def counted_sleep(seconds):
+        slept[0] += seconds
+
+    time.sleep = counted_sleep
+    try:
+        yield slept
+    finally:
+        time.sleep = sleep
+
+
+def measure(panel, spi, func):
+    """Returns (delay_s, bus claims, Stats) of func() on the panel."""
+    claims = spi.claims
+    with _counted_sleeps() as slept:
+        stats = panel.measure(func)
+    return slept[0], spi.claims - claims, stats
+
+
+def main():
+    print('{:15} {:5} {:>8} {:>6} {:>4} {:>5} {:>7} {:>7} {:>8}'.format(
+        'panel', '', 'delay_ms', 'claims', 'cs', 'bytes', 'wire_ms',
+        'host_ms', 'ready_ms'))
+    for name, epd_class in PANELS:
+        spi = epdsim.SimSPI()
+        panel = epdsim.install(epd_class, spi=spi)
+        epd = epd_class()
+        for label, func in (('init', epd.init), ('sleep', epd.sleep),
+                            ('wake', epd.init)):
+            try:
+                delay_s, claims, stats = measure(panel, spi, func)
+            except Exception as e:  # Report a broken driver and carry on.
+                print('{:15} {:5} {!r}'.format(name, label, e))
+                continue
+            wire_ms = stats.bytes * 8 / SPI_HZ * 1000
+            print('{:15} {:5} {:8.0f} {:6} {:4} {:5} {:7.2f} {:7.2f} {:8.0f}'
+                  .format(name, label, delay_s * 1000, claims,
+                          stats.cs_toggles, stats.bytes, wire_ms,
+                          stats.elapsed_s * 1000, delay_s * 1000 + wire_ms))
+
+
+if __name__ == '__main__':
+    main()
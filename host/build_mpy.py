@@ -0,0 +1,141 @@
+# python3: CPython 3 (host side only)
+
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Precompile the device modules into .mpy files to copy to a board.
+
+A board imports a .mpy without reading and compiling the source, so it
+starts sooner and without the compiler's garbage in its heap.  The tree is
+mirrored into the output directory:
+
+  * main.py, code.py and boot.py are copied as they are; they are run, not
+    imported, and so are always compiled on the board.
+  * asm_thumb/ is copied as source unless --march is given.  Its native code
+    needs an mpy-cross that can emit it for the board (-march, which the
+    CircuitPython 3 mpy-cross lacks).
+  * Host side only modules are left out.
+  * Everything else becomes a .mpy.
+
+The .mpy format must match the firmware's, so use the mpy-cross built for
+the board's CircuitPython version.
+
+Usage:
+  python3 -m host.build_mpy --mpy-cross ~/circuitpython/mpy-cross/mpy-cross
+  python3 -m host.build_mpy --march armv7emsp -o build/device  # an M4
+"""
+
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_OUTPUT = os.path.join(ROOT, 'build', 'device')
+PACKAGES = ('asm_thumb', 'third_party')
+RUN_AS_SOURCE = ('main.py', 'code.py', 'boot.py')
+NATIVE_PACKAGES = ('asm_thumb',)
+HOST_ONLY = 'host side only'  # On the "# python3:" first line.
+
+
+def device_sources():
+    """Yields the path, relative to ROOT, of each module for the device."""
+    for name in sorted(os.listdir(ROOT)):
+        if name.endswith('.py'):
+            yield name
+    for package in PACKAGES:
+        for directory, subdirectories, names in os.walk(
+                os.path.join(ROOT, package)):
+            subdirectories[:] = sorted(
+                d for d in subdirectories if d != '__pycache__')
+            for name in sorted(names):
+                if name.endswith('.py'):
+                    yield os.path.relpath(os.path.join(directory, name), ROOT)
+
+
+def _host_only(path):
+    with open(os.path.join(ROOT, path)) as source:
+        return HOST_ONLY in source.readline()
+
+
+def _compiled(path, march):
+    """Whether path is to be compiled rather than copied as source."""
+    if path in RUN_AS_SOURCE:
+        return False
+    return march or path.split(os.sep)[0] not in NATIVE_PACKAGES
+
+
+def build(output, mpy_cross='mpy-cross', march=None):
+    """Compiles or copies the device modules into output.
+
+    Returns:
+      A list of (path written relative to output, source bytes, bytes).
+
+    Raises:
+      subprocess.CalledProcessError: mpy-cross failed on a module.
+    """
+    written = []
+    for path in device_sources():
+        if _host_only(path):
+            continue
+        os.makedirs(os.path.join(output, os.path.dirname(path)),
+                    exist_ok=True)
+        if _compiled(path, march):
+            target = path[:-len('.py')] + '.mpy'
+            command = [mpy_cross, '-o', os.path.join(output, target)]
+            if march and path.split(os.sep)[0] in NATIVE_PACKAGES:
+                command.append('-march=' + march)
+            # Relative, so tracebacks on the board name the module's path.
+            subprocess.run(command + [path], cwd=ROOT, check=True)
+        else:
+            target = path
+            shutil.copyfile(os.path.join(ROOT, path),
+                            os.path.join(output, target))
+        written.append((target, os.path.getsize(os.path.join(ROOT, path)),
+                        os.path.getsize(os.path.join(output, target))))
+    return written
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('-o', '--output', default=DEFAULT_OUTPUT,
+                        help='directory to mirror the device files into')
+    parser.add_argument('--mpy-cross', default='mpy-cross',
+                        help='the mpy-cross for the board firmware')
+    parser.add_argument('--march',
+                        help='compile asm_thumb/ too, eg: armv7emsp on an M4')
+    args = parser.parse_args(argv)
+    if shutil.which(args.mpy_cross) is None:
+        print('%s not found; build it from the CircuitPython source tree '
+              'matching the board (make -C mpy-cross) and pass --mpy-cross.'
+              % args.mpy_cross, file=sys.stderr)
+        return 2
+    if os.path.isdir(args.output):
+        shutil.rmtree(args.output)  # Leave no stale modules behind.
+    try:
+        written = build(args.output, args.mpy_cross, args.march)
+    except subprocess.CalledProcessError as e:
+        print('mpy-cross failed on', e.cmd[-1], file=sys.stderr)
+        return 1
+    print('{:44} {:>7} {:>7}'.format('file', 'source', 'bytes'))
+    for path, source_bytes, size in written:
+        print('{:44} {:7} {:7}'.format(path, source_bytes, size))
+    print('{:44} {:7} {:7}'.format(
+        'total', sum(w[1] for w in written), sum(w[2] for w in written)))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
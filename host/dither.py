@@ -0,0 +1,363 @@
+# python3: CPython 3 (host side only)
+
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Convert images into dithered frames for a panel.
+
+Images are scaled to fit the panel (keeping their aspect ratio, centered on
+white) and dithered to its colors a row at a time: black and white, or
+white, black and red for the color panels.  The result is a MonoBitmap or
+TriColorBitmap ready for the driver, or a raw or framefile.py file of it.
+
+Averaging and dithering are done in linear light so grays keep their
+brightness.  Needs NumPy.  PGM and PPM images are read directly; anything
+else needs PIL (Pillow).
+
+Usage:
+  python3 -m host.dither --panel epd2in7 cat.pgm -o cat.epf
+  python3 -m host.dither --panel color_epd2in13 --method bayer \\
+      photos/ -o frames/      # every image in photos/, in parallel
+"""
+
+import argparse
+import concurrent.futures
+import os
+import sys
+import time
+
+import numpy
+
+import monobitmap
+import tricolorbitmap
+from host import framefile
+from third_party.waveshare import color_epd1in54
+from third_party.waveshare import color_epd2in13
+from third_party.waveshare import epd2in7
+from third_party.waveshare import epd2in9
+from third_party.waveshare import epd2in13
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+PANELS = {
+    'epd2in7': epd2in7.EPD,
+    'epd2in9': epd2in9.EPD,
+    'epd2in13': epd2in13.EPD,
+    'color_epd2in13': color_epd2in13.EPD,
+    'color_epd1in54': color_epd1in54.EPD,
+}
+
+METHODS = ('floyd', 'bayer', 'threshold')
+
+# Palettes in linear RGB, indexed by the value dither_rows() yields.
+MONO_PALETTE = numpy.array([[0.], [1.]], numpy.float32)  # Black, white.
+TRI_PALETTE = numpy.array([[1., 1., 1.], [0., 0., 0.], [1., 0., 0.]],
+                          numpy.float32)  # tricolorbitmap colors.
+
+# Rec. 709 luminance of linear RGB.
+LUMINANCE = numpy.array([0.2126, 0.7152, 0.0722], numpy.float32)
+
+
+def _bayer(order):
+    """Returns the 2**order square ordered dither thresholds in (0, 1)."""
+    matrix = numpy.zeros((1, 1))
+    for _ in range(order):
+        matrix = numpy.block([[4 * matrix, 4 * matrix + 2],
+                              [4 * matrix + 3, 4 * matrix + 1]])
+    return ((matrix + 0.5) / matrix.size).astype(numpy.float32)
+
+
+BAYER_8X8 = _bayer(3)
+
+
+def read_netpbm(path):
+    """Returns a binary PGM (P5) or PPM (P6) image as a uint8 array."""
+    with open(path, 'rb') as f:
+        data = f.read()
+    fields = []
+    pos = 0
+    while len(fields) < 4:
+        while data[pos:pos + 1].isspace():
+            pos += 1
+        if data[pos:pos + 1] == b'#':
+            pos = data.index(b'\n', pos)
+            continue
+        start = pos
+        while not data[pos:pos + 1].isspace():
+            pos += 1
+        fields.append(data[start:pos])
+    magic, width, height, maxval = fields[0], *map(int, fields[1:])
+    if magic not in (b'P5', b'P6'):
+        raise ValueError('%s: only binary PGM and PPM are supported' % path)
+    channels = 3 if magic == b'P6' else 1
+    dtype = numpy.dtype('>u2' if maxval > 255 else 'u1')
+    pixels = numpy.frombuffer(data, dtype, width * height * channels, pos + 1)
+    pixels = pixels.reshape(height, width, channels)
+    if maxval == 255:
+        return pixels
+    return (pixels.astype(numpy.float32) * (255 / maxval)).astype(numpy.uint8)
+
+
+def load_image(path):
+    """Returns an image file as a (height, width, 1 or 3) uint8 array."""
+    if path.lower().endswith(('.pgm', '.ppm', '.pnm')):
+        return read_netpbm(path)
+    if Image is None:
+        raise ValueError('%s: reading this needs PIL (pip install Pillow)'
+                         % path)
+    with Image.open(path) as image:
+        if image.mode not in ('L', 'RGB'):
+            image = image.convert('RGB')
+        pixels = numpy.asarray(image)
+    return pixels.reshape(pixels.shape[0], pixels.shape[1], -1)
+
+
+def to_linear(pixels):
+    """sRGB uint8 values to linear light floats from 0 to 1."""
+    value = pixels.astype(numpy.float32) / 255
+    return numpy.where(value <= 0.04045, value / 12.92,
+                       ((value + 0.055) / 1.055) ** 2.4).astype(numpy.float32)
+
+
+def _boxes(size, out_size):
+    """The (start, end) input indices of out_size boxes across size."""
+    start = numpy.arange(out_size) * size // out_size
+    end = numpy.maximum(numpy.arange(1, out_size + 1) * size // out_size,
+                        start + 1)
+    return start, end
+
+
+def fit(pixels, width, height, convert=to_linear):
+    """Yields the rows of an image scaled to fit width by height.
+
+    Each output pixel is the average of the converted input pixels it covers
+    (at least one); the margins are white.  Only the band of input rows under
+    one output row is converted at a time, so a large image is never held in
+    floats all at once.
+
+    Args:
+      pixels: A (rows, columns, channels) image, eg: from load_image().
+      width, height: The size to fit it to.
+      convert: Returns a band of pixels as a (rows, columns, channels) array
+          of floats from 0 to 1.
+    """
+    rows, columns = pixels.shape[:2]
+    scale = min(width / columns, height / rows)
+    out_width = max(1, min(width, round(columns * scale)))
+    out_height = max(1, min(height, round(rows * scale)))
+    y0, y1 = _boxes(rows, out_height)
+    x0, x1 = _boxes(columns, out_width)
+    top, left = (height - out_height) // 2, (width - out_width) // 2
+    channels = convert(pixels[:1, :1]).shape[2]
+    white = numpy.ones((width, channels), numpy.float32)
+    sums = numpy.zeros((columns + 1, channels), numpy.float64)
+    for y in range(height):
+        if not top <= y < top + out_height:
+            yield white.copy()
+            continue
+        start, end = y0[y - top], y1[y - top]
+        # The band's column sums, then their running total along the row.
+        band = convert(pixels[start:end])
+        numpy.cumsum(band.sum(0, dtype=numpy.float64), 0, out=sums[1:])
+        row = white.copy()
+        row[left:left + out_width] = ((sums[x1] - sums[x0])
+                                      / ((x1 - x0) * (end - start))[:, None])
+        yield row
+
+
+def prepare(pixels, epd_class):
+    """Yields the rows of pixels in linear light fit to epd_class's size.
+
+    The channels are those of the palette for the panel: luminance for a
+    black and white panel and RGB for a color one.
+    """
+    color = getattr(epd_class, 'colors', 2) > 2
+
+    def convert(band):
+        band = to_linear(band)
+        if color:
+            if band.shape[2] == 1:
+                band = numpy.repeat(band, 3, axis=2)
+        elif band.shape[2] == 3:
+            band = (band @ LUMINANCE)[:, :, None]
+        return band
+
+    return fit(pixels, epd_class.width, epd_class.height, convert)
+
+
+def _nearest(row, palette):
+    """The index of the palette color nearest each pixel of row."""
+    distance = ((row[:, None, :] - palette[None, :, :]) ** 2).sum(axis=2)
+    return distance.argmin(axis=1).astype(numpy.uint8)
+
+
+def dither_rows(image, palette, method='floyd'):
+    """Yields a row of palette indices for each row of image in turn.
+
+    Args:
+      image: A (rows, columns, channels) float array, or any iterable of
+          (columns, channels) rows; only one row is held at a time.
+      palette: A (colors, channels) array of the colors available.
+      method: 'floyd' for Floyd-Steinberg error diffusion (serpentine),
+          'bayer' for an 8x8 ordered dither or 'threshold' for neither.
+    """
+    if method not in METHODS:
+        raise ValueError('unknown method %r' % method)
+    palette = numpy.asarray(palette, numpy.float32)
+    colors = palette.tolist()
+    carry = None  # Error diffused down onto the next row.
+    for y, row in enumerate(image):
+        if method == 'threshold':
+            yield _nearest(row, palette)
+        elif method == 'bayer':
+            columns = row.shape[0]
+            thresholds = numpy.resize(BAYER_8X8[y % 8], columns)
+            # Spread each pixel across a palette step before picking one.
+            yield _nearest(row + (thresholds[:, None] - 0.5), palette)
+        else:
+            row = row.astype(numpy.float64)
+            if carry is not None:
+                row += carry
+            indices, carry = _diffuse_row(row, colors, reverse=y & 1)
+            yield indices
+
+
+def _diffuse_row(row, colors, reverse):
+    """Floyd-Steinberg over one row; returns (indices, error for below).
+
+    The error to the right is carried serially through plain floats; the
+    error below is gathered into an array added to the next row at once.
+    """
+    columns, channels = row.shape
+    indices = [0] * columns
+    errors = [None] * columns
+    values = row.tolist()
+    carried = [0.0] * channels
+    for x in (range(columns - 1, -1, -1) if reverse else range(columns)):
+        value = [v + c for v, c in zip(values[x], carried)]
+        best = best_distance = None
+        for index, color in enumerate(colors):
+            distance = sum((v - c) * (v - c) for v, c in zip(value, color))
+            if best is None or distance < best_distance:
+                best, best_distance = index, distance
+        indices[x] = best
+        errors[x] = error = [v - c for v, c in zip(value, colors[best])]
+        carried = [e * (7 / 16) for e in error]
+    # Spread each pixel's error over the three pixels below it: 3/16 behind,
+    # 5/16 straight down and 1/16 ahead in the direction of travel.
+    error = numpy.array(errors)
+    below = error * (5 / 16)
+    if reverse:
+        below[1:] += error[:-1] * (3 / 16)
+        below[:-1] += error[1:] * (1 / 16)
+    else:
+        below[:-1] += error[1:] * (3 / 16)
+        below[1:] += error[:-1] * (1 / 16)
+    return numpy.array(indices, numpy.uint8), below
+
+
+def to_bitmap(pixels, epd_class, method='floyd'):
+    """Returns a MonoBitmap or TriColorBitmap of the image for epd_class.
+
+    A MonoBitmap has 1 bits for white as the black and white panels expect;
+    a TriColorBitmap holds the planes the color panels expect.
+    """
+    rows = prepare(pixels, epd_class)
+    width, height = epd_class.width, epd_class.height
+    row_bytes = width // 8
+    if getattr(epd_class, 'colors', 2) > 2:
+        bitmap = tricolorbitmap.TriColorBitmap(width, height)
+        planes = (bitmap.black, bitmap.red)
+        for y, row in enumerate(dither_rows(rows, TRI_PALETTE, method)):
+            offset = y * row_bytes
+            planes[0][offset:offset + row_bytes] = numpy.packbits(
+                    row == tricolorbitmap.BLACK).tobytes()
+            planes[1][offset:offset + row_bytes] = numpy.packbits(
+                    row != tricolorbitmap.RED).tobytes()
+        return bitmap
+    bitmap = monobitmap.MonoBitmap(width, height)
+    for y, row in enumerate(dither_rows(rows, MONO_PALETTE, method)):
+        bitmap.set_bytes(0, y, numpy.packbits(row).tobytes())
+    return bitmap
+
+
+def frame_bytes(bitmap, format='epf'):
+    """The file contents of bitmap: 'epf' (framefile) or 'bin' (raw)."""
+    if format == 'epf':
+        return framefile.encode_bitmap(bitmap)
+    if hasattr(bitmap, 'bit_buf'):
+        return bytes(bitmap.bit_buf)
+    return bytes(bitmap.buf)  # Both planes.
+
+
+def convert_file(source, destination, panel, method='floyd', format='epf'):
+    """Convert one image file to a frame file for the named panel."""
+    bitmap = to_bitmap(load_image(source), PANELS[panel], method)
+    with open(destination, 'wb') as f:
+        f.write(frame_bytes(bitmap, format))
+    return destination
+
+
+def convert_directory(source_dir, destination_dir, panel, method='floyd',
+                      format='epf', workers=None):
+    """Convert every image in source_dir across a pool of processes.
+
+    Returns the paths written; each is the image's name with the format's
+    extension.
+    """
+    os.makedirs(destination_dir, exist_ok=True)
+    jobs = []
+    for name in sorted(os.listdir(source_dir)):
+        source = os.path.join(source_dir, name)
+        if name.startswith('.') or not os.path.isfile(source):
+            continue
+        destination = os.path.join(destination_dir,
+                                   os.path.splitext(name)[0] + '.' + format)
+        jobs.append((source, destination))
+    with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+        futures = [executor.submit(convert_file, source, destination, panel,
+                                   method, format)
+                   for source, destination in jobs]
+        return [future.result() for future in futures]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('source', help='an image or a directory of them')
+    parser.add_argument('-o', '--output', required=True,
+                        help='the frame file or directory to write')
+    parser.add_argument('--panel', choices=sorted(PANELS), required=True)
+    parser.add_argument('--method', choices=METHODS, default='floyd')
+    parser.add_argument('--format', choices=('epf', 'bin'), default='epf')
+    parser.add_argument('--workers', type=int,
+                        help='processes for a directory; default all CPUs')
+    args = parser.parse_args(argv)
+
+    start_time = time.monotonic()
+    if os.path.isdir(args.source):
+        written = convert_directory(args.source, args.output, args.panel,
+                                    args.method, args.format, args.workers)
+    else:
+        written = [convert_file(args.source, args.output, args.panel,
+                                args.method, args.format)]
+    print('Converted', len(written), 'images in',
+          time.monotonic() - start_time, 'seconds.')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
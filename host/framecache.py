@@ -0,0 +1,76 @@
+# python3: CPython 3 (host side only)
+
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Map frames stored by framecache.FrameCache without copying them.
+
+Point it at the frame directory, eg: /media/$USER/CIRCUITPY/frames or a
+copy of it, and each frame becomes a MonoBitmap whose bit_buf is the file
+mapped into memory.
+
+Usage:
+  with host.framecache.FrameStore('frames') as store:
+      julia = store.open(framecache.frame_key('fractal', 176, 264, 'julia',
+                                               40, 'asmfractal'), 176, 264)
+      numpy.unpackbits(numpy.frombuffer(julia.bit_buf, numpy.uint8))
+"""
+
+import mmap
+import os
+
+import framecache
+import monobitmap
+
+
+class FrameStore:
+    """Frame files of a directory mapped as MonoBitmaps.
+
+    Bitmaps are valid until close(); keep none of their buffers past it.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._maps = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def keys(self):
+        """Returns the sorted keys of the frames in the directory."""
+        suffix = framecache.FILE_SUFFIX
+        return sorted(name[:-len(suffix)]
+                      for name in os.listdir(self.directory)
+                      if name.endswith(suffix))
+
+    def open(self, key, width, height, writable=False):
+        """Returns a MonoBitmap of key's frame backed by the file.
+
+        Writing to a writable bitmap writes to the file.
+        """
+        path = os.path.join(self.directory, key + framecache.FILE_SUFFIX)
+        with open(path, 'r+b' if writable else 'rb') as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=(
+                    mmap.ACCESS_WRITE if writable else mmap.ACCESS_READ))
+        self._maps.append(mapped)
+        # A memoryview of a read-only map is read-only yet shares its pages.
+        return monobitmap.MonoBitmap(width, height, memoryview(mapped))
+
+    def close(self):
+        """Unmaps every frame; fails if a bitmap's buffer is still used."""
+        while self._maps:
+            self._maps.pop().close()
@@ -0,0 +1,211 @@
+# python3: CPython 3 (host side only)
+
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Write the compressed frame files framefile.py streams to a display.
+
+Usage:
+  python3 -m host.framefile encode 176x264 julia.bin julia.epf
+  python3 -m host.framefile encode 104x212 black.bin red.bin flag.epf
+  python3 -m host.framefile bench   # ratios and load+upload times
+
+The .bin inputs are raw planes such as a MonoBitmap.bit_buf or the
+framecache.py files.
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import struct
+import sys
+import tempfile
+
+import fractal
+import framefile
+from third_party.waveshare import epdsim
+
+
+def encode_plane(plane, row_bytes):
+    """Returns the encoding of one plane of packed rows; see framefile."""
+    plane = bytes(plane)
+    above = bytes(row_bytes) + plane  # above[i] is the byte above plane[i].
+    size = len(plane)
+    encoded = bytearray()
+    literal = bytearray()
+
+    def flush_literal():
+        for start in range(0, len(literal), framefile.LITERAL_MAX + 1):
+            chunk = literal[start:start + framefile.LITERAL_MAX + 1]
+            encoded.append(len(chunk) - 1)
+            encoded.extend(chunk)
+        del literal[:]
+
+    i = 0
+    while i < size:
+        copy_limit = min(framefile.MAX_COPY, row_bytes, size - i)
+        copy = 0
+        while copy < copy_limit and plane[i + copy] == above[i + copy]:
+            copy += 1
+        run_limit = min(framefile.MAX_RUN, size - i)
+        run = 1
+        while run < run_limit and plane[i + run] == plane[i]:
+            run += 1
+        if copy >= 2 and copy >= run:
+            flush_literal()
+            encoded.append(framefile.RUN_MAX + copy)
+            i += copy
+        elif run >= 3 or (run == 2 and not literal):
+            flush_literal()
+            encoded.append(framefile.LITERAL_MAX + run - 1)
+            encoded.append(plane[i])
+            i += run
+        else:
+            literal.append(plane[i])
+            i += 1
+    flush_literal()
+    return encoded
+
+
+def encode(width, height, planes):
+    """Returns a frame file of the planes of a width by height frame."""
+    plane_bytes = width * height // 8
+    encoded = []
+    for plane in planes:
+        if len(plane) != plane_bytes:
+            raise ValueError('plane of %d bytes for %dx%d'
+                             % (len(plane), width, height))
+        encoded.append(encode_plane(plane, width // 8))
+    header = struct.pack(framefile.HEADER_FORMAT, framefile.MAGIC, width,
+                         height, len(planes), 0)
+    sizes = struct.pack('<%dI' % len(planes),
+                        *(len(plane) for plane in encoded))
+    return b''.join([header, sizes] + encoded)
+
+
+def encode_bitmap(bitmap):
+    """Returns a frame file of a MonoBitmap or TriColorBitmap."""
+    if hasattr(bitmap, 'bit_buf'):
+        planes = [bitmap.bit_buf]
+    else:
+        planes = [bitmap.black, bitmap.red]
+    return encode(bitmap.width, bitmap.height, planes)
+
+
+def _benchmark_frames(epd_class, use_julia):
+    """The planes of bench.py's frame for epd_class."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        frame = bytes(fractal.get_fractal(epd_class.width, epd_class.height,
+                                          use_julia).bit_buf)
+    if getattr(epd_class, 'colors', 2) <= 2:
+        return [frame]
+    # As main.py does: Julia in black, Mandlebrot in red.
+    blank = bytes(len(frame))
+    if use_julia:
+        return [frame, b'\xff' * len(frame)]
+    return [blank, frame]
+
+
+def _time_upload(epd_class, path, load_and_display):
+    """Returns (seconds, panel RAM) of load_and_display(epd, path)."""
+    panel = epdsim.install(epd_class)
+    epd = epd_class()
+    epd.init()
+    stats = panel.measure(load_and_display, epd, path)
+    return stats.elapsed_s, panel.displayed
+
+
+def _display_raw(epd, path):
+    with open(path, 'rb') as f:
+        data = bytearray(os.path.getsize(path))
+        f.readinto(data)
+    if getattr(epd, 'colors', 2) > 2:
+        size = len(data) // 2
+        epd.display_frames(data[:size], data[size:])
+    else:
+        epd.display_frame_buf(data, fast_ghosting=True)
+
+
+def _display_encoded(epd, path):
+    with open(path, 'rb') as f:
+        framefile.display(epd, f)
+
+
+def run_bench():
+    """Prints the compression ratio and load+upload times of bench frames."""
+    from host import bench  # Only here; dither.py imports this module.
+    print('{:28} {:>7} {:>7} {:>6} {:>9} {:>9}  {}'.format(
+            'panel/fractal', 'raw', 'encoded', 'ratio', 'raw_s',
+            'decode_s', 'RAM'))
+    total_raw = total_encoded = 0
+    with tempfile.TemporaryDirectory() as directory:
+        raw_path = os.path.join(directory, 'frame.bin')
+        encoded_path = os.path.join(directory, 'frame.epf')
+        for name, epd_class in bench.PANELS.items():
+            for fractal_name, use_julia in bench.FRACTALS.items():
+                planes = _benchmark_frames(epd_class, use_julia)
+                raw = b''.join(planes)
+                encoded = encode(epd_class.width, epd_class.height, planes)
+                with open(raw_path, 'wb') as f:
+                    f.write(raw)
+                with open(encoded_path, 'wb') as f:
+                    f.write(encoded)
+                raw_s, raw_ram = _time_upload(epd_class, raw_path,
+                                              _display_raw)
+                encoded_s, encoded_ram = _time_upload(
+                        epd_class, encoded_path, _display_encoded)
+                total_raw += len(raw)
+                total_encoded += len(encoded)
+                print('{:28} {:7} {:7} {:6.2f} {:9.4f} {:9.4f}  {}'.format(
+                        name + '/' + fractal_name, len(raw), len(encoded),
+                        len(raw) / len(encoded), raw_s, encoded_s,
+                        'ok' if raw_ram == encoded_ram else 'MISMATCH'))
+    print('Overall ratio {:.2f}'.format(total_raw / total_encoded))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    commands = parser.add_subparsers(dest='command')
+    encode_parser = commands.add_parser('encode')
+    encode_parser.add_argument('size', help='WIDTHxHEIGHT')
+    encode_parser.add_argument('planes', nargs='+',
+                               help='raw plane files then the output file')
+    commands.add_parser('bench')
+    args = parser.parse_args(argv)
+
+    if args.command == 'encode':
+        width, height = (int(n) for n in args.size.split('x'))
+        if len(args.planes) < 2:
+            parser.error('need a plane and an output file')
+        planes = []
+        for path in args.planes[:-1]:
+            with open(path, 'rb') as f:
+                planes.append(f.read())
+        encoded = encode(width, height, planes)
+        with open(args.planes[-1], 'wb') as f:
+            f.write(encoded)
+        print('{} bytes encoded as {} ({:.2f}:1)'.format(
+                sum(map(len, planes)), len(encoded),
+                sum(map(len, planes)) / len(encoded)))
+    elif args.command == 'bench':
+        run_bench()
+    else:
+        parser.print_help()
+        return 2
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
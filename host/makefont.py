@@ -0,0 +1,115 @@
+# python3: CPython 3 (host side only)
+
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Build bitmapfont.py fonts from text drawings of their glyphs.
+
+The source, eg: host/font5x8.txt, gives the width, height and advance then
+each glyph as a 'char 0x41' line followed by height rows of width '#' (set)
+and '.' characters.  Glyphs must be consecutive character codes.
+
+Usage:
+  python3 -m host.makefont host/font5x8.txt font5x8.py   # a module
+  python3 -m host.makefont host/font5x8.txt font5x8.bmf  # a font file
+"""
+
+import struct
+import sys
+
+import bitmapfont
+
+MODULE_HEADER = """\
+# python3: CircuitPython 3.0
+
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+
+
+def parse(text):
+    """Returns the font file bytes of the font source text."""
+    settings = {}
+    glyphs = {}
+    lines = iter(text.splitlines())
+    for line in lines:
+        words = line.split()
+        if not words or words[0] == '#':
+            continue
+        if words[0] in ('width', 'height', 'advance'):
+            settings[words[0]] = int(words[1])
+        elif words[0] == 'char':
+            code = int(words[1], 0)
+            rows = []
+            for _ in range(settings['height']):
+                row = next(lines).strip()
+                if len(row) != settings['width'] or set(row) - set('#.'):
+                    raise ValueError('bad row %r of char %#x' % (row, code))
+                bits = int(row.replace('#', '1').replace('.', '0'), 2)
+                rows.append(bits << (8 - settings['width']))
+            glyphs[code] = bytes(rows)
+        else:
+            raise ValueError('unknown line %r' % line)
+    first = min(glyphs)
+    if sorted(glyphs) != list(range(first, first + len(glyphs))):
+        raise ValueError('glyph character codes are not consecutive')
+    header = struct.pack(bitmapfont.HEADER_FORMAT, bitmapfont.MAGIC,
+                         settings['width'], settings['height'],
+                         settings['advance'], first, len(glyphs))
+    return header + b''.join(glyphs[code] for code in sorted(glyphs))
+
+
+def as_module(data, source):
+    """Returns Python source defining FONT as data."""
+    lines = [MODULE_HEADER,
+             '# Generated by host/makefont.py from %s; do not edit.' % source,
+             '',
+             'FONT = (']
+    for start in range(0, len(data), 16):
+        lines.append('    %r' % data[start:start + 16])
+    lines.append(')')
+    return '\n'.join(lines) + '\n'
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) != 2:
+        print(__doc__, file=sys.stderr)
+        return 2
+    source, output = argv
+    with open(source) as f:
+        data = parse(f.read())
+    if output.endswith('.py'):
+        with open(output, 'w') as f:
+            f.write(as_module(data, source))
+    else:
+        with open(output, 'wb') as f:
+            f.write(data)
+    print('Wrote', len(data), 'bytes of font to', output)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,102 @@
+# python3: CPython 3 (host side only)
+
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Rotate and transpose MonoBitmaps using NumPy.
+
+For preparing frames on a host.  The bits are unpacked into an array,
+turned with numpy.rot90 and packed again, which has none of the size limits
+of MonoBitmap.rotate().  Without NumPy that method is used.  Run as a module
+to time both at each panel size:
+
+  python3 -m host.nprotate
+"""
+
+import time
+
+import monobitmap
+from third_party.waveshare import epd2in7
+from third_party.waveshare import epd2in9
+from third_party.waveshare import epd2in13
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+PANELS = (('2.7"', epd2in7.EPD), ('2.9"', epd2in9.EPD),
+          ('2.13"', epd2in13.EPD))
+
+
+def _pixels(bitmap):
+    """The bitmap as a (height, width) array of 0 and 1."""
+    bits = numpy.unpackbits(numpy.frombuffer(bitmap.bit_buf, numpy.uint8))
+    return bits[:bitmap.width * bitmap.height].reshape(bitmap.height,
+                                                       bitmap.width)
+
+
+def _from_pixels(pixels):
+    height, width = pixels.shape
+    bitmap = monobitmap.MonoBitmap(width, height)
+    bitmap.set_span(0, 0, pixels)
+    return bitmap
+
+
+def rotate(bitmap, angle):
+    """Returns a new bitmap rotated clockwise by angle degrees."""
+    if numpy is None:
+        return bitmap.rotate(angle)
+    if angle not in monobitmap.ROTATIONS:
+        raise ValueError('rotation %r is not one of %r'
+                         % (angle, monobitmap.ROTATIONS))
+    return _from_pixels(numpy.rot90(_pixels(bitmap), -angle // 90))
+
+
+def transpose(bitmap):
+    """Returns a new bitmap flipped about its top left to bottom right."""
+    if numpy is None:
+        return bitmap.transpose()
+    return _from_pixels(_pixels(bitmap).T)
+
+
+def _time(function, *args, repeat=20):
+    start_time = time.monotonic()
+    for _ in range(repeat):
+        result = function(*args)
+    return (time.monotonic() - start_time) / repeat * 1000, result
+
+
+def main():
+    if numpy is None:
+        print('NumPy is not installed; nprotate falls back to monobitmap.')
+    print('{:6} {:>5} {:>11} {:>10}  {}'.format(
+        'panel', 'angle', 'bitmap ms', 'numpy ms', 'identical'))
+    for name, epd_class in PANELS:
+        # The landscape bitmap an application draws, rotated to the panel.
+        bitmap = monobitmap.MonoBitmap(epd_class.height, epd_class.width)
+        size = len(bitmap.bit_buf)
+        bitmap.bit_buf[:] = (bytes(range(256)) * (size // 256 + 1))[:size]
+        for angle in (90, 180, 270):
+            if angle == 180 and bitmap.width & 7:
+                continue
+            bitmap_ms, expected = _time(bitmap.rotate, angle)
+            numpy_ms, actual = _time(rotate, bitmap, angle)
+            print('{:6} {:5} {:11.3f} {:10.3f}  {}'.format(
+                name, angle, bitmap_ms, numpy_ms,
+                actual.bit_buf == expected.bit_buf))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+# python3: CPython 3 (host side only)
+
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Compute a fractal bitmap in row tiles across a pool of processes.
+
+Every worker maps the same shared memory block as a MonoBitmap and packs its
+tile's rows straight into it, so no tile is pickled back to the parent.
+Tiles start on a multiple of 8 rows which keeps them on byte boundaries.
+Each tile uses npfractal, or fractal without NumPy (or given use_numpy=False),
+so the output is identical to the serial engines.
+"""
+
+import concurrent.futures
+import contextlib
+import io
+import os
+import time
+from multiprocessing import shared_memory
+
+import fractal
+import monobitmap
+from host import npfractal
+
+
+MAX_ITERATIONS = fractal.MAX_ITERATIONS
+
+
+def get_fractal(width, height, use_julia=True, max_iterations=MAX_ITERATIONS,
+                workers=None, tile_rows=None, executor=None, use_numpy=None):
+    """Returns a MonoBitmap of the fractal.
+
+    Args:
+      workers: Number of processes; defaults to os.cpu_count().
+      tile_rows: Rows per tile, rounded up to a multiple of 8; defaults to
+          enough for four tiles per worker to even out the load.
+      executor: An existing concurrent.futures.ProcessPoolExecutor to use
+          instead of starting one (saves the startup time in batches).
+      use_numpy: False to compute the tiles with fractal even when NumPy is
+          installed; defaults to whether it is.
+    """
+    start_time = time.monotonic()
+    if use_numpy is None:
+        use_numpy = npfractal.numpy is not None
+    workers = workers or os.cpu_count() or 1
+    if tile_rows is None:
+        tile_rows = -(-height // (workers * 4))
+    tile_rows = max(8, (tile_rows + 7) & ~7)
+    size = width * height // 8
+    shared = shared_memory.SharedMemory(create=True, size=max(size, 1))
+    try:
+        with contextlib.ExitStack() as stack:
+            if executor is None:
+                executor = stack.enter_context(
+                    concurrent.futures.ProcessPoolExecutor(workers))
+            tiles = [executor.submit(_compute_tile, shared.name, width,
+                                     height, use_julia, max_iterations, y,
+                                     min(y + tile_rows, height), use_numpy)
+                     for y in range(0, height, tile_rows)]
+            for tile in tiles:
+                tile.result()  # Raises any worker exception.
+        image = monobitmap.MonoBitmap(width, height,
+                                      bytearray(shared.buf[:size]))
+    finally:
+        shared.close()
+        shared.unlink()
+    print('Computation took', time.monotonic() - start_time, 'seconds.')
+    return image
+
+
+def _compute_tile(name, width, height, use_julia, max_iterations,
+                  y_start, y_end, use_numpy):
+    """Computes rows y_start until y_end into the named shared memory."""
+    shared = shared_memory.SharedMemory(name=name)
+    try:
+        if not use_numpy:
+            # _compute_rows() writes from the top of the bitmap it is given.
+            bitmap = monobitmap.MonoBitmap(
+                width, y_end - y_start,
+                shared.buf[y_start * width // 8:y_end * width // 8])
+            with contextlib.redirect_stdout(io.StringIO()):  # Progress '*'s.
+                fractal._compute_rows(bitmap, y_start, y_end, use_julia,
+                                      max_iterations)
+        else:
+            bitmap = monobitmap.MonoBitmap(width, height, shared.buf)
+            bits = npfractal.iterations(width, height, use_julia,
+                                        max_iterations, y_start, y_end) & 1
+            bitmap.set_span(0, y_start, bits)
+        del bitmap  # Release the memoryview before closing.
+    finally:
+        shared.close()
@@ -16,48 +16,38 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import startup  # First, to time the imports after it.
+startup.mark('main.py')
+
 import board
-import digitalio
 import random
 import time
 
-#from third_party.waveshare import color_epd2in13 as connected_epd
-from third_party.waveshare import epd2in7 as connected_epd
-#from third_party.waveshare import epd2in9 as connected_epd
-#from third_party.waveshare import epd2in13 as connected_epd
+buttons = startup.load('buttons')
+framecache = startup.load('framecache')
+epdasync = startup.load('third_party.waveshare.epdasync')
+
+# The driver of the connected display, imported by main().
+#EPD_MODULE = 'third_party.waveshare.color_epd2in13'
+EPD_MODULE = 'third_party.waveshare.epd2in7'
+#EPD_MODULE = 'third_party.waveshare.epd2in9'
+#EPD_MODULE = 'third_party.waveshare.epd2in13'
 
 try:
     # Optimized version - requires a custom CircuitPython build.
-    from asm_thumb import fractal
-    from asm_thumb import monobitmap
+    monobitmap = startup.load('asm_thumb.monobitmap')
     HAVE_ASM = True
 except (ImportError, SyntaxError):
-    import fractal
-    import monobitmap
+    monobitmap = startup.load('monobitmap')
     HAVE_ASM = False
+_fractal = None  # The fractal module, see fractal_backend().
 
+# Interior detection saves pure Python a lot of time but slows the asm loops.
+FAST_INTERIOR = not HAVE_ASM
 
-def sample_keys():
-    """Yields four bools representing the button press state on the 2.7" EPD.
-    
-    The 2.7 inch EPD rpi hat has four push buttons connected to RPI hat pins.
-
-    Follow the traces to see which pins those are and wire them up to digital
-    inputs D2 through D5 on your CircuitPython device.  A button press grounds
-    the pin.
-
-    This function samples them all and yields four bools for each button.
-    """
-    DigitalInOut = digitalio.DigitalInOut
-    Pull = digitalio.Pull
-    with DigitalInOut(board.D2) as key1, DigitalInOut(board.D3) as key2, \
-            DigitalInOut(board.D4) as key3, DigitalInOut(board.D5) as key4:
-        key1.switch_to_input(Pull.UP)
-        key2.switch_to_input(Pull.UP)
-        key3.switch_to_input(Pull.UP)
-        key4.switch_to_input(Pull.UP)
-        for k in (key1, key2, key3, key4):
-            yield not k.value  # False is pressed
+# Where computed frames are kept across resets.  Only written to if boot.py
+# remounts CIRCUITPY writable: storage.remount('/', False)
+FRAME_DIRECTORY = '/frames'
 
 
 class StatusLED:
@@ -86,11 +76,207 @@ class StatusLED:
         self._led[0] = b'\x10\x50\0' if HAVE_ASM else b'\x10\0\x70'
 
 
+def fractal_backend():
+    """Returns the fractal module to compute with, imported on first use."""
+    global _fractal
+    if _fractal is None:
+        if not HAVE_ASM:
+            _fractal = startup.load('fractal')
+        else:
+            try:
+                _fractal = startup.load('asm_thumb.fractal')
+            except SyntaxError:
+                # No inline float instructions; eg: an M0 build without an FPU.
+                _fractal = startup.load('asm_thumb.fixedfractal')
+    return _fractal
+
+
+def _polling(keypad, bands):
+    """Yields bands, polling keypad in between."""
+    for band in bands:
+        keypad.poll()
+        yield band
+
+
+def fractal_engine():
+    """A short name for what computes fractals; their bitmaps differ a little.
+
+    eg: fixed point differs from float on ~3% of the Julia pixels.
+    """
+    backend = fractal_backend()
+    if backend.__name__ == 'fractal' and not backend.HAVE_FPU:
+        return 'fixedfractal'  # fractal.py hands over to fixedfractal.py.
+    return backend.__name__.replace('asm_thumb.', 'asm')
+
+
+def fractal_key(epd, use_julia):
+    """The framecache key of the fractal for epd.
+
+    Includes the engine as the flash store outlives switching firmware.
+    """
+    return framecache.frame_key('fractal', epd.width, epd.height,
+                                'julia' if use_julia else 'mandlebrot',
+                                fractal_backend().MAX_ITERATIONS,
+                                fractal_engine())
+
+
+def show_frame(epd, frame, use_julia):
+    """Display a fractal frame, in red for Mandlebrot on color displays."""
+    if getattr(epd, 'colors', 2) > 2:
+        if use_julia:
+            return epd.display_frames(frame, None)
+        return epd.display_frames(None, frame)
+    return epd.display_frame_buf(frame, fast_ghosting=True)
+
+
+def display_fractal(epd, use_julia, keypad, cache):
+    """Display the fractal from cache, else compute it band by band.
+
+    Computed bands are streamed to the display as they are computed so
+    only one band and the cached frame are ever held in memory.
+    """
+    start_time = time.monotonic()
+    key = fractal_key(epd, use_julia)
+    size = epd.width * epd.height // 8
+    frame = cache.get(key, size)
+    if frame is not None:
+        show_frame(epd, frame, use_julia)
+        print('Cached frame upload took', time.monotonic() - start_time,
+              'seconds; refreshing.')
+        return
+    bands = fractal_backend().get_fractal_bands(
+        epd.width, epd.height, use_julia=use_julia,
+        fast_interior=FAST_INTERIOR)
+    bands = cache.capture_bands(key, _polling(keypad, bands), size)
+    if getattr(epd, 'colors', 2) > 2:
+        if use_julia:
+            epd.display_bands(bands, None)
+        else:
+            epd.display_bands(None, bands)
+    else:
+        epd.display_bands(bands)  # A single refresh; fast_ghosting.
+    print('Compute and upload took', time.monotonic() - start_time,
+          'seconds; refreshing.')
+
+
+def random_bitmap(epd):
+    """Returns a bitmap of the right kind for epd filled with noise."""
+    if getattr(epd, 'colors', 2) <= 2:
+        image = monobitmap.MonoBitmap(epd.width, epd.height)
+        raw_framebuf = image.bit_buf
+    else:
+        tricolorbitmap = startup.load('tricolorbitmap')
+        image = tricolorbitmap.TriColorBitmap(epd.width, epd.height)
+        raw_framebuf = image.buf  # Both planes.
+    for pos in range(len(raw_framebuf)):
+        raw_framebuf[pos] = random.randint(0, 255)
+    return image
+
+
+async def compute_fractal(width, height, use_julia):
+    """Compute a fractal bitmap, letting other tasks run between bands."""
+    image = monobitmap.MonoBitmap(width, height)
+    for y, rows in fractal_backend().get_fractal_bands(
+            width, height, use_julia=use_julia, fast_interior=FAST_INTERIOR):
+        image.set_bytes(0, y, rows)
+        await epdasync.asyncio.sleep(0)
+    return image
+
+
+async def show_fractal(epd, use_julia, cache):
+    """Display a fractal once any previous refresh finishes.
+
+    A fractal not in cache is computed meanwhile.
+    """
+    start_time = time.monotonic()
+    key = fractal_key(epd, use_julia)
+    frame = cache.get(key, epd.width * epd.height // 8)
+    if frame is None:
+        frame = (await compute_fractal(epd.width, epd.height,
+                                       use_julia)).bit_buf
+        cache.put(key, frame)
+    await show_frame(epd, frame, use_julia)
+    print('Compute and upload took', time.monotonic() - start_time,
+          'seconds; refreshing.')
+
+
+async def poll_keys(keypad):
+    """Sample the keys on their schedule forever."""
+    while True:
+        keypad.poll()
+        await epdasync.asyncio.sleep(keypad.interval_s)
+
+
+def next_key_press(keypad):
+    """Returns the number of the next key pressed or None if there's none."""
+    while True:
+        event = keypad.get_event()
+        if event is None:
+            return None
+        key, pressed, _ = event
+        if pressed:
+            return key
+
+
+def first_frame_shown():
+    """Reports the startup times and heap once the first frame is up."""
+    startup.mark('first frame')
+    startup.report()
+
+
+async def main_async():
+    """main() overlapping each refresh with the work for the next key."""
+    led = StatusLED()
+    led.busy()
+
+    connected_epd = startup.load(EPD_MODULE)
+    epd = epdasync.AsyncEPD(connected_epd.EPD())
+    print("Initializing display...")
+    epd.init()
+    keypad = buttons.Keypad()
+    cache = framecache.FrameCache(directory=FRAME_DIRECTORY)
+    epdasync.asyncio.create_task(poll_keys(keypad))
+    startup.mark('ready')
+    shown = False
+    while True:
+        led.ready()
+        print("Awaiting key1-key4 button press.")
+        wait_start = time.monotonic()
+        key = next_key_press(keypad)
+        while key is None:
+            await epdasync.asyncio.sleep(0.02)
+            key = next_key_press(keypad)
+        startup.exclude(time.monotonic() - wait_start)
+        led.busy()
+        if key == 0:
+            print("Computing and displaying Mandlebrot fractal.")
+            await show_fractal(epd, use_julia=False, cache=cache)
+        elif key == 1:
+            print("Setting display to white.")
+            await epd.wait_until_idle()
+            epd.clear_frame_memory(0xff)
+            await epd.display_frame()
+        elif key == 2:
+            image = random_bitmap(epd)
+            print("Displaying random framebuf.")
+            await epd.display_bitmap(image, fast_ghosting=True)
+            del image
+        elif key == 3:
+            print("Computing and displaying Julia fractal.")
+            await show_fractal(epd, use_julia=True, cache=cache)
+        if not shown:
+            first_frame_shown()
+            shown = True
+
+
 def main():
     led = StatusLED()
     led.busy()
 
+    connected_epd = startup.load(EPD_MODULE)
     epd = connected_epd.EPD()
+    # Return as soon as a refresh starts so the keys can be polled during it.
+    epd.defer_refresh_wait = True
     print("Initializing display...")
     epd.init()
     if HAVE_ASM:
@@ -98,61 +284,50 @@ def main():
     else:
       print("Pure Python implementation loaded.")
 
-    keys = [1,]  # Print message on start.
+    keypad = buttons.Keypad()
+    cache = framecache.FrameCache(directory=FRAME_DIRECTORY)
+    startup.mark('ready')
+    shown = False
     while True:
-        if any(keys):
-            led.ready()
-            print("Awaiting key1-key4 button press.")
-        keys = list(sample_keys())
-        if any(keys):
-            led.busy()
-
-        if keys[0]:
-            print("Computing Mandlebrot fractal.")
-            fractal_image = fractal.get_fractal(epd.width, epd.height,
-                                                use_julia=False)
-            print("Displaying.")
-            if getattr(epd, 'colors', 2) > 2:
-                epd.display_frames(None, fractal_image.bit_buf)
-            else:
-                epd.display_bitmap(fractal_image, fast_ghosting=True)
-            del fractal_image
-        elif keys[1]:
+        led.ready()
+        print("Awaiting key1-key4 button press.")
+        wait_start = time.monotonic()
+        key = None
+        while key is None:
+            keypad.poll()
+            key = next_key_press(keypad)
+            time.sleep(keypad.interval_s / 2)
+        startup.exclude(time.monotonic() - wait_start)
+        led.busy()
+        # Presses during the previous refresh are queued, not lost.
+        keypad.poll_while(epd.is_busy)
+
+        if key == 0:
+            print("Computing and displaying Mandlebrot fractal.")
+            display_fractal(epd, use_julia=False, keypad=keypad,
+                            cache=cache)
+        elif key == 1:
             print("Setting display to white.")
             epd.clear_frame_memory(0xff)
             epd.display_frame()
-        elif keys[2]:
-            raw_framebuf = bytearray(epd.fb_bytes)
-            for pos in range(len(raw_framebuf)):
-                raw_framebuf[pos] = random.randint(0, 255)
+        elif key == 2:
+            image = random_bitmap(epd)
             print("Displaying random framebuf.")
-            if getattr(epd, 'colors', 2) <= 2:
-                epd.display_frame_buf(raw_framebuf, fast_ghosting=True)
-            else:
-                raw_framebuf2 = bytearray(epd.fb_bytes)
-                for pos in range(len(raw_framebuf2)):
-                    raw_framebuf2[pos] = random.randint(0, 255)
-                epd.display_frames(raw_framebuf, raw_framebuf2)
-                del raw_framebuf2
-            del raw_framebuf
-        elif keys[3]:
-            print("Computing Julia fractal.")
-            fractal_image = fractal.get_fractal(epd.width, epd.height,
-                                                use_julia=True)
-            print("Displaying.")
-            if getattr(epd, 'colors', 2) > 2:
-                epd.display_frames(fractal_image.bit_buf, None)
-            else:
-                epd.display_bitmap(fractal_image, fast_ghosting=True)
-            del fractal_image
-        else:
-            # This effectively debounces the keys, we merely sample them
-            # rather than treat a state change as an interrupt.  If a key
-            # is not pressed for this duration it may not be noticed.
-            time.sleep(0.05)  # short time between polling.
+            epd.display_bitmap(image, fast_ghosting=True)
+            del image
+        elif key == 3:
+            print("Computing and displaying Julia fractal.")
+            display_fractal(epd, use_julia=True, keypad=keypad,
+                            cache=cache)
+        if not shown:
+            first_frame_shown()
+            shown = True
 
     print("Done.")
 
 
 if __name__ == '__main__':
-    main()
+    if epdasync.asyncio:
+        epdasync.run(main_async())
+    else:
+        main()
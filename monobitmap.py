@@ -18,12 +18,37 @@
 
 """A monochrome bitmap to represent display frame buffers."""
 
+try:
+    import numpy  # Only used if given numpy arrays; eg: on a CPython host.
+except ImportError:
+    numpy = None
+
+ROTATIONS = (0, 90, 180, 270)
+_TRANSPOSE = -1  # A rotated_bands() mode for transpose().
+
+
+def _reverse_bits(byte):
+    reversed_byte = 0
+    for _ in range(8):
+        reversed_byte = reversed_byte << 1 | byte & 1
+        byte >>= 1
+    return reversed_byte
+
+
+# Each byte with its pixels in the opposite order, for rotating by 180.
+_REVERSED_BITS = bytes(_reverse_bits(byte) for byte in range(256))
 
 class MonoBitmap:
     """A monochrome bitmap stored compactly.
 
+    The bitmap tracks the bounding box of the pixels modified via its methods
+    so that displays supporting partial updates need only upload that region.
+    set_pixel_untracked() skips that for speed; call mark_dirty() after.
+
     Attributes:
-      bit_buf: The raw bitmap buffer bytearray.  Do not resize!
+      bit_buf: The raw bitmap buffer bytearray (or the writable buffer given
+          to the constructor, eg: a memoryview of shared memory).  Do not
+          resize!
       width: The width.  Do not modify.
       height: The height.  Do not modify.
 
@@ -32,10 +57,18 @@ class MonoBitmap:
       hidden_cat.set_pixel(42, 23, 0)
       epd.display_frame_buf(hidden_cat.bit_buf)
     """
-    def __init__(self, width, height):
+    def __init__(self, width, height, buffer=None):
         self.width = width
         self.height = height
-        self.bit_buf = bytearray(width * height // 8)
+        if buffer is None:
+            self.bit_buf = bytearray(width * height // 8)
+        else:
+            if len(buffer) < width * height // 8:
+                raise ValueError('buffer of %d bytes is too small for %dx%d'
+                                 % (len(buffer), width, height))
+            self.bit_buf = buffer
+        self.clear_dirty()
+        self.mark_dirty()  # It has never been displayed.
 
     def set_pixel(self, x: int, y: int, value: bool) -> None:
         #assert self.width > x >= 0
@@ -49,3 +82,605 @@ class MonoBitmap:
             self.bit_buf[byte_idx] |= (1 << bit_no)
         else:
             self.bit_buf[byte_idx] &= ~(1 << bit_no)
+        if x < self._dirty_x0:
+            self._dirty_x0 = x
+        if x > self._dirty_x1:
+            self._dirty_x1 = x
+        if y < self._dirty_y0:
+            self._dirty_y0 = y
+        if y > self._dirty_y1:
+            self._dirty_y1 = y
+
+    def set_pixel_untracked(self, x: int, y: int, value: bool) -> None:
+        """set_pixel() without updating the dirty area; it is faster.
+
+        Use mark_dirty() once after setting pixels this way.
+        """
+        binary_idx = self.width * y + x
+        byte_idx = binary_idx >> 3
+        if value:
+            self.bit_buf[byte_idx] |= 0x80 >> (binary_idx & 7)
+        else:
+            self.bit_buf[byte_idx] &= ~(0x80 >> (binary_idx & 7))
+
+    def set_row(self, y: int, values) -> None:
+        """Set an entire row from a sequence of width 0 or 1 values."""
+        if len(values) != self.width:
+            raise ValueError('%d values for a row of %d pixels'
+                             % (len(values), self.width))
+        self.set_span(0, y, values)
+
+    def set_span(self, x: int, y: int, bits) -> None:
+        """Set consecutive pixels starting at x, y from a sequence of 0 or 1.
+
+        Pixels are packed and stored 8 at a time.  The span continues onto the
+        following rows if it extends past the right edge.  A numpy array of
+        any shape is flattened and packed using numpy.packbits.
+        """
+        if numpy and isinstance(bits, numpy.ndarray):
+            bits = bits.ravel()
+        num_bits = len(bits)
+        start = self.width * y + x
+        end = start + num_bits
+        if num_bits <= 0:
+            return
+        if end > len(self.bit_buf) * 8 or start < 0:
+            raise ValueError('span of %d at %d, %d is out of bounds'
+                             % (num_bits, x, y))
+        buf = self.bit_buf
+        i = 0
+        # Pixels before the first byte boundary.
+        while start & 7 and i < num_bits:
+            mask = 0x80 >> (start & 7)
+            if bits[i]:
+                buf[start >> 3] |= mask
+            else:
+                buf[start >> 3] &= ~mask
+            start += 1
+            i += 1
+        byte_idx = start >> 3
+        whole_bytes = (num_bits - i) >> 3
+        if numpy and isinstance(bits, numpy.ndarray):
+            packed = numpy.packbits(bits[i:i + whole_bytes * 8] != 0)
+            buf[byte_idx:byte_idx + whole_bytes] = packed.tobytes()
+            i += whole_bytes * 8
+            byte_idx += whole_bytes
+        else:
+            for byte_idx in range(byte_idx, byte_idx + whole_bytes):
+                buf[byte_idx] = (bits[i] << 7 | bits[i+1] << 6 |
+                                 bits[i+2] << 5 | bits[i+3] << 4 |
+                                 bits[i+4] << 3 | bits[i+5] << 2 |
+                                 bits[i+6] << 1 | bits[i+7])
+                i += 8
+            if whole_bytes:
+                byte_idx += 1
+        # Pixels after the last byte boundary.
+        bit = 0x80
+        while i < num_bits:
+            if bits[i]:
+                buf[byte_idx] |= bit
+            else:
+                buf[byte_idx] &= ~bit
+            bit >>= 1
+            i += 1
+        self._mark_span_dirty(end - num_bits, end)
+
+    def fill_span(self, x: int, y: int, length: int, value: bool) -> None:
+        """Set length consecutive pixels starting at x, y to value.
+
+        Whole bytes are filled at once with only the edge bytes masked.  The
+        span continues onto the following rows if it extends past the right
+        edge.
+        """
+        if length <= 0:
+            return
+        start = self.width * y + x
+        end = start + length
+        if end > len(self.bit_buf) * 8 or start < 0:
+            raise ValueError('span of %d at %d, %d is out of bounds'
+                             % (length, x, y))
+        self._fill_bits(start, end, value,
+                        (b'\xff' if value else b'\x00') * (length // 8 + 1))
+        self._mark_span_dirty(start, end)
+
+    def _fill_bits(self, start, end, value, fill):
+        """Set bits start until end to value; no checks, nothing marked.
+
+        fill: A buffer of at least (end - start) // 8 bytes all 0xff or 0
+            matching value, so callers can make it once for many spans.
+        """
+        buf = self.bit_buf
+        first = start >> 3
+        last = (end - 1) >> 3
+        head = 0xff >> (start & 7)  # The bits from start in its byte.
+        tail = (0xff00 >> (((end - 1) & 7) + 1)) & 0xff  # Up to end - 1.
+        if first == last:
+            head &= tail
+        if value:
+            buf[first] |= head
+        else:
+            buf[first] &= ~head
+        if first != last:
+            if last - first > 1:
+                buf[first + 1:last] = fill[:last - first - 1]
+            if value:
+                buf[last] |= tail
+            else:
+                buf[last] &= ~tail
+
+    def _row_fill(self, value):
+        """A buffer for _fill_bits() long enough for any span in a row."""
+        return memoryview((b'\xff' if value else b'\x00') *
+                          (self.width // 8 + 1))
+
+    def draw_horizontal_line(self, x, y, width, value):
+        """Draw a line clipped to the bitmap."""
+        if y < 0 or y >= self.height:
+            return
+        if x < 0:
+            width += x
+            x = 0
+        width = min(width, self.width - x)
+        if width <= 0:
+            return
+        start = self.width * y + x
+        self._fill_bits(start, start + width, value, self._row_fill(value))
+        self.mark_dirty(x, y, width, 1)
+
+    def draw_vertical_line(self, x, y, height, value):
+        """Draw a line clipped to the bitmap."""
+        if x < 0 or x >= self.width:
+            return
+        y_end = min(y + height, self.height)
+        y = max(y, 0)
+        if y >= y_end:
+            return
+        buf = self.bit_buf
+        width = self.width
+        if width & 7:  # The bit moves within the bytes from row to row.
+            for idx in range(width * y + x, width * y_end + x, width):
+                if value:
+                    buf[idx >> 3] |= 0x80 >> (idx & 7)
+                else:
+                    buf[idx >> 3] &= ~(0x80 >> (idx & 7))
+        else:
+            idx = width * y + x
+            mask = 0x80 >> (idx & 7)
+            row_bytes = width >> 3
+            if value:
+                for byte_idx in range(idx >> 3, (width * y_end) >> 3,
+                                      row_bytes):
+                    buf[byte_idx] |= mask
+            else:
+                mask ^= 0xff
+                for byte_idx in range(idx >> 3, (width * y_end) >> 3,
+                                      row_bytes):
+                    buf[byte_idx] &= mask
+        self.mark_dirty(x, y, 1, y_end - y)
+
+    def draw_line(self, x0, y0, x1, y1, value):
+        """Draw a line between two points inclusive, clipped to the bitmap.
+
+        Bresenham's algorithm; horizontal runs of the line are filled as
+        spans.
+        """
+        if y0 == y1:
+            self.draw_horizontal_line(min(x0, x1), y0, abs(x1 - x0) + 1,
+                                      value)
+            return
+        if x0 == x1:
+            self.draw_vertical_line(x0, min(y0, y1), abs(y1 - y0) + 1, value)
+            return
+        self._mark_box_dirty(x0, y0, x1, y1)
+        if abs(x1 - x0) >= abs(y1 - y0):
+            if x0 > x1:  # Go left to right so runs are spans.
+                x0, y0, x1, y1 = x1, y1, x0, y0
+            fill = self._row_fill(value)
+            width, height = self.width, self.height
+            dx = x1 - x0
+            dy = abs(y1 - y0)
+            sy = 1 if y0 < y1 else -1
+            err = dx // 2
+            run_start = x0
+            for x in range(x0, x1 + 1):
+                err -= dy
+                if err < 0 or x == x1:  # The run at y0 ends at x.
+                    if 0 <= y0 < height:
+                        start = max(run_start, 0)
+                        end = min(x + 1, width)
+                        if start < end:
+                            self._fill_bits(width * y0 + start,
+                                            width * y0 + end, value, fill)
+                    y0 += sy
+                    err += dx
+                    run_start = x + 1
+            return
+        # Steep: one pixel per row.
+        if y0 > y1:
+            x0, y0, x1, y1 = x1, y1, x0, y0
+        buf = self.bit_buf
+        width, height = self.width, self.height
+        dx = abs(x1 - x0)
+        dy = y1 - y0
+        sx = 1 if x0 < x1 else -1
+        err = dy // 2
+        x = x0
+        for y in range(y0, y1 + 1):
+            if 0 <= x < width and 0 <= y < height:
+                idx = width * y + x
+                if value:
+                    buf[idx >> 3] |= 0x80 >> (idx & 7)
+                else:
+                    buf[idx >> 3] &= ~(0x80 >> (idx & 7))
+            err -= dx
+            if err < 0:
+                x += sx
+                err += dy
+
+    def draw_rectangle(self, x0, y0, x1, y1, value):
+        """Draw the outline of the rectangle with inclusive corners."""
+        x0, x1 = min(x0, x1), max(x0, x1)
+        y0, y1 = min(y0, y1), max(y0, y1)
+        self.draw_horizontal_line(x0, y0, x1 - x0 + 1, value)
+        self.draw_horizontal_line(x0, y1, x1 - x0 + 1, value)
+        self.draw_vertical_line(x0, y0 + 1, y1 - y0 - 1, value)
+        self.draw_vertical_line(x1, y0 + 1, y1 - y0 - 1, value)
+
+    def draw_filled_rectangle(self, x0, y0, x1, y1, value):
+        """Fill the rectangle with inclusive corners, clipped to the bitmap."""
+        x0, x1 = max(min(x0, x1), 0), min(max(x0, x1), self.width - 1)
+        y0, y1 = max(min(y0, y1), 0), min(max(y0, y1), self.height - 1)
+        if x0 > x1 or y0 > y1:
+            return
+        width = self.width
+        if width & 7:
+            fill = self._row_fill(value)
+            for y in range(y0, y1 + 1):
+                self._fill_bits(width * y + x0, width * y + x1 + 1, value,
+                                fill)
+        else:
+            # Every row has the same edge masks, just a row further on.
+            buf = self.bit_buf
+            row_bytes = width >> 3
+            first = x0 >> 3
+            last = x1 >> 3
+            head = 0xff >> (x0 & 7)
+            tail = (0xff00 >> ((x1 & 7) + 1)) & 0xff
+            if first == last:
+                head &= tail
+            middle = last - first - 1
+            fill = (b'\xff' if value else b'\x00') * max(middle, 0)
+            if not value:
+                head ^= 0xff
+                tail ^= 0xff
+            for row in range(y0 * row_bytes, (y1 + 1) * row_bytes,
+                             row_bytes):
+                if value:
+                    buf[row + first] |= head
+                else:
+                    buf[row + first] &= head
+                if first != last:
+                    if middle:
+                        buf[row + first + 1:row + last] = fill
+                    if value:
+                        buf[row + last] |= tail
+                    else:
+                        buf[row + last] &= tail
+        self.mark_dirty(x0, y0, x1 - x0 + 1, y1 - y0 + 1)
+
+    def _circle_rows(self, radius):
+        """Yields (dy, outer, inner) for each row of a quarter circle.
+
+        Bresenham's algorithm; row dy of the outline covers the x offsets
+        inner through outer.  The circle is that mirrored both ways.
+        """
+        x_pos = -radius
+        y_pos = 0
+        err = 2 - 2 * radius
+        row_y = 0
+        outer = radius
+        while True:
+            if y_pos != row_y:
+                yield row_y, outer, inner
+                row_y = y_pos
+                outer = -x_pos
+            inner = -x_pos
+            e2 = err
+            if e2 <= y_pos:
+                y_pos += 1
+                err += y_pos * 2 + 1
+                if -x_pos == y_pos and e2 <= x_pos:
+                    e2 = 0
+            if e2 > x_pos:
+                x_pos += 1
+                err += x_pos * 2 + 1
+            if x_pos > 0:
+                break
+        yield row_y, outer, inner
+
+    def draw_circle(self, x, y, radius, value):
+        """Draw a circle outline clipped to the bitmap, as spans per row."""
+        if radius < 0:
+            return
+        fill = self._row_fill(value)
+        width, height = self.width, self.height
+        for dy, outer, inner in self._circle_rows(radius):
+            for row in ((y + dy, y - dy) if dy else (y,)):
+                if not 0 <= row < height:
+                    continue
+                for start, end in ((x - outer, x - inner + 1),
+                                   (x + inner, x + outer + 1)):
+                    start = max(start, 0)
+                    end = min(end, width)
+                    if start < end:
+                        self._fill_bits(width * row + start,
+                                        width * row + end, value, fill)
+        self._mark_box_dirty(x - radius, y - radius, x + radius, y + radius)
+
+    def draw_filled_circle(self, x, y, radius, value):
+        """Fill a circle clipped to the bitmap, a span per row."""
+        if radius < 0:
+            return
+        fill = self._row_fill(value)
+        width, height = self.width, self.height
+        for dy, outer, _ in self._circle_rows(radius):
+            start = max(x - outer, 0)
+            end = min(x + outer + 1, width)
+            if start >= end:
+                continue
+            for row in ((y + dy, y - dy) if dy else (y,)):
+                if 0 <= row < height:
+                    self._fill_bits(width * row + start, width * row + end,
+                                    value, fill)
+        self._mark_box_dirty(x - radius, y - radius, x + radius, y + radius)
+
+    def _mark_box_dirty(self, x0, y0, x1, y1):
+        """Mark the box with inclusive corners, clipped, as dirty."""
+        x0, x1 = max(min(x0, x1), 0), min(max(x0, x1), self.width - 1)
+        y0, y1 = max(min(y0, y1), 0), min(max(y0, y1), self.height - 1)
+        self.mark_dirty(x0, y0, x1 - x0 + 1, y1 - y0 + 1)
+
+    def draw_text(self, x, y, text, font, value, background=None):
+        """Draw text in a bitmapfont.BitmapFont; see its draw_text()."""
+        return font.draw_text(self, x, y, text, value, background)
+
+    def set_bytes(self, x: int, y: int, data) -> None:
+        """Copy packed pixel bytes into the bitmap at x, y.
+
+        The position must be on a byte boundary (x a multiple of 8 when the
+        width is).  Like a span it continues onto the following rows.
+        """
+        start = self.width * y + x
+        if start & 7:
+            raise ValueError('%d, %d is not on a byte boundary' % (x, y))
+        end = start + len(data) * 8
+        if end > len(self.bit_buf) * 8 or start < 0:
+            raise ValueError('%d bytes at %d, %d is out of bounds'
+                             % (len(data), x, y))
+        self.bit_buf[start >> 3:end >> 3] = data
+        self._mark_span_dirty(start, end)
+
+    def rotate(self, angle, out=None):
+        """Returns a copy of the bitmap rotated clockwise by angle degrees.
+
+        Args:
+          angle: One of ROTATIONS.  90 and 270 swap the width and height and
+              need a height that is a multiple of 8; 0 and 180 need a width
+              that is.
+          out: A bitmap of the rotated size to write into instead of
+              allocating a new one.
+
+        Pixels are moved as 8x8 blocks: each is 8 bytes loaded from 8 rows,
+        transposed with a few shifts and masks and stored as 8 bytes.
+        """
+        if angle not in ROTATIONS:
+            raise ValueError('rotation %r is not one of %r'
+                             % (angle, ROTATIONS))
+        return self._rotated(angle, out)
+
+    def transpose(self, out=None):
+        """Returns a copy flipped about the top left to bottom right diagonal.
+
+        Pixel x, y becomes y, x.  See rotate() for out and the size limits.
+        """
+        return self._rotated(_TRANSPOSE, out)
+
+    def _rotated(self, mode, out):
+        if mode in (0, 180):
+            width, height = self.width, self.height
+        else:
+            width, height = self.height, self.width
+        if out is None:
+            out = type(self)(width, height)
+        elif out.width != width or out.height != height:
+            raise ValueError('%dx%d bitmap for a %dx%d result'
+                             % (out.width, out.height, width, height))
+        else:
+            out.mark_dirty()
+        buf = out.bit_buf
+        row_bytes = width >> 3
+        for y, rows in self._bands(mode):
+            buf[y * row_bytes:y * row_bytes + len(rows)] = rows
+        return out
+
+    def rotated_bands(self, angle):
+        """Yields the bitmap rotated clockwise by angle as (y, rows) bands.
+
+        Like fractal.get_fractal_bands() each band is 8 packed rows of the
+        result (fewer at the bottom) in a buffer that is reused, so only
+        valid until the next is requested.  A display's display_bands()
+        takes them, rotating as the rows are streamed without a second
+        frame buffer.  See rotate() for angle.
+        """
+        if angle not in ROTATIONS:
+            raise ValueError('rotation %r is not one of %r'
+                             % (angle, ROTATIONS))
+        return self._bands(angle)
+
+    def _bands(self, mode):
+        width, height = self.width, self.height
+        if mode in (0, 180):
+            if width & 7:
+                raise ValueError('width %d is not a multiple of 8' % width)
+            row_bytes = width >> 3
+            band_bytes = 8 * row_bytes
+            size = height * row_bytes
+            if mode == 0:
+                buf = memoryview(self.bit_buf)
+                for start in range(0, size, band_bytes):
+                    yield (start // row_bytes,
+                           buf[start:min(start + band_bytes, size)])
+                return
+            band = bytearray(band_bytes)
+            for start in range(0, size, band_bytes):
+                count = min(band_bytes, size - start)
+                # The last bytes of the bitmap, reversed, are the first.
+                self._reverse_bytes(size - start - count, count, band)
+                yield start // row_bytes, memoryview(band)[:count]
+            return
+        if height & 7:
+            raise ValueError('height %d is not a multiple of 8' % height)
+        band_row_bytes = height >> 3
+        band = bytearray(8 * band_row_bytes)
+        for y in range(0, width, 8):
+            # 270 reads the columns from the right hand side.
+            self._rotate_band(width - 8 - y if mode == 270 else y, mode, band)
+            rows = min(8, width - y)
+            yield y, memoryview(band)[:rows * band_row_bytes]
+
+    def _reverse_bytes(self, start, count, band):
+        """Copy count bytes from start into band in reverse, bits and all."""
+        buf = self.bit_buf
+        reversed_bits = _REVERSED_BITS
+        end = start + count - 1
+        for i in range(count):
+            band[i] = reversed_bits[buf[end - i]]
+
+    def _rotate_band(self, x, mode, band):
+        """Turn pixel columns x to x + 7 into the 8 rows of band.
+
+        mode is 90 or 270 to rotate, where the caller passes the columns
+        counting from the right, or _TRANSPOSE.  Columns outside the bitmap
+        make rows past the end of the result that the caller drops.
+        """
+        buf = self.bit_buf
+        width = self.width
+        row_bytes = width >> 3
+        columns = self.height >> 3  # Both 8x8 blocks and bytes per band row.
+        offsets = list(range(0, 8 * columns, columns))
+        if mode == 270:
+            offsets.reverse()
+        o0, o1, o2, o3, o4, o5, o6, o7 = offsets
+        aligned = x >= 0 and not (width | x) & 7
+        for block in range(columns):
+            bit = 8 * block * width + x
+            if aligned:
+                i = bit >> 3
+                r0 = buf[i]
+                r1 = buf[i + row_bytes]
+                i += 2 * row_bytes
+                r2 = buf[i]
+                r3 = buf[i + row_bytes]
+                i += 2 * row_bytes
+                r4 = buf[i]
+                r5 = buf[i + row_bytes]
+                i += 2 * row_bytes
+                r6 = buf[i]
+                r7 = buf[i + row_bytes]
+            else:
+                r0, r1, r2, r3, r4, r5, r6, r7 = [
+                    self._byte_at(bit + row * width) for row in range(8)]
+            if mode == 90:
+                # The bottom row becomes the leftmost column.
+                r0, r1, r2, r3, r4, r5, r6, r7 = r7, r6, r5, r4, r3, r2, r1, r0
+                column = columns - 1 - block
+            else:
+                column = block
+            # Row pairs as 16 bit words; swap the top right and bottom left
+            # 4x4 quarters, then the 2x2 and 1x1 quarters of those.
+            a = r0 << 8 | r1
+            b = r2 << 8 | r3
+            c = r4 << 8 | r5
+            d = r6 << 8 | r7
+            t = (a ^ c >> 4) & 0x0f0f
+            a ^= t
+            c ^= t << 4
+            t = (b ^ d >> 4) & 0x0f0f
+            b ^= t
+            d ^= t << 4
+            t = (a ^ b >> 2) & 0x3333
+            a ^= t
+            b ^= t << 2
+            t = (c ^ d >> 2) & 0x3333
+            c ^= t
+            d ^= t << 2
+            t = (a >> 8 ^ a >> 1) & 0x55
+            a ^= t << 8 | t << 1
+            t = (b >> 8 ^ b >> 1) & 0x55
+            b ^= t << 8 | t << 1
+            t = (c >> 8 ^ c >> 1) & 0x55
+            c ^= t << 8 | t << 1
+            t = (d >> 8 ^ d >> 1) & 0x55
+            d ^= t << 8 | t << 1
+            band[o0 + column] = a >> 8
+            band[o1 + column] = a & 0xff
+            band[o2 + column] = b >> 8
+            band[o3 + column] = b & 0xff
+            band[o4 + column] = c >> 8
+            band[o5 + column] = c & 0xff
+            band[o6 + column] = d >> 8
+            band[o7 + column] = d & 0xff
+
+    def _byte_at(self, bit):
+        """The 8 pixels from bit index bit on as a byte; 0s outside."""
+        buf = self.bit_buf
+        i = bit >> 3
+        high = buf[i] if 0 <= i < len(buf) else 0
+        low = buf[i + 1] if 0 <= i + 1 < len(buf) else 0
+        return (high << 8 | low) >> (8 - (bit & 7)) & 0xff
+
+    def _mark_span_dirty(self, start, end):
+        """Mark the pixels from bit index start until end as dirty."""
+        width = self.width
+        y, x = divmod(start, width)
+        y_last, x_last = divmod(end - 1, width)
+        if y == y_last:
+            self.mark_dirty(x, y, x_last - x + 1, 1)
+        else:
+            self.mark_dirty(0, y, width, y_last - y + 1)
+
+    def mark_dirty(self, x=0, y=0, width=None, height=None):
+        """Add a region to the dirty area; the entire bitmap by default.
+
+        Use this after modifying bit_buf directly.
+        """
+        if width is None:
+            width = self.width - x
+        if height is None:
+            height = self.height - y
+        if width <= 0 or height <= 0:
+            return
+        if self._dirty_x1 < 0:
+            self._dirty_x0, self._dirty_y0 = x, y
+            self._dirty_x1, self._dirty_y1 = x + width - 1, y + height - 1
+            return
+        self._dirty_x0 = min(self._dirty_x0, x)
+        self._dirty_y0 = min(self._dirty_y0, y)
+        self._dirty_x1 = max(self._dirty_x1, x + width - 1)
+        self._dirty_y1 = max(self._dirty_y1, y + height - 1)
+
+    def clear_dirty(self):
+        """Forget about all modifications; the displays call this."""
+        self._dirty_x0, self._dirty_y0 = self.width, self.height
+        self._dirty_x1 = self._dirty_y1 = -1
+
+    def dirty_rect(self):
+        """Returns the modified area or None if nothing has been modified.
+
+        The area is an inclusive (x_start, y_start, x_end, y_end) tuple widened
+        to whole bytes: x_start is a multiple of 8 and x_end + 1 is as well.
+        """
+        if self._dirty_x1 < 0:
+            return None
+        return (self._dirty_x0 & ~7, self._dirty_y0,
+                self._dirty_x1 | 7, self._dirty_y1)
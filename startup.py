@@ -0,0 +1,97 @@
+# python3: CircuitPython 3.0
+
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Measure the time and heap each import and step of starting up takes.
+
+Importing is a large part of the time from reset to the first frame on a
+board: each .py is read from flash and compiled on the device, leaving
+garbage behind.  Modules imported through load() are timed and the heap they
+keep is measured; mark() notes the time since startup was first imported
+at each step.  That excludes the firmware boot and boot.py; import startup
+first to count the rest.
+
+Usage:
+  import startup
+  startup.mark('main.py')
+  epd2in7 = startup.load('third_party.waveshare.epd2in7')
+  ...
+  startup.mark('first frame')
+  startup.report()
+
+A module that load() imports itself imports others, which are counted in its
+own numbers; a module already imported costs nothing.  Heap numbers need
+gc.mem_free(), so are None off the device.
+"""
+
+import gc
+import time
+
+# Not 0.0: CircuitPython's monotonic clock keeps running across soft and
+# auto reloads.
+_START_TIME = time.monotonic()
+_imports = []  # (name, seconds, heap bytes kept)
+_marks = []  # (label, seconds since start, heap bytes free)
+_excluded_s = 0.0
+
+
+def _mem_free():
+    """The free heap after a collection, or None without gc.mem_free()."""
+    if not hasattr(gc, 'mem_free'):
+        return None
+    gc.collect()
+    return gc.mem_free()
+
+
+def since_start():
+    """Seconds since import, not counting those given to exclude()."""
+    return time.monotonic() - _START_TIME - _excluded_s
+
+
+def load(name):
+    """Imports and returns the module name, eg: 'asm_thumb.fractal'.
+
+    Raises whatever the import raises, unrecorded, so callers can fall back.
+    """
+    free = _mem_free()
+    start_time = time.monotonic()
+    module = __import__(name)
+    for attr in name.split('.')[1:]:
+        module = getattr(module, attr)
+    seconds = time.monotonic() - start_time
+    kept = None if free is None else free - _mem_free()
+    _imports.append((name, seconds, kept))
+    return module
+
+
+def mark(label):
+    """Notes the time since start and free heap as label."""
+    _marks.append((label, since_start(), _mem_free()))
+
+
+def exclude(seconds):
+    """Leaves seconds, eg: spent waiting on a key press, out of later marks."""
+    global _excluded_s
+    _excluded_s += seconds
+
+
+def report():
+    """Prints the imports and marks recorded so far."""
+    print('{:32} {:>9} {:>8}'.format('import', 'ms', 'heap'))
+    for name, seconds, kept in _imports:
+        print('{:32} {:9.1f} {:>8}'.format(name, seconds * 1000, str(kept)))
+    print('{:32} {:>9} {:>8}'.format('since start', 'ms', 'free'))
+    for label, seconds, free in _marks:
+        print('{:32} {:9.1f} {:>8}'.format(label, seconds * 1000, str(free)))
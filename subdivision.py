@@ -0,0 +1,110 @@
+# python3: CircuitPython 3.0
+
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Mariani-Silver subdivision shared by the fractal engines.
+
+Kept apart from fractal.py so the asm_thumb engines can use it without
+loading the pure Python one.
+"""
+
+import array
+
+
+def new_counts(width, height, max_iterations):
+    """Returns a zeroed iteration count cache for render_subdivided()."""
+    if max_iterations + 2 <= 0xff:
+        return bytearray(width * height)
+    return array.array('H', bytes(width * height * 2))
+
+
+def render_subdivided(fractal, counts, compute_span, min_size=4):
+    """Mariani-Silver rendering: iterate rectangle borders, fill interiors.
+
+    A rectangle whose border pixels all escape at the same iteration (or
+    never) is filled with that parity without iterating its interior.
+    Otherwise it is split in half across its longer side, the dividing line
+    is iterated and both halves are processed the same way.  Rectangles
+    narrower than min_size are iterated in full.
+
+    This assumes the regions of equal iteration count are connected.  Detail
+    smaller than a rectangle whose border is uniform is missed, so the result
+    is not always exact: 1 pixel of a 400x600 Mandlebrot differs from the
+    per-pixel render.
+
+    Args:
+      fractal: The MonoBitmap to fill in.
+      counts: new_counts() sized for fractal; 0 means not computed yet,
+          otherwise the iteration number + 2.
+      compute_span: A function(x_start, x_end, y) that iterates the pixels
+          in row y from x_start until x_end, setting them in fractal and
+          their counts.
+
+    Returns:
+      The number of pixels iterated.
+    """
+    width = fractal.width
+    x1 = width - 1
+    y1 = fractal.height - 1
+    # Each rectangle on the stack is inclusive and its border is computed.
+    compute_span(0, width, 0)
+    compute_span(0, width, y1)
+    for y in range(1, y1):
+        compute_span(0, 1, y)
+        compute_span(x1, width, y)
+    iterated = 2 * width + 2 * (y1 - 1)
+    fill_span = fractal.fill_span
+    stack = [(0, 0, x1, y1)]
+    while stack:
+        x0, y0, x1, y1 = stack.pop()
+        inner_width = x1 - x0 - 1
+        inner_height = y1 - y0 - 1
+        if inner_width <= 0 or inner_height <= 0:
+            continue
+        top = y0 * width
+        bottom = y1 * width
+        n = counts[top + x0]
+        uniform = True
+        for x in range(x0, x1 + 1):
+            if counts[top + x] != n or counts[bottom + x] != n:
+                uniform = False
+                break
+        if uniform:
+            for offset in range(top + width, bottom, width):
+                if counts[offset + x0] != n or counts[offset + x1] != n:
+                    uniform = False
+                    break
+        if uniform:
+            value = (n - 2) & 1
+            for y in range(y0 + 1, y1):
+                fill_span(x0 + 1, y, inner_width, value)
+        elif inner_width < min_size or inner_height < min_size:
+            for y in range(y0 + 1, y1):
+                compute_span(x0 + 1, x1, y)
+            iterated += inner_width * inner_height
+        elif inner_width >= inner_height:
+            x_mid = (x0 + x1) // 2
+            for y in range(y0 + 1, y1):
+                compute_span(x_mid, x_mid + 1, y)
+            iterated += inner_height
+            stack.append((x0, y0, x_mid, y1))
+            stack.append((x_mid, y0, x1, y1))
+        else:
+            y_mid = (y0 + y1) // 2
+            compute_span(x0 + 1, x1, y_mid)
+            iterated += inner_width
+            stack.append((x0, y0, x1, y_mid))
+            stack.append((x0, y_mid, x1, y1))
+    return iterated
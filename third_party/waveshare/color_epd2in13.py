@@ -29,6 +29,7 @@
 import time
 
 from . import epdif
+from . import shadowram
 
 # EPD2IN13B commands
 PANEL_SETTING                               = 0x00
@@ -73,72 +74,110 @@ class EPD:
     width = 104
     height = 212
     colors = 3
+    # Data is streamed with CS held low like the Adafruit EPD driver does.
+    cs_per_byte = False
+    # Bytes per chip select transaction when not cs_per_byte; 0 for all.
+    spi_chunk_size = 0
+    # Remember what was sent in order to skip unchanged frames.  This costs
+    # two frame buffers worth of RAM once whole frame buffers are sent
+    # (streamed bands never allocate them); set False on boards that can't
+    # spare it.
+    shadow_ram = True
+    # True to return as soon as a refresh starts rather than waiting for it;
+    # the next command waits instead.  See epdasync.AsyncEPD.
+    defer_refresh_wait = False
+    # Degrees clockwise display_bitmap() turns bitmaps to fit the panel; eg:
+    # 90 or 270 to show a landscape bitmap.  Rows are rotated as they are
+    # streamed, see MonoBitmap.rotated_bands().
+    rotation = 0
 
-    def __init__(self):
-        self.reset_pin = epdif.RST_PIN
-        self.dc_pin = epdif.DC_PIN
-        self.busy_pin = epdif.BUSY_PIN
+    def __init__(self, io=None):
+        """io: The panel's epdif.EPDIO; the default one when None."""
+        self.io = io
+        self.reset_pin = None
+        self.dc_pin = None
+        self.busy_pin = None
+        self.rows_sent = 0
+        self.rows_skipped = 0
+        # Black and tinted planes.
+        self._shadows = tuple(
+                shadowram.ShadowRam(self.width, self.height,
+                                    enabled=self.shadow_ram)
+                for _ in range(2))
+        self._displayed = False  # Has the RAM been displayed?
+        self._refreshing = False  # A deferred refresh wait is pending.
+        self._init_commands = self.init_commands + b''.join((
+                epdif.command(RESOLUTION_SETTING,
+                              self.height.to_bytes(2, 'little') +
+                              self.width.to_bytes(2, 'little')),
+                epdif.command(VCM_DC_SETTING, b'\x0a')))  # Adafruit EPD
+
+    # epdif.EPDIO.run_commands() tables; init() adds the RESOLUTION_SETTING
+    # for the size.  The LUTs are the controller's own.
+    init_commands = (
+        b'\x01\x05\x03\x00\x2b\x2b\x09'  # POWER_SETTING  Adafruit EPD
+        b'\x06\x03\x17\x17\x17'  # BOOSTER_SOFT_START
+        b'\x04\x40'  # POWER_ON, wait until idle
+        b'\x00\x01\xcf'  # PANEL_SETTING  Adafruit EPD (Q: what does it do?)
+        b'\x50\x01\x37'  # VCOM_AND_DATA_INTERVAL_SETTING
+        b'\x30\x01\x29'  # PLL_CONTROL  Adafruit EPD
+    )
+    sleep_commands = (
+        b'\x50\x01\x37'  # VCOM_AND_DATA_INTERVAL_SETTING
+        b'\x82\x01\x00'  # VCM_DC_SETTING: to solve Vcom drop
+        b'\x01\x44\x02\x00\x00\x00'  # POWER_SETTING: external gate, wait idle
+        b'\x02\x00'  # POWER_OFF
+    )
 
     def _delay_ms(self, ms):
         time.sleep(ms / 1000.)
 
     def _send_command(self, command):
+        if self._refreshing:
+            self.wait_until_idle()
         self.dc_pin.value = 0
-        epdif.spi_transfer(command.to_bytes(1, 'big'))
+        self.io.spi_write_byte(command)
 
     def _send_data(self, data):
         self.dc_pin.value = 1
         if isinstance(data, int):
-            epdif.spi_transfer(data.to_bytes(1, 'big'))
+            self.io.spi_write_byte(data)
+        elif self.cs_per_byte:
+            self.io.spi_write_cs_per_byte(data)
         else:
-            # The EPD needs CS to cycle hi between every byte so we loop doing
-            # one byte transfers to cause that.  Not efficient, but it makes
-            # it work.  Data sheets say needs to be at least a 60ns CS pulse.
-            for i in range(len(data)):
-                epdif.spi_transfer(data[i:i+1])
+            self.io.spi_write(data, self.spi_chunk_size)
 
     @property
     def fb_bytes(self):
         return self.width * self.height // 8
 
     def init(self):
-        try:
-            epdif.epd_io_bus_init()
-        except RuntimeError:
-            pass  # It avoids global io bus reinitialization.  Good.
-        self.reset_pin = epdif.RST_PIN
-        self.dc_pin = epdif.DC_PIN
-        self.busy_pin = epdif.BUSY_PIN
+        if self.io is None:
+            self.io = epdif.default_io()
+        self.reset_pin = self.io.rst_pin
+        self.dc_pin = self.io.dc_pin
+        self.busy_pin = self.io.busy_pin
+        for shadow in self._shadows:
+            shadow.invalidate()
+        self._displayed = False
         self.reset()
-        self._send_command(POWER_SETTING)  # Adafruit EPD
-        self._send_data(b'\x03\x00\x2b\x2b\x09')  # Adafruit EPD
-        self._send_command(BOOSTER_SOFT_START)
-        self._send_data(b'\x17\x17\x17')
-        self._send_command(POWER_ON)
-        self.wait_until_idle()
-        # Q: what does this setting do?
-        self._send_command(PANEL_SETTING)
-        self._send_data(0xCF)  # Adafruit EPD
-        #self._send_data(0x8F)
-        self._send_command(VCOM_AND_DATA_INTERVAL_SETTING)
-        self._send_data(0x37)
-        self._send_command(PLL_CONTROL)  # Adafruit EPD
-        self._send_data(0x29)  # Adafruit EPD
-        self._send_command(RESOLUTION_SETTING)
-        self._send_data(self.height.to_bytes(2, 'little'))
-        self._send_data(self.width.to_bytes(2, 'little'))
-        self._send_command(VCM_DC_SETTING)  # Adafruit EPD
-        self._send_data(0x0A)  # Adafruit EPD
+        self.io.run_commands(self._init_commands, self.cs_per_byte,
+                             self.wait_until_idle)
+
+    def is_busy(self):
+        return self.busy_pin.value == 1      # 0: idle, 1: busy
 
     def wait_until_idle(self):
-        while self.busy_pin.value == 1:      # 0: idle, 1: busy
+        while self.is_busy():
             self._delay_ms(10)
+        self._refreshing = False
 
     def reset(self):
         self.reset_pin.value = 0         # module reset
-        self._delay_ms(200)
+        self._delay_ms(10)  # Waveshare's later drivers pulse it for 2-10ms.
         self.reset_pin.value = 1
         self._delay_ms(200)
+        self._refreshing = False
 
     def clear_frame_memory(self, pattern: int, tint_pattern: int = -1):
         self._send_command(DATA_START_TRANSMISSION_1)
@@ -155,151 +194,107 @@ class EPD:
         for j in range(self.height):
             self._send_data(row)
         self._delay_ms(2)
-
-    # TODO An API that takes a two bits per pixel image input would be good.
+        self._shadows[0].fill(pattern)
+        self._shadows[1].fill(tint_pattern)
+        self._displayed = False
 
     def display_frame(self):
         self.display_frames(None, None)
 
     def display_frames(self, frame_buffer_black, frame_buffer_red):
-        # TODO: assert buffer lengths and _send_data all of it w/o loop?
-        if frame_buffer_black:
-            self._send_command(DATA_START_TRANSMISSION_1)
-            self._delay_ms(2)
-            for i in range(0, self.width * self.height / 8):
-                self._send_data(frame_buffer_black[i])
-            self._delay_ms(2)
-        if frame_buffer_red:
-            self._send_command(DATA_START_TRANSMISSION_2)
+        """Upload the given frame buffers (None to skip one) and display.
+
+        The controller streams each plane from its start so there is no
+        skipping individual rows, but nothing is done when the display
+        already shows the given frame buffers.
+        """
+        frames = (frame_buffer_black, frame_buffer_red)
+        if self._already_displayed(frames):
+            self.rows_skipped += self.height * (bool(frame_buffer_black) +
+                                                bool(frame_buffer_red))
+            return
+        for command, shadow, frame_buffer in zip(
+                (DATA_START_TRANSMISSION_1, DATA_START_TRANSMISSION_2),
+                self._shadows, frames):
+            if not frame_buffer:
+                continue
+            assert len(frame_buffer) == self.fb_bytes
+            self._send_command(command)
             self._delay_ms(2)
-            for i in range(0, self.width * self.height / 8):
-                self._send_data(frame_buffer_red[i])
+            self._send_data(frame_buffer)
             self._delay_ms(2)
+            shadow.update(frame_buffer)
+            self.rows_sent += self.height
 
         # Observation: On some EPDs a display refresh won't do anything
         # unless two buffers have been written.
-        self._send_command(DISPLAY_REFRESH)
-        self.wait_until_idle()
-
-    # after this, call epd.init() to awaken the module
-    def sleep(self):
-        self._send_command(VCOM_AND_DATA_INTERVAL_SETTING)
-        self._send_data(0x37)
-        self._send_command(VCM_DC_SETTING_REGISTER)         #to solve Vcom drop
-        self._send_data(0x00)
-        self._send_command(POWER_SETTING)         #power setting
-        self._send_data(0x02)        #gate switch to external
-        self._send_data(b'\x00\x00\x00')
-        self._wait_until_idle()
-        self._send_command(POWER_OFF)         #power off
+        self._refresh()
 
-    # TODO: pixel and drawing functions should be put in a shared class.
-    # such as MonoBitmap...  the only actual relevance to us is set_absolute_pixel
-    # which describes how the bits are set per byte and that a color pixel is
-    # a 0 bit (1 transparent) and a black pixel is a 1 bit (0 white) in their
-    # respective frame buffers.  the color buffer is added after the b&w is drawn.
+    def display_bitmap(self, bitmap, fast_ghosting=False, partial=False):
+        """Display a tricolorbitmap.TriColorBitmap.
 
-    def _set_absolute_pixel(self, frame_buffer, x: int, y: int, tinted: bool):
-        """Set a pixel black or tinted in a bytearray frame buffer."""
-        if (x < 0 or x >= self.width or y < 0 or y >= self.height):
-            raise ValueError('x %d, y %d out of range' % (x, y))
-        if tinted:
-            frame_buffer[(x + y * self.width) / 8] &= ~(0x80 >> (x % 8))
+        Both planes are streamed straight from the bitmap's buffer, or
+        rotated by self.rotation as they are streamed.  The arguments other
+        than bitmap are for API compatibility with the monochrome displays
+        and are ignored.
+        """
+        if self.rotation:
+            self.display_bands(*epdif.rotated_bands(self, bitmap))
         else:
-            frame_buffer[(x + y * self.width) / 8] |= 0x80 >> (x % 8)
+            self.display_frames(bitmap.black, bitmap.red)
 
-    set_pixel = _set_absolute_pixel  # I got rid of the rotation code.
+    def display_bands(self, black_bands, red_bands):
+        """Stream frames to the display band by band and display them.
 
-    # TODO(gps): left off porting here.
-
-    def draw_line(self, frame_buffer, x0, y0, x1, y1, tinted):
-        # Bresenham algorithm
-        dx = abs(x1 - x0)
-        sx = 1 if x0 < x1 else -1
-        dy = -abs(y1 - y0)
-        sy = 1 if y0 < y1 else -1
-        err = dx + dy
-        while((x0 != x1) and (y0 != y1)):
-            self.set_pixel(frame_buffer, x0, y0 , tinted)
-            if (2 * err >= dy):
-                err += dy
-                x0 += sx
-            if (2 * err <= dx):
-                err += dx
-                y0 += sy
-
-    def draw_horizontal_line(self, frame_buffer, x, y, width, tinted):
-        for i in range(x, x + width):
-            self.set_pixel(frame_buffer, i, y, tinted)
-
-    def draw_vertical_line(self, frame_buffer, x, y, height, tinted):
-        for i in range(y, y + height):
-            self.set_pixel(frame_buffer, x, i, tinted)
-
-    def draw_rectangle(self, frame_buffer, x0, y0, x1, y1, tinted):
-        min_x = x0 if x1 > x0 else x1
-        max_x = x1 if x1 > x0 else x0
-        min_y = y0 if y1 > y0 else y1
-        max_y = y1 if y1 > y0 else y0
-        self.draw_horizontal_line(frame_buffer, min_x, min_y, max_x - min_x + 1, tinted)
-        self.draw_horizontal_line(frame_buffer, min_x, max_y, max_x - min_x + 1, tinted)
-        self.draw_vertical_line(frame_buffer, min_x, min_y, max_y - min_y + 1, tinted)
-        self.draw_vertical_line(frame_buffer, max_x, min_y, max_y - min_y + 1, tinted)
+        Args:
+          black_bands, red_bands: None or iterables of (y, rows) tuples
+              covering the display from top to bottom where rows is a buffer
+              of whole packed rows starting at row y; eg:
+              fractal.get_fractal_bands().  Each band is sent as soon as it
+              arrives so only one need be in memory.
+        """
+        for command, shadow, bands in zip(
+                (DATA_START_TRANSMISSION_1, DATA_START_TRANSMISSION_2),
+                self._shadows, (black_bands, red_bands)):
+            if bands is None:
+                continue
+            self._send_command(command)
+            self._delay_ms(2)
+            next_y = 0
+            for y, rows in bands:
+                if y != next_y:
+                    raise ValueError('band at %d, expected %d' % (y, next_y))
+                self._send_data(rows)
+                shadow.update_rows(y, rows)
+                next_y = y + len(rows) * 8 // self.width
+            self._delay_ms(2)
+            if next_y != self.height:
+                shadow.invalidate()
+            self.rows_sent += next_y
+        self._refresh()
 
-    def draw_filled_rectangle(self, frame_buffer, x0, y0, x1, y1, tinted):
-        min_x = x0 if x1 > x0 else x1
-        max_x = x1 if x1 > x0 else x0
-        min_y = y0 if y1 > y0 else y1
-        max_y = y1 if y1 > y0 else y0
-        for i in range(min_x, max_x + 1):
-            self.draw_vertical_line(frame_buffer, i, min_y, max_y - min_y + 1, tinted)
+    def _refresh(self):
+        self._send_command(DISPLAY_REFRESH)
+        if self.defer_refresh_wait:
+            self._refreshing = True
+        else:
+            self.wait_until_idle()
+        self._displayed = True
 
-    def draw_circle(self, frame_buffer, x, y, radius, tinted):
-        # Bresenham algorithm
-        x_pos = -radius
-        y_pos = 0
-        err = 2 - 2 * radius
-        if (x >= self.width or y >= self.height):
-            return
-        while True:
-            self.set_pixel(frame_buffer, x - x_pos, y + y_pos, tinted)
-            self.set_pixel(frame_buffer, x + x_pos, y + y_pos, tinted)
-            self.set_pixel(frame_buffer, x + x_pos, y - y_pos, tinted)
-            self.set_pixel(frame_buffer, x - x_pos, y - y_pos, tinted)
-            e2 = err
-            if (e2 <= y_pos):
-                y_pos += 1
-                err += y_pos * 2 + 1
-                if(-x_pos == y_pos and e2 <= x_pos):
-                    e2 = 0
-            if (e2 > x_pos):
-                x_pos += 1
-                err += x_pos * 2 + 1
-            if x_pos > 0:
-                break
+    def _already_displayed(self, frames):
+        if not self._displayed:
+            return False
+        any_frame = False
+        for shadow, frame_buffer in zip(self._shadows, frames):
+            if frame_buffer:
+                if not shadow.matches(frame_buffer):
+                    return False
+                any_frame = True
+        return any_frame
 
-    def draw_filled_circle(self, frame_buffer, x, y, radius, tinted):
-        # Bresenham algorithm
-        x_pos = -radius
-        y_pos = 0
-        err = 2 - 2 * radius
-        if (x >= self.width or y >= self.height):
-            return
-        while True:
-            self.set_pixel(frame_buffer, x - x_pos, y + y_pos, tinted)
-            self.set_pixel(frame_buffer, x + x_pos, y + y_pos, tinted)
-            self.set_pixel(frame_buffer, x + x_pos, y - y_pos, tinted)
-            self.set_pixel(frame_buffer, x - x_pos, y - y_pos, tinted)
-            self.draw_horizontal_line(frame_buffer, x + x_pos, y + y_pos, 2 * (-x_pos) + 1, tinted)
-            self.draw_horizontal_line(frame_buffer, x + x_pos, y - y_pos, 2 * (-x_pos) + 1, tinted)
-            e2 = err
-            if (e2 <= y_pos):
-                y_pos += 1
-                err += y_pos * 2 + 1
-                if(-x_pos == y_pos and e2 <= x_pos):
-                    e2 = 0
-            if (e2 > x_pos):
-                x_pos  += 1
-                err += x_pos * 2 + 1
-            if x_pos > 0:
-                break
+    # after this, call epd.init() to awaken the module
+    def sleep(self):
+        if self._refreshing:
+            self.wait_until_idle()
+        self.io.run_commands(self.sleep_commands, self.cs_per_byte,
+                             self.wait_until_idle)
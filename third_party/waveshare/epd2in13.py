@@ -33,17 +33,16 @@ class EPD(epd2in9.EPD):
     width = 128  # physically 122, logically 128
     height = 250
 
-    # TODO convert to raw bytes literals to save space / mem / import time
-    lut_full_update = bytes((
-        0x22, 0x55, 0xAA, 0x55, 0xAA, 0x55, 0xAA, 0x11,
-        0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
-        0x1E, 0x1E, 0x1E, 0x1E, 0x1E, 0x1E, 0x1E, 0x1E,
-        0x01, 0x00, 0x00, 0x00, 0x00, 0x00
-    ))
+    lut_full_update = (
+        b'\x22\x55\xaa\x55\xaa\x55\xaa\x11'
+        b'\x00\x00\x00\x00\x00\x00\x00\x00'
+        b'\x1e\x1e\x1e\x1e\x1e\x1e\x1e\x1e'
+        b'\x01\x00\x00\x00\x00\x00'
+    )
 
-    lut_partial_update  = bytes((
-        0x18, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
-        0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
-        0x0F, 0x01, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
-        0x00, 0x00, 0x00, 0x00, 0x00, 0x00
-    ))
+    lut_partial_update = (
+        b'\x18\x00\x00\x00\x00\x00\x00\x00'
+        b'\x00\x00\x00\x00\x00\x00\x00\x00'
+        b'\x0f\x01\x00\x00\x00\x00\x00\x00'
+        b'\x00\x00\x00\x00\x00\x00'
+    )
@@ -29,6 +29,7 @@
 import time
 
 from . import epdif
+from . import shadowram
 
 # EPD2IN7 commands
 PANEL_SETTING                               = 0x00
@@ -72,180 +73,186 @@ READ_OTP_DATA                               = 0xA2
 class EPD:
     width = 176
     height = 264
+    # The EPD appears to want CS to cycle between every data byte.
+    cs_per_byte = True
+    # Bytes per chip select transaction when not cs_per_byte; 0 for all.
+    spi_chunk_size = 0
+    # Remember what was sent in order to skip unchanged rows.  This costs a
+    # frame buffer worth of RAM once a whole frame buffer is sent (streamed
+    # bands never allocate it); set False on boards that can't spare it.
+    shadow_ram = True
+    # True to return as soon as a refresh starts rather than waiting for it;
+    # the next command waits instead.  See epdasync.AsyncEPD.
+    defer_refresh_wait = False
+    # Degrees clockwise display_bitmap() turns bitmaps to fit the panel; eg:
+    # 90 or 270 to show a landscape bitmap.  Rows are rotated as they are
+    # streamed, see MonoBitmap.rotated_bands().
+    rotation = 0
+    # True if the controller keeps its LUT registers through reset() so
+    # init() after sleep() need not send them again.
+    lut_retained = False
 
-    def __init__(self):
+    def __init__(self, io=None):
+        """io: The panel's epdif.EPDIO; the default one when None."""
+        self.io = io
         self.reset_pin = None
         self.dc_pin = None
         self.busy_pin = None
+        self.rows_sent = 0
+        self.rows_skipped = 0
+        self._shadow = shadowram.ShadowRam(self.width, self.height,
+                                           enabled=self.shadow_ram)
+        self._displayed = False  # Has the RAM been displayed?
+        self._refreshing = False  # A deferred refresh wait is pending.
+        self._lut_commands = None  # Made from the lut_ attributes when used.
+        self._lut_loaded = False  # The controller holds them.
 
-    # TODO convert to raw bytes literals to save space / mem / import time
-    lut_vcom_dc = bytes((
-        0x00, 0x00,
-        0x00, 0x0F, 0x0F, 0x00, 0x00, 0x05,
-        0x00, 0x32, 0x32, 0x00, 0x00, 0x02,
-        0x00, 0x0F, 0x0F, 0x00, 0x00, 0x05,
-        0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
-        0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
-        0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
-        0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
-    ))
+    # epdif.EPDIO.run_commands() tables.
+    init_commands = (
+        b'\x01\x05\x03\x00\x2b\x2b\x09'  # POWER_SETTING: VDS/VDG_EN, VDH..
+        b'\x06\x03\x07\x07\x17'  # BOOSTER_SOFT_START
+        b'\xf8\x02\x60\xa5'  # Power optimization
+        b'\xf8\x02\x89\xa5'
+        b'\xf8\x02\x90\x00'
+        b'\xf8\x02\x93\x2a'
+        b'\xf8\x02\xa0\xa5'
+        b'\xf8\x02\xa1\x00'
+        b'\xf8\x02\x73\x41'
+        b'\x16\x01\x00'  # PARTIAL_DISPLAY_REFRESH
+        b'\x04\x40'  # POWER_ON, wait until idle
+        b'\x00\x01\xaf'  # PANEL_SETTING: KW-BF   KWR-AF    BWROTP 0f
+        b'\x30\x01\x3a'  # PLL_CONTROL: 3A 100Hz 29 150Hz 39 200Hz
+        b'\x82\x81\x12\x02'  # VCM_DC_SETTING_REGISTER, 2 ms
+    )
+    sleep_commands = b'\x07\x01\xa5'  # DEEP_SLEEP with its check code
+
+    lut_vcom_dc = (
+        b'\x00\x00'
+        b'\x00\x0f\x0f\x00\x00\x05'
+        b'\x00\x32\x32\x00\x00\x02'
+        b'\x00\x0f\x0f\x00\x00\x05'
+        b'\x00\x00\x00\x00\x00\x00'
+        b'\x00\x00\x00\x00\x00\x00'
+        b'\x00\x00\x00\x00\x00\x00'
+        b'\x00\x00\x00\x00\x00\x00'
+    )
 
     # R21H
-    lut_ww = bytes((
-        0x50, 0x0F, 0x0F, 0x00, 0x00, 0x05,
-        0x60, 0x32, 0x32, 0x00, 0x00, 0x02,
-        0xA0, 0x0F, 0x0F, 0x00, 0x00, 0x05,
-        0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
-        0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
-        0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
-        0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
-    ))
+    lut_ww = (
+        b'\x50\x0f\x0f\x00\x00\x05'
+        b'\x60\x32\x32\x00\x00\x02'
+        b'\xa0\x0f\x0f\x00\x00\x05'
+        b'\x00\x00\x00\x00\x00\x00'
+        b'\x00\x00\x00\x00\x00\x00'
+        b'\x00\x00\x00\x00\x00\x00'
+        b'\x00\x00\x00\x00\x00\x00'
+    )
 
     # R22H    r
-    lut_bw = bytes((
-        0x50, 0x0F, 0x0F, 0x00, 0x00, 0x05,
-        0x60, 0x32, 0x32, 0x00, 0x00, 0x02,
-        0xA0, 0x0F, 0x0F, 0x00, 0x00, 0x05,
-        0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
-        0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
-        0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
-        0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
-    ))
+    lut_bw = (
+        b'\x50\x0f\x0f\x00\x00\x05'
+        b'\x60\x32\x32\x00\x00\x02'
+        b'\xa0\x0f\x0f\x00\x00\x05'
+        b'\x00\x00\x00\x00\x00\x00'
+        b'\x00\x00\x00\x00\x00\x00'
+        b'\x00\x00\x00\x00\x00\x00'
+        b'\x00\x00\x00\x00\x00\x00'
+    )
 
     # R24H    b
-    lut_bb = bytes((
-        0xA0, 0x0F, 0x0F, 0x00, 0x00, 0x05,
-        0x60, 0x32, 0x32, 0x00, 0x00, 0x02,
-        0x50, 0x0F, 0x0F, 0x00, 0x00, 0x05,
-        0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
-        0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
-        0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
-        0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
-    ))
+    lut_bb = (
+        b'\xa0\x0f\x0f\x00\x00\x05'
+        b'\x60\x32\x32\x00\x00\x02'
+        b'\x50\x0f\x0f\x00\x00\x05'
+        b'\x00\x00\x00\x00\x00\x00'
+        b'\x00\x00\x00\x00\x00\x00'
+        b'\x00\x00\x00\x00\x00\x00'
+        b'\x00\x00\x00\x00\x00\x00'
+    )
 
     # R23H    w
-    lut_wb = bytes((
-        0xA0, 0x0F, 0x0F, 0x00, 0x00, 0x05,
-        0x60, 0x32, 0x32, 0x00, 0x00, 0x02,
-        0x50, 0x0F, 0x0F, 0x00, 0x00, 0x05,
-        0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
-        0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
-        0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
-        0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
-    ))
+    lut_wb = (
+        b'\xa0\x0f\x0f\x00\x00\x05'
+        b'\x60\x32\x32\x00\x00\x02'
+        b'\x50\x0f\x0f\x00\x00\x05'
+        b'\x00\x00\x00\x00\x00\x00'
+        b'\x00\x00\x00\x00\x00\x00'
+        b'\x00\x00\x00\x00\x00\x00'
+        b'\x00\x00\x00\x00\x00\x00'
+    )
 
 
     def delay_ms(self, ms):
         time.sleep(ms / 1000.)
 
     def send_command(self, command):
+        if self._refreshing:
+            self.wait_until_idle()
         self.dc_pin.value = 0
-        epdif.spi_transfer(command.to_bytes(1, 'big'))
+        self.io.spi_write_byte(command)
 
     def send_data(self, data):
         self.dc_pin.value = 1
         if isinstance(data, int):
-            epdif.spi_transfer(data.to_bytes(1, 'big'))
+            self.io.spi_write_byte(data)
+        elif self.cs_per_byte:
+            self.io.spi_write_cs_per_byte(data)
         else:
-            # The EPD appears to want CS to cycle between every byte
-            # so we loop doing one byte transfers.  Not efficient, but
-            # it makes it work.
-            for i in range(len(data)):
-                epdif.spi_transfer(data[i:i+1])
+            self.io.spi_write(data, self.spi_chunk_size)
 
     @property
     def fb_bytes(self):
         return self.width * self.height // 8
 
     def init(self):
-        try:
-            epdif.epd_io_bus_init()
-        except RuntimeError:
-            pass  # it avoids global io bus reinitialization.  good.
-        self.reset_pin = epdif.RST_PIN
-        self.dc_pin = epdif.DC_PIN
-        self.busy_pin = epdif.BUSY_PIN
+        if self.io is None:
+            self.io = epdif.default_io()
+        self.reset_pin = self.io.rst_pin
+        self.dc_pin = self.io.dc_pin
+        self.busy_pin = self.io.busy_pin
+        self._shadow.invalidate()
+        self._displayed = False
         # EPD hardware init start
         self.reset()
-        self.send_command(POWER_SETTING)
-        self.send_data(0x03)                  # VDS_EN, VDG_EN
-        self.send_data(0x00)                  # VCOM_HV, VGHL_LV[1], VGHL_LV[0]
-        self.send_data(0x2b)                  # VDH
-        self.send_data(0x2b)                  # VDL
-        self.send_data(0x09)                  # VDHR
-        self.send_command(BOOSTER_SOFT_START)
-        self.send_data(0x07)
-        self.send_data(0x07)
-        self.send_data(0x17)
-        # Power optimization
-        self.send_command(0xF8)
-        self.send_data(0x60)
-        self.send_data(0xA5)
-        # Power optimization
-        self.send_command(0xF8)
-        self.send_data(0x89)
-        self.send_data(0xA5)
-        # Power optimization
-        self.send_command(0xF8)
-        self.send_data(0x90)
-        self.send_data(0x00)
-        # Power optimization
-        self.send_command(0xF8)
-        self.send_data(0x93)
-        self.send_data(0x2A)
-        # Power optimization
-        self.send_command(0xF8)
-        self.send_data(0xA0)
-        self.send_data(0xA5)
-        # Power optimization
-        self.send_command(0xF8)
-        self.send_data(0xA1)
-        self.send_data(0x00)
-        # Power optimization
-        self.send_command(0xF8)
-        self.send_data(0x73)
-        self.send_data(0x41)
-        self.send_command(PARTIAL_DISPLAY_REFRESH)
-        self.send_data(0x00)
-        self.send_command(POWER_ON)
-        self.wait_until_idle()
-
-        self.send_command(PANEL_SETTING)
-        self.send_data(0xAF)        # KW-BF   KWR-AF    BWROTP 0f
-        self.send_command(PLL_CONTROL)
-        self.send_data(0x3A)        # 3A 100HZ   29 150Hz 39 200HZ    31 171HZ
-        self.send_command(VCM_DC_SETTING_REGISTER)
-        self.send_data(0x12)
-        self.delay_ms(2)
-        self.set_lut()
+        self.io.run_commands(self.init_commands, self.cs_per_byte,
+                             self.wait_until_idle)
+        if not self._lut_loaded:
+            self.set_lut()
         # EPD hardware init end
 
+    def is_busy(self):
+        return self.busy_pin.value == 0      # 0: busy, 1: idle
+
     def wait_until_idle(self):
-        while self.busy_pin.value == 0:      # 0: busy, 1: idle
+        while self.is_busy():
             self.delay_ms(10)
+        self._refreshing = False
 
     def reset(self):
         self.reset_pin.value = 0         # module reset
-        self.delay_ms(200)
+        self.delay_ms(10)  # Waveshare's later drivers pulse it for 2-10ms.
         self.reset_pin.value = 1
         self.delay_ms(200)
+        self._refreshing = False
+        if not self.lut_retained:
+            self._lut_loaded = False
 
     def set_lut(self):
-        assert len(self.lut_vcom_dc) == 44
-        self.send_command(LUT_FOR_VCOM)               # vcom
-        self.send_data(self.lut_vcom_dc)
-        assert len(self.lut_ww) == 42
-        self.send_command(LUT_WHITE_TO_WHITE)         # ww --
-        self.send_data(self.lut_ww)
-        assert len(self.lut_bw) == 42
-        self.send_command(LUT_BLACK_TO_WHITE)         # bw r
-        self.send_data(self.lut_bw)
-        assert len(self.lut_bb) == 42
-        self.send_command(LUT_WHITE_TO_BLACK)         # wb w
-        self.send_data(self.lut_bb)
-        assert len(self.lut_wb) == 42
-        self.send_command(LUT_BLACK_TO_BLACK)         # bb b
-        self.send_data(self.lut_wb)
+        if self._lut_commands is None:
+            assert len(self.lut_vcom_dc) == 44
+            assert len(self.lut_ww) == 42
+            assert len(self.lut_bw) == 42
+            assert len(self.lut_bb) == 42
+            assert len(self.lut_wb) == 42
+            self._lut_commands = b''.join((
+                epdif.command(LUT_FOR_VCOM, self.lut_vcom_dc),        # vcom
+                epdif.command(LUT_WHITE_TO_WHITE, self.lut_ww),       # ww --
+                epdif.command(LUT_BLACK_TO_WHITE, self.lut_bw),       # bw r
+                epdif.command(LUT_WHITE_TO_BLACK, self.lut_bb),       # wb w
+                epdif.command(LUT_BLACK_TO_BLACK, self.lut_wb),       # bb b
+            ))
+        self.io.run_commands(self._lut_commands, self.cs_per_byte)
+        self._lut_loaded = True
 
     def clear_frame_memory(self, pattern=0xff):
         """Fill the frame memory with a pattern byte. Does not call update."""
@@ -254,17 +261,72 @@ class EPD:
         row = pattern.to_bytes(1, 'big') * ((self.width + 7) // 8)
         for j in range(self.height):
             self.send_data(row)
+        self._shadow.fill(pattern)
+        self._displayed = False
 
     def display_frame(self):
         # TODO Determine if the 2.7" display can do double buffering.
         self.send_command(DISPLAY_REFRESH)
-        self.wait_until_idle()
+        if self.defer_refresh_wait:
+            self._refreshing = True
+        else:
+            self.wait_until_idle()
+        self._displayed = True
 
     def display_frame_buf(self, frame_buffer, fast_ghosting=None):
-        """fast_ghosting ignored on the 2.7" display; it is always slow."""
+        """Upload and display a frame buffer.
+
+        Only rows differing from what was last sent are uploaded and nothing
+        is done when the display already shows frame_buffer.
+
+        fast_ghosting ignored on the 2.7" display; it is always slow.
+        """
         fb_bytes = self.width * self.height // 8
         assert len(frame_buffer) == fb_bytes
+        spans = self._shadow.changed_rows(frame_buffer)
+        if not spans and self._displayed:
+            self.rows_skipped += self.height
+            return
+        if spans == [(0, self.height - 1)]:
+            self._send_frame(frame_buffer)
+        else:
+            for y_start, y_end in spans:
+                self._send_rows(frame_buffer, y_start, y_end)
+        rows = 0
+        for y_start, y_end in spans:
+            self._shadow.update(frame_buffer, y_start, y_end)
+            rows += y_end - y_start + 1
+        self.rows_sent += rows
+        self.rows_skipped += self.height - rows
+
+        self.display_frame()
+
+    def display_bands(self, bands):
+        """Stream a frame to the display band by band and display it.
 
+        Args:
+          bands: An iterable of (y, rows) tuples covering the display from top
+              to bottom where rows is a buffer of whole packed rows starting
+              at row y; eg: fractal.get_fractal_bands().  Each band is sent
+              as soon as it arrives so only one need be in memory.
+        """
+        shadow = self._shadow
+        self.send_command(DATA_START_TRANSMISSION_2)
+        self.delay_ms(2)
+        next_y = 0
+        for y, rows in bands:
+            if y != next_y:
+                raise ValueError('band at %d, expected %d' % (y, next_y))
+            self.send_data(rows)
+            shadow.update_rows(y, rows)
+            next_y = y + len(rows) * 8 // self.width
+        self.delay_ms(2)
+        if next_y != self.height:
+            shadow.invalidate()
+        self.rows_sent += next_y
+        self.display_frame()
+
+    def _send_frame(self, frame_buffer):
         # This seems to do nothing on my EPD.
         #self.send_command(DATA_START_TRANSMISSION_1)
         #self.delay_ms(2)
@@ -281,14 +343,35 @@ class EPD:
         self.send_data(frame_buffer)
         self.delay_ms(2)
 
-        self.display_frame()
+    def _send_rows(self, frame_buffer, y_start, y_end):
+        """Send full width rows y_start through y_end into the frame memory."""
+        row_bytes = self.width // 8
+        self.send_command(PARTIAL_DATA_START_TRANSMISSION_2)
+        self.send_data(0)                       # x (multiple of 8)
+        self.send_data(0)
+        self.send_data(y_start >> 8)            # y
+        self.send_data(y_start & 0xff)
+        self.send_data(self.width >> 8)         # w (multiple of 8)
+        self.send_data(self.width & 0xf8)
+        self.send_data((y_end - y_start + 1) >> 8)  # l
+        self.send_data((y_end - y_start + 1) & 0xff)
+        self.delay_ms(2)
+        self.send_data(memoryview(frame_buffer)[
+                y_start * row_bytes:(y_end + 1) * row_bytes])
+        self.delay_ms(2)
 
-    def display_bitmap(self, bitmap, fast_ghosting=False):
+    def display_bitmap(self, bitmap, fast_ghosting=False, partial=False):
         """Render a MonoBitmap onto the display.
 
-        fast_ghosting ignored on the 2.7" display; it is always slow.
+        fast_ghosting and partial are ignored on the 2.7" display; it is
+        always slow.  The bitmap is rotated by self.rotation.
         """
-        self.display_frame_buf(bitmap.bit_buf, fast_ghosting=fast_ghosting)
+        if self.rotation:
+            self.display_bands(epdif.rotated_bands(self, bitmap))
+        else:
+            self.display_frame_buf(bitmap.bit_buf,
+                                   fast_ghosting=fast_ghosting)
+        bitmap.clear_dirty()
 
     # After this command is transmitted, the chip would enter the deep-sleep
     # mode to save power. The deep sleep mode would return to standby by
@@ -296,8 +379,8 @@ class EPD:
     # be executed if check code = 0xA5.
     # Use self.reset() to awaken and use self.init() to initialize.
     def sleep(self):
-        self.send_command(DEEP_SLEEP)
-        self.delay_ms(2)
-        self.send_data(0xa5)
+        if self._refreshing:
+            self.wait_until_idle()
+        self.io.run_commands(self.sleep_commands, self.cs_per_byte)
 
 ### END OF FILE ###
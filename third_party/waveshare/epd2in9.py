@@ -29,6 +29,7 @@
 import time
 
 from . import epdif
+from . import shadowram
 
 # EPD2IN9 commands
 DRIVER_OUTPUT_CONTROL                       = 0x01
@@ -57,84 +58,119 @@ TERMINATE_FRAME_READ_WRITE                  = 0xFF
 class EPD:
     width = 128
     height = 296
+    # The EPD needs CS to cycle hi between every data byte.  Data sheets say
+    # it needs to be at least a 60ns CS pulse.
+    cs_per_byte = True
+    # Bytes per chip select transaction when not cs_per_byte; 0 for all.
+    spi_chunk_size = 0
+    # Remember what was sent in order to skip unchanged rows.  This costs two
+    # frame buffers worth of RAM once whole frame buffers are sent (streamed
+    # bands never allocate them); set False on boards that can't spare it.
+    shadow_ram = True
+    # True to return as soon as a refresh starts rather than waiting for it;
+    # the next command waits instead.  See epdasync.AsyncEPD.
+    defer_refresh_wait = False
+    # Degrees clockwise display_bitmap() turns bitmaps to fit the panel; eg:
+    # 90 or 270 to show a landscape bitmap.  Rows are rotated as they are
+    # streamed, see MonoBitmap.rotated_bands().
+    rotation = 0
+    # True if the controller keeps its LUT register through reset() so
+    # init() after sleep() need not send it again.
+    lut_retained = False
 
-    def __init__(self):
+    def __init__(self, io=None):
+        """io: The panel's epdif.EPDIO; the default one when None."""
         assert not (self.width & 3), "width must be a multiple of 8"
+        self.io = io
         self.reset_pin = None
         self.dc_pin = None
         self.busy_pin = None
         self.lut = self.lut_full_update
+        self.rows_sent = 0
+        self.rows_skipped = 0
+        # One per memory area; _bank is the one the next write will go to.
+        self._shadows = tuple(
+                shadowram.ShadowRam(self.width, self.height,
+                                    enabled=self.shadow_ram)
+                for _ in range(2))
+        self._bank = 0
+        self._refreshing = False  # A deferred refresh wait is pending.
+        self._lut_loaded = None  # The LUT the controller holds.
+        self._init_commands = epdif.command(
+                DRIVER_OUTPUT_CONTROL,
+                ((self.height - 1) & 0xFF, ((self.height - 1) >> 8) & 0xFF,
+                 0x00)) + self.init_commands  # GD = 0 SM = 0 TB = 0
 
-    # TODO convert to raw bytes literals to save space / mem / import time
-    lut_full_update = bytes((
-        0x02, 0x02, 0x01, 0x11, 0x12, 0x12, 0x22, 0x22, 
-        0x66, 0x69, 0x69, 0x59, 0x58, 0x99, 0x99, 0x88, 
-        0x00, 0x00, 0x00, 0x00, 0xF8, 0xB4, 0x13, 0x51, 
-        0x35, 0x51, 0x51, 0x19, 0x01, 0x00
-    ))
-
-    lut_partial_update  = bytes((
-        0x10, 0x18, 0x18, 0x08, 0x18, 0x18, 0x08, 0x00, 
-        0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 
-        0x00, 0x00, 0x00, 0x00, 0x13, 0x14, 0x44, 0x12, 
-        0x00, 0x00, 0x00, 0x00, 0x00, 0x00
-    ))
+    # epdif.EPDIO.run_commands() tables; init() starts with the
+    # DRIVER_OUTPUT_CONTROL for the height.
+    init_commands = (
+        b'\x0c\x03\xd7\xd6\x9d'  # BOOSTER_SOFT_START_CONTROL
+        b'\x2c\x01\xa8'  # WRITE_VCOM_REGISTER: VCOM 7C
+        b'\x3a\x01\x1a'  # SET_DUMMY_LINE_PERIOD: 4 dummy lines per gate
+        b'\x3b\x01\x08'  # SET_GATE_TIME: 2us per line
+        b'\x11\x01\x03'  # DATA_ENTRY_MODE_SETTING: X increment Y increment
+    )
+    sleep_commands = b'\x10\x40'  # DEEP_SLEEP_MODE, wait until idle
+
+    lut_full_update = (
+        b'\x02\x02\x01\x11\x12\x12\x22\x22'
+        b'\x66\x69\x69\x59\x58\x99\x99\x88'
+        b'\x00\x00\x00\x00\xf8\xb4\x13\x51'
+        b'\x35\x51\x51\x19\x01\x00'
+    )
+
+    lut_partial_update = (
+        b'\x10\x18\x18\x08\x18\x18\x08\x00'
+        b'\x00\x00\x00\x00\x00\x00\x00\x00'
+        b'\x00\x00\x00\x00\x13\x14\x44\x12'
+        b'\x00\x00\x00\x00\x00\x00'
+    )
 
     def _delay_ms(self, ms):
         time.sleep(ms / 1000.)
 
     def _send_command(self, command):
+        if self._refreshing:
+            self.wait_until_idle()
         self.dc_pin.value = 0
-        epdif.spi_transfer(command.to_bytes(1, 'big'))
+        self.io.spi_write_byte(command)
 
     def _send_data(self, data):
         self.dc_pin.value = 1
         if isinstance(data, int):
-            epdif.spi_transfer(data.to_bytes(1, 'big'))
+            self.io.spi_write_byte(data)
+        elif self.cs_per_byte:
+            self.io.spi_write_cs_per_byte(data)
         else:
-            # The EPD needs CS to cycle hi between every byte so we loop doing
-            # one byte transfers to cause that.  Not efficient, but it makes
-            # it work.  Data sheets say needs to be at least a 60ns CS pulse.
-            for i in range(len(data)):
-                epdif.spi_transfer(data[i:i+1])
+            self.io.spi_write(data, self.spi_chunk_size)
 
     @property
     def fb_bytes(self):
         return self.width * self.height // 8
 
     def init(self, lut=None):
-        try:
-            epdif.epd_io_bus_init()
-        except RuntimeError:
-            pass  # It avoids global io bus reinitialization.  Good.
-        self.reset_pin = epdif.RST_PIN
-        self.dc_pin = epdif.DC_PIN
-        self.busy_pin = epdif.BUSY_PIN
+        if self.io is None:
+            self.io = epdif.default_io()
+        self.reset_pin = self.io.rst_pin
+        self.dc_pin = self.io.dc_pin
+        self.busy_pin = self.io.busy_pin
+        for shadow in self._shadows:
+            shadow.invalidate()
+        self._bank = 0
         # EPD hardware init start
         self.lut = lut or self.lut_full_update
         self.reset()
-        self._send_command(DRIVER_OUTPUT_CONTROL)
-        self._send_data((self.height - 1) & 0xFF)
-        self._send_data(((self.height - 1) >> 8) & 0xFF)
-        self._send_data(0x00)                     # GD = 0 SM = 0 TB = 0
-        self._send_command(BOOSTER_SOFT_START_CONTROL)
-        self._send_data(0xD7)
-        self._send_data(0xD6)
-        self._send_data(0x9D)
-        self._send_command(WRITE_VCOM_REGISTER)
-        self._send_data(0xA8)                     # VCOM 7C
-        self._send_command(SET_DUMMY_LINE_PERIOD)
-        self._send_data(0x1A)                     # 4 dummy lines per gate
-        self._send_command(SET_GATE_TIME)
-        self._send_data(0x08)                     # 2us per line
-        self._send_command(DATA_ENTRY_MODE_SETTING)
-        self._send_data(0x03)                     # X increment Y increment
+        self.io.run_commands(self._init_commands, self.cs_per_byte)
         self.set_lut(self.lut)
         # EPD hardware init end
 
+    def is_busy(self):
+        return self.busy_pin.value == 1      # 0: idle, 1: busy
+
     def wait_until_idle(self):
-        while self.busy_pin.value == 1:      # 0: idle, 1: busy
+        while self.is_busy():
             self._delay_ms(10)
+        self._refreshing = False
 
 ##
  #  @brief: module reset.
@@ -142,9 +178,12 @@ class EPD:
  ##
     def reset(self):
         self.reset_pin.value = 0         # module reset
-        self._delay_ms(200)
+        self._delay_ms(10)  # Waveshare's later drivers pulse it for 2-10ms.
         self.reset_pin.value = 1
         self._delay_ms(200)
+        self._refreshing = False
+        if not self.lut_retained:
+            self._lut_loaded = None
 
 ##
  #  @brief: set the look-up table register
@@ -152,8 +191,11 @@ class EPD:
     def set_lut(self, lut=None):
         self.lut = lut or self.lut_full_update
         assert len(self.lut) == 30  # the length of look-up table is 30 bytes
-        self._send_command(WRITE_LUT_REGISTER)
-        self._send_data(self.lut)
+        if self.lut is self._lut_loaded:
+            return  # Already there.
+        self.io.run_commands(epdif.command(WRITE_LUT_REGISTER, self.lut),
+                             self.cs_per_byte)
+        self._lut_loaded = self.lut
 
 ##
  #  @brief: put an image to the frame memory.
@@ -177,16 +219,31 @@ class EPD:
             y_end = self.height - 1
         else:
             y_end = y + image_height - 1
-        self._set_memory_area(x, y, x_end, y_end)
-        for j in range(y, y_end + 1):
+        self._write_area(bitmap, x, y, x, y, x_end, y_end)
+
+    def _write_area(self, bitmap, x, y, x_start, y_start, x_end, y_end):
+        """Write an area of the EPD frame buffer from a bitmap placed at x, y.
+
+        x_start, y_start, x_end and y_end are inclusive EPD coordinates.
+        x, x_start and x_end + 1 must be multiples of 8.
+        """
+        self._set_memory_area(x_start, y_start, x_end, y_end)
+        bit_buf = memoryview(bitmap.bit_buf)  # Slice rows w/o copying.
+        row_bytes = bitmap.width // 8
+        first_byte = (x_start - x) // 8
+        num_bytes = (x_end - x_start) // 8 + 1
+        shadow = self._shadows[self._bank]
+        for j in range(y_start, y_end + 1):
             # The 2.13" display only likes receiving one row of data per WRITE_RAM.
             # At a guess: Internally it may be bit based and does this to avoid
             # implementing skipping partial end of row bytes given the non
             # multiple of 8 width resolution?
-            self._set_memory_pointer(x, j)
-            offset = j * self.width // 8
+            self._set_memory_pointer(x_start, j)
+            offset = (j - y) * row_bytes + first_byte
             self._send_command(WRITE_RAM)
-            self._send_data(bitmap.bit_buf[offset+x:offset+(x_end//8)+1])
+            self._send_data(bit_buf[offset:offset + num_bytes])
+            shadow.update_bytes(j * (self.width // 8) + x_start // 8,
+                                bit_buf[offset:offset + num_bytes])
 
     def clear_frame_memory(self, pattern=0xff):
         """Fill the frame memory with a pattern byte. Does not call update."""
@@ -198,6 +255,7 @@ class EPD:
             self._set_memory_pointer(0, j)
             self._send_command(WRITE_RAM)
             self._send_data(row)
+        self._shadows[self._bank].fill(pattern)
 
 ##
  #  @brief: update the display
@@ -212,41 +270,136 @@ class EPD:
         self._send_data(0xC4)
         self._send_command(MASTER_ACTIVATION)
         self._send_command(TERMINATE_FRAME_READ_WRITE)
-        self.wait_until_idle()
+        if self.defer_refresh_wait:
+            self._refreshing = True
+        else:
+            self.wait_until_idle()
+        self._bank ^= 1
 
     def display_frame_buf(self, frame_buffer, fast_ghosting=False):
+        """Upload and display a frame buffer.
+
+        Only rows differing from what was last sent to each memory area are
+        uploaded and nothing is done when the display already shows
+        frame_buffer.
+        """
         assert len(frame_buffer) == self.fb_bytes
+        write_shadow, shown_shadow = (self._shadows[self._bank],
+                                      self._shadows[self._bank ^ 1])
+        if (shown_shadow.matches(frame_buffer) and
+                (fast_ghosting or write_shadow.matches(frame_buffer))):
+            self.rows_skipped += self.height
+            return
         for _ in range(2):
+            self._write_changed_rows(frame_buffer)
+            self.display_frame()
+            if fast_ghosting:
+                break
+
+    def display_bands(self, bands, fast_ghosting=False):
+        """Stream a frame to the display band by band and display it.
+
+        Args:
+          bands: An iterable of (y, rows) tuples where rows is a buffer of
+              whole packed rows starting at row y; eg:
+              fractal.get_fractal_bands().  Each band is sent as soon as it
+              arrives so only one need be in memory.  Rows matching what the
+              memory area already holds are skipped.  As bands can only be
+              consumed once, pass a function returning a new iterable to have
+              the second refresh done when fast_ghosting is False.
+          fast_ghosting: See display_bitmap().
+        """
+        for _ in range(2):
+            self._write_band_rows(bands() if callable(bands) else bands)
+            self.display_frame()
+            if fast_ghosting or not callable(bands):
+                break
+
+    def _write_band_rows(self, bands):
+        shadow = self._shadows[self._bank]
+        known = shadow.buf  # None when the memory area contents are unknown.
+        row_bytes = self.width // 8
+        self._set_memory_area(0, 0, self.width-1, self.height-1)
+        rows_written = set_rows = 0
+        for y, rows in bands:
+            rows = memoryview(rows)
+            for offset in range(0, len(rows), row_bytes):
+                row = rows[offset:offset + row_bytes]
+                shadow_offset = y * row_bytes + offset
+                set_rows += 1
+                if known and known[shadow_offset:
+                                   shadow_offset + row_bytes] == row:
+                    continue
+                self._set_memory_pointer(0, y + offset // row_bytes)
+                self._send_command(WRITE_RAM)
+                self._send_data(row)
+                rows_written += 1
+            shadow.update_rows(y, rows)
+        if set_rows != self.height:
+            shadow.invalidate()  # Not a whole frame, the rest is unknown.
+        self.rows_sent += rows_written
+        self.rows_skipped += set_rows - rows_written
+
+    def _write_changed_rows(self, frame_buffer):
+        """Write rows differing from the memory area about to be written."""
+        shadow = self._shadows[self._bank]
+        spans = shadow.changed_rows(frame_buffer)
+        frame_buffer = memoryview(frame_buffer)  # Slice rows w/o copying.
+        row_bytes = self.width // 8
+        if spans:
             self._set_memory_area(0, 0, self.width-1, self.height-1)
-            for j in range(0, self.height):
+        rows = 0
+        for y_start, y_end in spans:
+            for j in range(y_start, y_end + 1):
                 # Some displays only accept one row of data per WRITE_RAM.
                 self._set_memory_pointer(0, j)
-                offset = j * self.width // 8
+                offset = j * row_bytes
                 self._send_command(WRITE_RAM)
-                self._send_data(frame_buffer[offset:offset + (self.width//8) + 1])
-            self.display_frame()
-            if fast_ghosting:
-                break
+                self._send_data(frame_buffer[offset:offset + row_bytes])
+            shadow.update(frame_buffer, y_start, y_end)
+            rows += y_end - y_start + 1
+        self.rows_sent += rows
+        self.rows_skipped += self.height - rows
 
-    def display_bitmap(self, bitmap, fast_ghosting=False):
+    def display_bitmap(self, bitmap, fast_ghosting=False, partial=False):
         """Render a MonoBitmap onto the display.
 
         Args:
           bitmap: A MonoBitmap instance
           fast_ghosting: If true the display update is twice as fast by only
               refreshing once; this can leave a ghost of the previous contents.
+          partial: If true only the area of bitmap modified since it was last
+              displayed is uploaded and refreshed using the partial update
+              LUT.  Much faster for small changes; ghosting accumulates so do
+              a full update every now and then.  bitmap must be the size of
+              the display.  Ignored when self.rotation is set.
+
+        The bitmap is rotated by self.rotation.
         """
-        # TODO: add partial update support.
-        # if bitmap size is full frame size and x/y offsets are 0:
-        #     epd.init(epd.lut_full_update)
-        # else:
-        #     epd.init(epd.lut_partial_update)
-
-        self.set_frame_memory(bitmap, 0, 0)
-        self.display_frame()
-        if not fast_ghosting:
+        if self.rotation:
+            if self.lut is self.lut_partial_update:
+                self.set_lut(self.lut_full_update)
+            self.display_bands(lambda: epdif.rotated_bands(self, bitmap),
+                               fast_ghosting)
+        elif partial:
+            area = bitmap.dirty_rect()
+            if area is None:
+                return  # Nothing has changed.
+            if self.lut is not self.lut_partial_update:
+                self.set_lut(self.lut_partial_update)
+            self._write_area(bitmap, 0, 0, *area)
+            self.display_frame()
+            # Bring the other memory area up to date as well.
+            self._write_area(bitmap, 0, 0, *area)
+        else:
+            if self.lut is self.lut_partial_update:
+                self.set_lut(self.lut_full_update)
             self.set_frame_memory(bitmap, 0, 0)
             self.display_frame()
+            if not fast_ghosting:
+                self.set_frame_memory(bitmap, 0, 0)
+                self.display_frame()
+        bitmap.clear_dirty()
 
 ##
  #  @brief: specify the memory area for data R/W
@@ -283,6 +436,8 @@ class EPD:
  #          You can use reset() to awaken or init() to initialize
  ##
     def sleep(self):
-        self._send_command(DEEP_SLEEP_MODE)
-        self.wait_until_idle()
+        if self._refreshing:
+            self.wait_until_idle()
+        self.io.run_commands(self.sleep_commands, self.cs_per_byte,
+                             self.wait_until_idle)
 
@@ -0,0 +1,99 @@
+# python3: CircuitPython
+
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Drive an EPD from asyncio so other work can run while it refreshes.
+
+A refresh takes the panel seconds but needs nothing from us until it is
+done.  AsyncEPD starts a refresh and returns so the next frame can be
+computed (and keys polled) meanwhile; the next display call awaits the
+refresh finishing before sending anything.
+
+Usage:
+  epd = epdasync.AsyncEPD(epd2in9.EPD())
+  epd.init()
+  await epd.display_bitmap(bitmap)    # Returns once the refresh started.
+  bitmap = compute_the_next_one()     # While the panel refreshes.
+  await epd.display_bitmap(bitmap)
+"""
+
+try:
+    import asyncio
+except ImportError:
+    try:
+        import uasyncio as asyncio
+    except ImportError:
+        asyncio = None  # CircuitPython 3 has neither.
+
+
+def run(coroutine):
+    """Run coroutine to completion on the event loop."""
+    if hasattr(asyncio, 'run'):
+        return asyncio.run(coroutine)
+    return asyncio.get_event_loop().run_until_complete(coroutine)
+
+
+class AsyncEPD:
+    """Wraps an EPD driver instance with awaitable display methods.
+
+    Other attributes are those of the wrapped driver; calling its methods
+    directly is fine, they wait for a pending refresh themselves (blocking).
+
+    Drivers needing two refreshes for a frame (epd2in9 without fast_ghosting)
+    wait for the first one in the driver; only the last is overlapped.
+    """
+
+    def __init__(self, epd, poll_s=0.01):
+        epd.defer_refresh_wait = True
+        self.epd = epd
+        self.poll_s = poll_s
+
+    def __getattr__(self, name):
+        return getattr(self.epd, name)
+
+    async def wait_until_idle(self):
+        """Yield to other tasks until the panel is no longer busy."""
+        while self.epd.is_busy():
+            await asyncio.sleep(self.poll_s)
+        self.epd.wait_until_idle()  # Clears the pending refresh.
+
+    async def display_bitmap(self, bitmap, *args, **kwargs):
+        """Upload bitmap once idle and start the refresh; see the driver."""
+        await self.wait_until_idle()
+        self.epd.display_bitmap(bitmap, *args, **kwargs)
+
+    async def display_frame_buf(self, frame_buffer, *args, **kwargs):
+        await self.wait_until_idle()
+        self.epd.display_frame_buf(frame_buffer, *args, **kwargs)
+
+    async def display_frames(self, *frame_buffers):
+        await self.wait_until_idle()
+        self.epd.display_frames(*frame_buffers)
+
+    async def display_frame(self):
+        await self.wait_until_idle()
+        self.epd.display_frame()
+
+    async def slideshow(self, bitmaps, *args, **kwargs):
+        """Display each of an iterable of bitmaps in turn.
+
+        The next bitmap is requested from the iterable as soon as a refresh
+        starts, so computing it overlaps the refresh and each frame takes
+        about max(compute, refresh) plus the upload.  The bitmap may be
+        modified or reused once the next one is requested.
+        """
+        for bitmap in bitmaps:
+            await self.display_bitmap(bitmap, *args, **kwargs)
+        await self.wait_until_idle()
@@ -26,56 +26,299 @@
  # THE SOFTWARE.
  #
 
-import adafruit_bus_device.spi_device
-import board
-import digitalio
-
-# Pin definition as hooked up on my Metro M4 (reassigned to instances in init)
-# These pins are also present on the ItsyBitsy M4
-RST_PIN = board.D11
-DC_PIN = board.D9
-CS_PIN = board.D10
-BUSY_PIN = board.D7
-
-#_SPI_MOSI = board.MOSI
-#_SPI_CLK = board.SCK
-_SPI_MOSI = board.A2
-_SPI_CLK = board.A3
-_SPI_BUS = None
+import time
+
+try:
+    import board
+except ImportError:
+    # Not running on a CircuitPython board (a host running epdsim for
+    # example).  use_io() must be called before an EPD is initialized.
+    board = None
+
+if board:
+    import adafruit_bus_device.spi_device
+    import digitalio
+
+    # Pin definition as hooked up on my Metro M4 (reassigned to instances in init)
+    # These pins are also present on the ItsyBitsy M4
+    RST_PIN = board.D11
+    DC_PIN = board.D9
+    CS_PIN = board.D10
+    BUSY_PIN = board.D7
+
+    #_SPI_MOSI = board.MOSI
+    #_SPI_CLK = board.SCK
+    _SPI_MOSI = board.A2
+    _SPI_CLK = board.A3
+else:
+    RST_PIN = DC_PIN = CS_PIN = BUSY_PIN = None
+    _SPI_MOSI = _SPI_CLK = None
+_SPI = None  # The SPI bus shared by every panel's EPDIO.
+
+# Command tables for EPDIO.run_commands() are a series of entries: the
+# command byte, a byte of the number of argument bytes ORed with these
+# flags, the arguments and, with DELAY, a byte of milliseconds to wait.
+COUNT = 0x3f  # The argument count bits.
+DELAY = 0x80  # Sleep for the milliseconds byte after the arguments.
+WAIT = 0x40  # Wait for the panel to be idle after the command.
+_DEFAULT_IO = None  # The EPDIO used by the module level functions.
 _init = False
 
 
-def spi_transfer(data):
-    with _SPI_BUS as device:
-        device.write(data)
+class EPDIO:
+    """The pins and SPI device of one panel.
+
+    Several panels may share an SPI bus, each with its own RST, DC, CS and
+    BUSY pins; give every EPD instance its own EPDIO.
+
+    Attributes:
+      rst_pin, dc_pin, cs_pin, busy_pin: DigitalInOut like objects.
+      spi_device: An adafruit_bus_device.spi_device.SPIDevice or workalike.
+    """
+
+    def __init__(self, rst_pin, dc_pin, cs_pin, busy_pin, spi_device):
+        self.rst_pin = rst_pin
+        self.dc_pin = dc_pin
+        self.cs_pin = cs_pin
+        self.busy_pin = busy_pin
+        self.spi_device = spi_device
+        self._byte = bytearray(1)  # Reused by spi_write_byte.
+
+    @classmethod
+    def from_board(cls, rst_pin, dc_pin, cs_pin, busy_pin, baudrate=2000000):
+        """Claim the given board pins for a panel on the shared SPI bus."""
+        DInOut = digitalio.DigitalInOut
+        OUTPUT = digitalio.Direction.OUTPUT
+        INPUT = digitalio.Direction.INPUT
+        rst_pin = DInOut(rst_pin)
+        rst_pin.direction = OUTPUT
+        dc_pin = DInOut(dc_pin)
+        dc_pin.direction = OUTPUT
+        cs_pin = DInOut(cs_pin)
+        cs_pin.direction = OUTPUT
+        busy_pin = DInOut(busy_pin)
+        busy_pin.direction = INPUT
+        return cls(rst_pin, dc_pin, cs_pin, busy_pin,
+                   adafruit_bus_device.spi_device.SPIDevice(
+                           shared_spi(), cs_pin, baudrate=baudrate))
+
+    def spi_transfer(self, data, start=0, end=None):
+        """Write data[start:end] within a single chip select transaction."""
+        if end is None:
+            end = len(data)
+        with self.spi_device as device:
+            device.write(data, start=start, end=end)
+
+    def spi_write_byte(self, value):
+        """Write the single byte value in its own transaction."""
+        self._byte[0] = value
+        self.spi_transfer(self._byte, 0, 1)
+
+    def spi_write(self, data, chunk_size=0):
+        """Write a whole buffer, one transaction per chunk_size bytes.
+
+        Args:
+          data: A bytes, bytearray or memoryview; it is never sliced or copied.
+          chunk_size: Bytes per chip select transaction, 0 for all in one.
+        """
+        length = len(data)
+        if not chunk_size or chunk_size >= length:
+            self.spi_transfer(data, 0, length)
+            return
+        for start in range(0, length, chunk_size):
+            self.spi_transfer(data, start, min(start + chunk_size, length))
+
+    def spi_write_cs_per_byte(self, data):
+        """Write a whole buffer pulsing chip select high between every byte.
+
+        For controllers that insist on it.  Rather than entering the SPIDevice
+        context (locking and configuring the bus) per byte, the bus is claimed
+        once and chip select is driven by hand.
+        """
+        device = self.spi_device
+        spi = device.spi
+        cs = device.chip_select
+        write = spi.write
+        while not spi.try_lock():
+            pass
+        try:
+            spi.configure(baudrate=device.baudrate, polarity=device.polarity,
+                          phase=device.phase)
+            for i in range(len(data)):
+                cs.value = False
+                write(data, start=i, end=i+1)
+                cs.value = True
+        finally:
+            spi.unlock()
+
+    def run_commands(self, table, cs_per_byte=False, wait_until_idle=None):
+        """Send a command table, see COUNT.
+
+        The bus is claimed once for each run of commands up to a DELAY or
+        WAIT, chip select and DC being driven by hand; arguments are written
+        straight from table in one transfer or, with cs_per_byte, pulsing
+        chip select between bytes.
+
+        Args:
+          table: A bytes of command table entries.
+          cs_per_byte: For controllers that need chip select pulsed per byte.
+          wait_until_idle: The panel's function to wait for BUSY; needed if
+              any entry has the WAIT flag.
+        """
+        start = 0
+        end = len(table)
+        while start < end:
+            start, flags = self._write_commands(table, start, cs_per_byte)
+            if flags & DELAY:
+                time.sleep(table[start - 1] / 1000)
+            if flags & WAIT:
+                wait_until_idle()
+
+    def _write_commands(self, table, i, cs_per_byte):
+        """Write table entries from i on until one with DELAY or WAIT.
+
+        Returns the index after the last entry written and its flags.
+        """
+        device = self.spi_device
+        spi = device.spi
+        cs = device.chip_select
+        dc = self.dc_pin
+        write = spi.write
+        end = len(table)
+        while not spi.try_lock():
+            pass
+        try:
+            spi.configure(baudrate=device.baudrate, polarity=device.polarity,
+                          phase=device.phase)
+            while i < end:
+                flags = table[i + 1]
+                count = flags & COUNT
+                dc.value = 0
+                cs.value = False
+                write(table, start=i, end=i + 1)
+                cs.value = True
+                i += 2
+                if count:
+                    dc.value = 1
+                    if cs_per_byte:
+                        for j in range(i, i + count):
+                            cs.value = False
+                            write(table, start=j, end=j + 1)
+                            cs.value = True
+                    else:
+                        cs.value = False
+                        write(table, start=i, end=i + count)
+                        cs.value = True
+                    i += count
+                if flags & DELAY:
+                    i += 1
+                if flags & (DELAY | WAIT):
+                    break
+        finally:
+            spi.unlock()
+        return i, flags
+
+
+def command(cmd, args=b'', delay_ms=0, wait=False):
+    """Returns a command table entry for EPDIO.run_commands()."""
+    if len(args) > COUNT or delay_ms > 0xff:
+        raise ValueError('%d arguments or %d ms is too many'
+                         % (len(args), delay_ms))
+    flags = len(args) | (DELAY if delay_ms else 0) | (WAIT if wait else 0)
+    entry = bytes((cmd, flags)) + bytes(args)
+    if delay_ms:
+        entry += bytes((delay_ms,))
+    return entry
+
+
+def shared_spi():
+    """Returns the SPI bus for the panels, creating it on first use."""
+    global _SPI
+    if _SPI is None:
+        # bus vs bitbang isn't really important for slow displays, detecting
+        # when to use one vs the other is overkill...
+        if (_SPI_CLK == getattr(board, 'SCK', None) and
+            _SPI_MOSI == getattr(board, 'MOSI', None)):
+            import busio as io_module
+        else:
+            import bitbangio as io_module
+        _SPI = io_module.SPI(_SPI_CLK, _SPI_MOSI)
+    return _SPI
+
+
+# The module level functions use the default EPDIO set up by
+# epd_io_bus_init() or use_io() for code predating EPDIO.
+
+def spi_transfer(data, start=0, end=None):
+    """Write data[start:end] within a single chip select transaction."""
+    _DEFAULT_IO.spi_transfer(data, start, end)
+
+def spi_write_byte(value):
+    """Write the single byte value in its own transaction."""
+    _DEFAULT_IO.spi_write_byte(value)
+
+def spi_write(data, chunk_size=0):
+    """Write a whole buffer, one transaction per chunk_size bytes."""
+    _DEFAULT_IO.spi_write(data, chunk_size)
+
+def spi_write_cs_per_byte(data):
+    """Write a whole buffer pulsing chip select high between every byte."""
+    _DEFAULT_IO.spi_write_cs_per_byte(data)
+
+def use_io(rst_pin, dc_pin, cs_pin, busy_pin, spi_device):
+    """Use already constructed pin and SPI device objects for the EPD.
+
+    This replaces what epd_io_bus_init() would create from the board pins and
+    is how an alternate backend such as the host side epdsim is plugged in.
+    The pins need DigitalInOut's value attribute and spi_device must behave
+    like an adafruit_bus_device.spi_device.SPIDevice.  Unlike
+    epd_io_bus_init() this may be called again to switch backends.  Returns
+    the new default EPDIO.
+    """
+    global _init, _DEFAULT_IO
+    global RST_PIN, DC_PIN, CS_PIN, BUSY_PIN
+    RST_PIN = rst_pin
+    DC_PIN = dc_pin
+    CS_PIN = cs_pin
+    BUSY_PIN = busy_pin
+    _DEFAULT_IO = EPDIO(rst_pin, dc_pin, cs_pin, busy_pin, spi_device)
+    _init = True
+    return _DEFAULT_IO
 
 def epd_io_bus_init():
     global _init
     if _init:
         raise RuntimeError("epd_io_bus_init() called twice")
+    if not board:
+        raise RuntimeError("no board I/O; call use_io() first")
     _init = True
-    global RST_PIN, DC_PIN, CS_PIN, BUSY_PIN
-    DInOut = digitalio.DigitalInOut
-    OUTPUT = digitalio.Direction.OUTPUT
-    INPUT = digitalio.Direction.INPUT
-    RST_PIN = DInOut(RST_PIN)
-    RST_PIN.direction = OUTPUT
-    DC_PIN = DInOut(DC_PIN)
-    DC_PIN.direction = OUTPUT
-    CS_PIN = DInOut(CS_PIN)
-    CS_PIN.direction = OUTPUT
-    BUSY_PIN = DInOut(BUSY_PIN)
-    BUSY_PIN.direction = INPUT
-    global _SPI_BUS
-    # bus vs bitbang isn't really important for slow displays, detecting
-    # when to use one vs the other is overkill...
-    if (_SPI_CLK == getattr(board, 'SCK', None) and
-        _SPI_MOSI == getattr(board, 'MOSI', None)):
-        import busio as io_module
+    global RST_PIN, DC_PIN, CS_PIN, BUSY_PIN, _DEFAULT_IO
+    _DEFAULT_IO = EPDIO.from_board(RST_PIN, DC_PIN, CS_PIN, BUSY_PIN)
+    RST_PIN = _DEFAULT_IO.rst_pin
+    DC_PIN = _DEFAULT_IO.dc_pin
+    CS_PIN = _DEFAULT_IO.cs_pin
+    BUSY_PIN = _DEFAULT_IO.busy_pin
+
+def default_io():
+    """Returns the default EPDIO, setting up the board pins if need be."""
+    if not _init:
+        epd_io_bus_init()
+    return _DEFAULT_IO
+
+def rotated_bands(epd, bitmap):
+    """Returns bitmap.rotated_bands(epd.rotation) after checking the size.
+
+    The bitmap's rotation must be the size of the panel.  For the drivers'
+    display_bitmap(); bitmap is anything with a rotated_bands() method.
+    """
+    if epd.rotation in (90, 270):
+        width, height = bitmap.height, bitmap.width
     else:
-        import bitbangio as io_module
-    _SPI_BUS = adafruit_bus_device.spi_device.SPIDevice(
-            io_module.SPI(_SPI_CLK, _SPI_MOSI), CS_PIN,
-            baudrate=2000000)
+        width, height = bitmap.width, bitmap.height
+    if (width, height) != (epd.width, epd.height):
+        raise ValueError('%dx%d bitmap rotated by %d does not fit %dx%d'
+                         % (bitmap.width, bitmap.height, epd.rotation,
+                            epd.width, epd.height))
+    return bitmap.rotated_bands(epd.rotation)
 
 ### END OF FILE ###
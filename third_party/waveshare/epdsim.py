@@ -0,0 +1,447 @@
+# python3: CPython 3 (host side only)
+
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Simulated EPD pins, SPI bus and panel controllers for running off-device.
+
+None of the drivers can run without the CircuitPython board, digitalio and
+bus device modules.  This provides stand-ins for those which plug into epdif
+and decode the command/data stream the way the panel's controller would so
+that the RAM contents can be inspected and the traffic measured.
+
+Usage:
+  from third_party.waveshare import epd2in9, epdsim
+  panel = epdsim.install(epd2in9.EPD, refresh_s=0.5)
+  epd = epd2in9.EPD()
+  epd.init()
+  stats = panel.measure(epd.display_frame_buf, bytes(epd.fb_bytes))
+  print(stats)             # bytes on the wire, CS toggles, busy & wall time
+  panel.displayed[0]       # RAM contents as of the last refresh
+"""
+
+import time
+
+from . import epdif
+
+
+class Stats:
+    """Counters of everything a SimPanel has seen.
+
+    Attributes:
+      bytes: Total bytes on the wire, commands included.
+      commands: Number of command bytes.
+      cs_toggles: Number of times chip select was asserted.
+      refreshes: Number of display refreshes started.
+      busy_s: Seconds of BUSY asserted by the simulated controller.
+      elapsed_s: Wall clock seconds; only filled in by SimPanel.measure().
+    """
+    FIELDS = ('bytes', 'commands', 'cs_toggles', 'refreshes',
+              'busy_s', 'elapsed_s')
+
+    def __init__(self):
+        for name in self.FIELDS:
+            setattr(self, name, 0)
+
+    def copy(self):
+        other = Stats()
+        for name in self.FIELDS:
+            setattr(other, name, getattr(self, name))
+        return other
+
+    def __sub__(self, other):
+        diff = Stats()
+        for name in self.FIELDS:
+            setattr(diff, name, getattr(self, name) - getattr(other, name))
+        return diff
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.FIELDS}
+
+    def __repr__(self):
+        return 'Stats(%s)' % ', '.join(
+                '%s=%s' % (name, round(value, 4))
+                for name, value in self.as_dict().items())
+
+
+class SimPin:
+    """A stand-in for a digitalio.DigitalInOut output pin."""
+
+    def __init__(self, name, value=0, on_change=None):
+        self.name = name
+        self._value = value
+        self._on_change = on_change
+
+    @property
+    def value(self):
+        return self._value
+
+    @value.setter
+    def value(self, value):
+        value = int(bool(value))
+        if value != self._value:
+            self._value = value
+            if self._on_change:
+                self._on_change(value)
+
+    def __repr__(self):
+        return '<SimPin %s=%d>' % (self.name, self._value)
+
+
+class BusyPin:
+    """A stand-in for the BUSY input pin; the panel model drives it."""
+
+    def __init__(self, panel):
+        self._panel = panel
+
+    @property
+    def value(self):
+        return self._panel.busy_value()
+
+
+class SimSPI:
+    """A stand-in for busio.SPI that delivers writes to the selected panels.
+
+    Several panels may share one SimSPI, each with its own chip select.
+
+    Attributes:
+      claims: Number of times the bus was locked; on a board each claim
+          also reconfigures the bus, costing more than a short write.
+    """
+
+    def __init__(self):
+        self.panels = []
+        self.claims = 0
+        self._locked = False
+
+    def try_lock(self):
+        if self._locked:
+            return False
+        self._locked = True
+        self.claims += 1
+        return True
+
+    def unlock(self):
+        self._locked = False
+
+    def configure(self, *, baudrate=100000, polarity=0, phase=0, bits=8):
+        self.baudrate = baudrate
+
+    def write(self, buf, *, start=0, end=None):
+        if not self._locked:
+            raise RuntimeError('SPI write without holding the bus lock')
+        data = bytes(buf[start:end])
+        selected = [p for p in self.panels if not p.cs.value]
+        if not selected:
+            raise RuntimeError('SPI write with no chip selected')
+        for panel in selected:
+            panel.receive(data)
+
+
+class SimSPIDevice:
+    """A stand-in for adafruit_bus_device.spi_device.SPIDevice."""
+
+    def __init__(self, spi, chip_select, *, baudrate=2000000,
+                 polarity=0, phase=0):
+        self.spi = spi
+        self.chip_select = chip_select
+        self.baudrate = baudrate
+        self.polarity = polarity
+        self.phase = phase
+
+    def __enter__(self):
+        while not self.spi.try_lock():
+            pass
+        self.spi.configure(baudrate=self.baudrate, polarity=self.polarity,
+                           phase=self.phase)
+        self.chip_select.value = False
+        return self.spi
+
+    def __exit__(self, *exc):
+        self.chip_select.value = True
+        self.spi.unlock()
+        return False
+
+
+class SimPanel:
+    """The controller independent parts of a simulated panel.
+
+    Subclasses decode the command stream for a specific controller family by
+    implementing _command() and _data().
+
+    Attributes:
+      rst, dc, cs, busy: The pins to hand to the driver.
+      planes: The controller RAM, one bytearray per plane.
+      displayed: Copies of planes taken at the most recent refresh.
+      registers: The most recent argument bytes seen for each command.
+      stats: A Stats instance accumulating all traffic.
+    """
+    num_planes = 1
+
+    def __init__(self, width, height, busy_level=1,
+                 refresh_s=0.0, power_on_s=0.0):
+        self.width = width
+        self.height = height
+        self.row_bytes = (width + 7) // 8
+        self.busy_level = busy_level
+        self.refresh_s = refresh_s
+        self.power_on_s = power_on_s
+        self.rst = SimPin('RST', 1, self._on_reset)
+        self.dc = SimPin('DC', 1)
+        self.cs = SimPin('CS', 1, self._on_cs)
+        self.busy = BusyPin(self)
+        self.planes = [bytearray(self.row_bytes * height)
+                       for _ in range(self.num_planes)]
+        self.displayed = None
+        self.registers = {}
+        self.stats = Stats()
+        self.sleeping = False
+        self._busy_until = 0.0
+        self._cmd = None
+        self._args = bytearray()
+
+    def _on_reset(self, value):
+        if not value:
+            self.registers.clear()
+            self.sleeping = False
+            self._busy_until = 0.0
+            self._cmd = None
+
+    def _on_cs(self, value):
+        if not value:
+            self.stats.cs_toggles += 1
+
+    def busy_value(self):
+        if time.monotonic() < self._busy_until:
+            return self.busy_level
+        return 1 - self.busy_level
+
+    def _start_busy(self, seconds):
+        self._busy_until = max(self._busy_until, time.monotonic()) + seconds
+        self.stats.busy_s += seconds
+
+    def _refresh(self):
+        self.displayed = [bytes(plane) for plane in self.planes]
+        self.stats.refreshes += 1
+        self._start_busy(self.refresh_s)
+
+    def receive(self, data):
+        """Handle bytes written over SPI while our CS was asserted."""
+        self.stats.bytes += len(data)
+        if self.dc.value:
+            if self._cmd is not None:
+                self._data(self._cmd, data)
+        else:
+            for cmd in data:
+                self.stats.commands += 1
+                self._cmd = cmd
+                self._args = self.registers[cmd] = bytearray()
+                self._command(cmd)
+
+    def _command(self, cmd):
+        raise NotImplementedError
+
+    def _data(self, cmd, data):
+        """Default data handling: collect the command's argument bytes."""
+        self._args.extend(data)
+
+    def measure(self, func, *args, **kwargs):
+        """Call func(*args, **kwargs) and return a Stats of what it did."""
+        before = self.stats.copy()
+        start = time.monotonic()
+        func(*args, **kwargs)
+        elapsed = time.monotonic() - start
+        stats = self.stats - before
+        stats.elapsed_s = elapsed
+        return stats
+
+
+class PlaneRamPanel(SimPanel):
+    """IL91874 / IL0373 style controllers: epd2in7 and the color displays.
+
+    The frame is streamed after DATA_START_TRANSMISSION_1 (plane 0) or _2
+    (plane 1) starting at the first byte of the plane.  The PARTIAL_ variants
+    of those take an x, y, w, l window (2 bytes each, big endian) first.
+    """
+    num_planes = 2
+
+    def _command(self, cmd):
+        if cmd == 0x10:    # DATA_START_TRANSMISSION_1
+            self._plane, self._pos = self.planes[0], 0
+        elif cmd == 0x13:  # DATA_START_TRANSMISSION_2
+            self._plane, self._pos = self.planes[1], 0
+        elif cmd in (0x14, 0x15):  # PARTIAL_DATA_START_TRANSMISSION_1/_2
+            self._plane = self.planes[cmd - 0x14]
+        elif cmd == 0x04:  # POWER_ON
+            self._start_busy(self.power_on_s)
+        elif cmd == 0x12:  # DISPLAY_REFRESH
+            self._refresh()
+
+    def _data(self, cmd, data):
+        if cmd in (0x10, 0x13):
+            pos = self._pos
+            data = data[:len(self._plane) - pos]
+            self._plane[pos:pos+len(data)] = data
+            self._pos = pos + len(data)
+        elif cmd in (0x14, 0x15):
+            args = self._args
+            if len(args) < 8:
+                needed = 8 - len(args)
+                args.extend(data[:needed])
+                data = data[needed:]
+                if len(args) == 8:
+                    self._start_window()
+            if data:
+                self._window_data(data)
+        else:
+            self._args.extend(data)
+            if cmd == 0x07 and self._args[:1] == b'\xa5':  # DEEP_SLEEP
+                self.sleeping = True
+
+    def _start_window(self):
+        x, y, w, l = (int.from_bytes(self._args[i:i+2], 'big')
+                      for i in range(0, 8, 2))
+        self._win_x = x // 8
+        self._win_bytes = max(w // 8, 1)
+        self._win_y = y
+        self._win_y_end = y + l - 1
+        self._pos = 0
+
+    def _window_data(self, data):
+        row_bytes = self.row_bytes
+        for value in data:
+            row, col = divmod(self._pos, self._win_bytes)
+            y = self._win_y + row
+            if y <= self._win_y_end and y < self.height:
+                self._plane[y * row_bytes + self._win_x + col] = value
+            self._pos += 1
+
+
+class WindowRamPanel(SimPanel):
+    """SSD1608 style controllers: epd2in9 and epd2in13.
+
+    WRITE_RAM data lands at the RAM address counters, which advance through
+    the window set by the RAM X/Y start/end position commands.  Only the
+    X then Y increment data entry mode the drivers use is modeled.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._x_start = self._x = 0
+        self._x_end = self.row_bytes - 1
+        self._y_start = self._y = 0
+        self._y_end = self.height - 1
+
+    def _command(self, cmd):
+        if cmd == 0x20:    # MASTER_ACTIVATION
+            self._refresh()
+
+    def _data(self, cmd, data):
+        if cmd != 0x24:    # WRITE_RAM
+            args = self._args
+            args.extend(data)
+            if cmd == 0x44 and len(args) == 2:
+                self._x_start, self._x_end = args[0], args[1]
+            elif cmd == 0x45 and len(args) == 4:
+                self._y_start = args[0] | args[1] << 8
+                self._y_end = args[2] | args[3] << 8
+            elif cmd == 0x4E and len(args) == 1:
+                self._x = args[0]
+            elif cmd == 0x4F and len(args) == 2:
+                self._y = args[0] | args[1] << 8
+            elif cmd == 0x10 and len(args) == 1:  # DEEP_SLEEP_MODE
+                self.sleeping = bool(args[0] & 1)
+            return
+        ram = self.planes[0]
+        row_bytes = self.row_bytes
+        x, y = self._x, self._y
+        for value in data:
+            if x < row_bytes and y < self.height:
+                ram[y * row_bytes + x] = value
+            if x >= self._x_end:
+                x = self._x_start
+                y = self._y_start if y >= self._y_end else y + 1
+            else:
+                x += 1
+        self._x, self._y = x, y
+
+
+# Driver module name: (controller model, BUSY pin value meaning busy)
+_MODELS = {
+    'epd2in7': (PlaneRamPanel, 0),
+    'epd2in9': (WindowRamPanel, 1),
+    'epd2in13': (WindowRamPanel, 1),
+    'color_epd2in13': (PlaneRamPanel, 1),
+}
+
+
+def _model_for(epd_class):
+    for cls in epd_class.__mro__:
+        model = _MODELS.get(cls.__module__.rpartition('.')[2])
+        if model:
+            return model
+    raise ValueError('no simulated controller for %r' % (epd_class,))
+
+
+def make_panel(epd_class, refresh_s=0.0, power_on_s=0.0):
+    """Create the simulated panel matching an EPD driver class."""
+    model, busy_level = _model_for(epd_class)
+    return model(epd_class.width, epd_class.height, busy_level=busy_level,
+                 refresh_s=refresh_s, power_on_s=power_on_s)
+
+
+def install(epd_class, refresh_s=0.0, power_on_s=0.0, spi=None):
+    """Plug a simulated panel for epd_class into epdif and return it.
+
+    The panel becomes epdif's default; panel.io is its EPDIO for passing to
+    the driver when several panels share one SimSPI.
+
+    Args:
+      epd_class: The driver's EPD class; picks the controller model & size.
+      refresh_s: Seconds BUSY stays asserted after each display refresh.
+      power_on_s: Seconds BUSY stays asserted after POWER_ON.
+      spi: An existing SimSPI to share, otherwise a new one is made.
+    """
+    panel = make_panel(epd_class, refresh_s, power_on_s)
+    if spi is None:
+        spi = SimSPI()
+    spi.panels.append(panel)
+    panel.io = epdif.use_io(panel.rst, panel.dc, panel.cs, panel.busy,
+                            SimSPIDevice(spi, panel.cs))
+    return panel
+
+
+def _main():
+    from . import color_epd1in54, color_epd2in13, epd2in7, epd2in9, epd2in13
+    for module in (epd2in7, epd2in9, epd2in13, color_epd2in13,
+                   color_epd1in54):
+        epd_class = module.EPD
+        panel = install(epd_class)
+        epd = epd_class()
+        epd.init()
+        frame = bytes(range(256)) * (epd.fb_bytes // 256 + 1)
+        frame = frame[:epd.fb_bytes]
+        if getattr(epd, 'colors', 2) > 2:
+            stats = panel.measure(epd.display_frames, frame, frame)
+            ok = panel.displayed == [frame, frame]
+        else:
+            stats = panel.measure(epd.display_frame_buf, frame,
+                                  fast_ghosting=True)
+            ok = frame in panel.displayed
+        print(module.__name__.rpartition('.')[2], stats,
+              'RAM matches' if ok else 'RAM MISMATCH')
+
+
+if __name__ == '__main__':
+    _main()
@@ -0,0 +1,79 @@
+# python3: CircuitPython
+
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Update several panels sharing an SPI bus so their refreshes overlap.
+
+A panel only needs the bus while its frame is uploaded.  Each upload starts
+a refresh and moves on to the next panel instead of waiting, so a wall of N
+panels takes about N uploads plus one refresh rather than N of both.
+
+Usage:
+  left = epd2in9.EPD(epdif.EPDIO.from_board(board.D11, board.D9,
+                                            board.D10, board.D7))
+  right = epd2in9.EPD(epdif.EPDIO.from_board(board.D12, board.D6,
+                                             board.D5, board.D4))
+  wall = epdwall.Wall((left, right))
+  wall.init()
+  wall.display_bitmaps((left_bitmap, right_bitmap), fast_ghosting=True)
+"""
+
+
+class Wall:
+    """A group of EPD instances, each with its own epdif.EPDIO.
+
+    Display calls return once every panel has started refreshing; the
+    drivers wait for a panel's refresh before sending it anything more.
+    """
+
+    def __init__(self, epds):
+        self.epds = tuple(epds)
+        for epd in self.epds:
+            epd.defer_refresh_wait = True
+
+    def init(self):
+        for epd in self.epds:
+            epd.init()
+
+    def busy(self):
+        """Returns True while any panel is refreshing."""
+        for epd in self.epds:
+            if epd.is_busy():
+                return True
+        return False
+
+    def wait_until_idle(self):
+        for epd in self.epds:
+            epd.wait_until_idle()
+
+    def display_bitmaps(self, bitmaps, *args, **kwargs):
+        """Display one bitmap per panel; see the drivers' display_bitmap.
+
+        Panels that refresh twice per frame (epd2in9 without fast_ghosting)
+        wait for their first refresh, holding up the panels after them.
+        """
+        if len(bitmaps) != len(self.epds):
+            raise ValueError('%d bitmaps for %d panels'
+                             % (len(bitmaps), len(self.epds)))
+        for epd, bitmap in zip(self.epds, bitmaps):
+            epd.display_bitmap(bitmap, *args, **kwargs)
+
+    def display_frame_bufs(self, frame_buffers, *args, **kwargs):
+        """Display one frame buffer per monochrome panel."""
+        if len(frame_buffers) != len(self.epds):
+            raise ValueError('%d frame buffers for %d panels'
+                             % (len(frame_buffers), len(self.epds)))
+        for epd, frame_buffer in zip(self.epds, frame_buffers):
+            epd.display_frame_buf(frame_buffer, *args, **kwargs)
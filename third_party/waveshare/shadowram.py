@@ -0,0 +1,111 @@
+# python3: CircuitPython
+
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Remember what was written to an EPD controller's RAM to skip resending."""
+
+
+class ShadowRam:
+    """A copy of the last contents written to one plane of a display's RAM.
+
+    Attributes:
+      buf: A bytearray copy of the RAM or None when its contents are unknown.
+    """
+
+    def __init__(self, width, height, enabled=True):
+        """enabled=False saves memory by never keeping a copy."""
+        self.row_bytes = (width + 7) // 8
+        self.height = height
+        self.enabled = enabled
+        self.buf = None
+
+    def invalidate(self):
+        """The RAM contents are unknown (eg: after a reset)."""
+        self.buf = None
+
+    def matches(self, frame_buffer):
+        return self.buf is not None and self.buf == frame_buffer
+
+    def changed_rows(self, frame_buffer):
+        """Returns a list of inclusive (y_start, y_end) spans of changed rows."""
+        if self.buf is None:
+            return [(0, self.height - 1)]
+        shadow = self.buf
+        if shadow == frame_buffer:
+            return []
+        frame_buffer = memoryview(frame_buffer)
+        shadow = memoryview(shadow)
+        row_bytes = self.row_bytes
+        spans = []
+        y_start = -1
+        offset = 0
+        for y in range(self.height):
+            end = offset + row_bytes
+            if frame_buffer[offset:end] != shadow[offset:end]:
+                if y_start < 0:
+                    y_start = y
+            elif y_start >= 0:
+                spans.append((y_start, y - 1))
+                y_start = -1
+            offset = end
+        if y_start >= 0:
+            spans.append((y_start, self.height - 1))
+        return spans
+
+    def update(self, frame_buffer, y_start=0, y_end=None):
+        """Record that rows y_start through y_end of frame_buffer were sent."""
+        if not self.enabled:
+            return
+        if self.buf is None:
+            if y_start or (y_end is not None and y_end < self.height - 1):
+                return  # The rest of the RAM is still unknown.
+            self.buf = bytearray(self.row_bytes * self.height)
+        if y_end is None:
+            y_end = self.height - 1
+        start = y_start * self.row_bytes
+        end = (y_end + 1) * self.row_bytes
+        self.buf[start:end] = memoryview(frame_buffer)[start:end]
+
+    def update_rows(self, y, rows):
+        """Record that packed rows were sent starting at row y.
+
+        For frames streamed a band at a time, so only a copy already held is
+        kept up to date; allocating one here would cost a whole frame of RAM
+        the caller is streaming to avoid.  invalidate() if the rest of the
+        frame does not follow.
+        """
+        if self.buf is not None:
+            offset = y * self.row_bytes
+            self.buf[offset:offset + len(rows)] = rows
+
+    def update_bytes(self, offset, data):
+        """Record that data was written to the RAM at byte offset."""
+        if self.buf is not None:
+            self.buf[offset:offset + len(data)] = data
+
+    def fill(self, pattern):
+        """Record that the entire RAM was filled with the pattern byte."""
+        if not self.enabled:
+            return
+        if self.buf is None:
+            self.buf = bytearray(self.row_bytes * self.height)
+        buf = memoryview(self.buf)
+        size = len(buf)
+        buf[0] = pattern
+        done = 1
+        while done < size:  # Double up what has been filled so far.
+            count = min(done, size - done)
+            buf[done:done + count] = buf[:count]
+            done += count
@@ -0,0 +1,154 @@
+# python3: CircuitPython 3.0
+
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""A white, black and red bitmap for the color display frame buffers."""
+
+import monobitmap
+
+WHITE = 0
+BLACK = 1
+RED = 2  # Or whatever tint the display has.
+
+
+class TriColorBitmap:
+    """A three color bitmap stored as two planes in one allocation.
+
+    The planes use the bit order of MonoBitmap and the polarity the color
+    displays expect: a black pixel is a 1 bit in the black plane and a red
+    pixel is a 0 bit in the red plane.  The drawing methods are those of
+    MonoBitmap, drawn by a MonoBitmap over each plane with the color's bit
+    in that plane.
+
+    Attributes:
+      buf: The black plane followed by the red plane.  Do not resize!
+      black: A memoryview of the black plane within buf.
+      red: A memoryview of the red plane within buf.
+      width: The width.  Do not modify.
+      height: The height.  Do not modify.
+
+    Usage:
+      flag = TriColorBitmap(104, 212)
+      flag.draw_filled_rectangle(10, 10, 40, 30, RED)
+      epd.display_frames(flag.black, flag.red)
+    """
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.plane_bytes = width * height // 8
+        self.buf = bytearray(self.plane_bytes * 2)
+        buf = memoryview(self.buf)
+        self.black = buf[:self.plane_bytes]
+        self.red = buf[self.plane_bytes:]
+        self._planes = (monobitmap.MonoBitmap(width, height, self.black),
+                        monobitmap.MonoBitmap(width, height, self.red))
+        self.fill(WHITE)
+
+    def fill(self, color: int) -> None:
+        """Set every pixel to color."""
+        size = self.plane_bytes
+        self.buf[:size] = (b'\xff' if color == BLACK else b'\x00') * size
+        self.buf[size:] = (b'\x00' if color == RED else b'\xff') * size
+
+    def rotated_bands(self, angle):
+        """Returns the black and red planes' bands rotated clockwise by angle.
+
+        See MonoBitmap.rotated_bands(); the pair is what the color displays'
+        display_bands() takes.
+        """
+        return tuple(plane.rotated_bands(angle) for plane in self._planes)
+
+    def _plane_values(self, color):
+        """Pairs each plane's MonoBitmap with color's bit in that plane."""
+        black, red = self._planes
+        return ((black, color == BLACK), (red, color != RED))
+
+    def get_pixel(self, x: int, y: int) -> int:
+        binary_idx = self.width * y + x
+        byte_idx = binary_idx >> 3
+        mask = 0x80 >> (binary_idx & 7)
+        if not self.buf[self.plane_bytes + byte_idx] & mask:
+            return RED
+        return BLACK if self.buf[byte_idx] & mask else WHITE
+
+    def set_pixel(self, x: int, y: int, color: int) -> None:
+        binary_idx = self.width * y + x
+        byte_idx = binary_idx >> 3
+        mask = 0x80 >> (binary_idx & 7)
+        buf = self.buf
+        if color == BLACK:
+            buf[byte_idx] |= mask
+        else:
+            buf[byte_idx] &= ~mask
+        byte_idx += self.plane_bytes
+        if color == RED:
+            buf[byte_idx] &= ~mask
+        else:
+            buf[byte_idx] |= mask
+
+    def fill_span(self, x: int, y: int, length: int, color: int) -> None:
+        """Set length consecutive pixels starting at x, y to color.
+
+        See MonoBitmap.fill_span().
+        """
+        for plane, value in self._plane_values(color):
+            plane.fill_span(x, y, length, value)
+
+    def draw_horizontal_line(self, x, y, width, color):
+        """Draw a line clipped to the bitmap."""
+        for plane, value in self._plane_values(color):
+            plane.draw_horizontal_line(x, y, width, value)
+
+    def draw_vertical_line(self, x, y, height, color):
+        """Draw a line clipped to the bitmap."""
+        for plane, value in self._plane_values(color):
+            plane.draw_vertical_line(x, y, height, value)
+
+    def draw_line(self, x0, y0, x1, y1, color):
+        """Draw a line between two points inclusive, clipped to the bitmap."""
+        for plane, value in self._plane_values(color):
+            plane.draw_line(x0, y0, x1, y1, value)
+
+    def draw_rectangle(self, x0, y0, x1, y1, color):
+        """Draw the outline of the rectangle with inclusive corners."""
+        for plane, value in self._plane_values(color):
+            plane.draw_rectangle(x0, y0, x1, y1, value)
+
+    def draw_filled_rectangle(self, x0, y0, x1, y1, color):
+        """Fill the rectangle with inclusive corners, clipped to the bitmap."""
+        for plane, value in self._plane_values(color):
+            plane.draw_filled_rectangle(x0, y0, x1, y1, value)
+
+    def draw_circle(self, x, y, radius, color):
+        """Draw a circle outline clipped to the bitmap."""
+        for plane, value in self._plane_values(color):
+            plane.draw_circle(x, y, radius, value)
+
+    def draw_filled_circle(self, x, y, radius, color):
+        """Fill a circle clipped to the bitmap."""
+        for plane, value in self._plane_values(color):
+            plane.draw_filled_circle(x, y, radius, value)
+
+    def draw_text(self, x, y, text, font, color, background=None):
+        """Draw text in a bitmapfont.BitmapFont; see its draw_text()."""
+        if background is None:
+            backgrounds = (None, None)
+        else:
+            backgrounds = [value for _, value in
+                           self._plane_values(background)]
+        for (plane, value), back in zip(self._plane_values(color),
+                                        backgrounds):
+            region = font.draw_text(plane, x, y, text, value, back)
+        return region
@@ -25,8 +25,22 @@
 # This assumes you have something like this in your /etc/fstab:
 # /dev/sda1       /mnt            vfat    user,noauto     0       0
 #
-mount /dev/sda1
-rsync --checksum --inplace --exclude '*README*' --exclude '*LICENSE' \
-      -r *.py asm_thumb third_party /mnt
+# Given --mpy the modules are precompiled first (see host/build_mpy.py) with
+# the rest of the arguments, eg: --mpy --mpy-cross PATH --march armv7emsp
+#
+if [ "$1" = "--mpy" ]; then
+  shift
+  python3 -m host.build_mpy -o build/device "$@" || exit 1
+  mount /dev/sda1
+  rsync --checksum --inplace -r build/device/ /mnt
+  # A module.py is imported in preference to module.mpy; remove old ones.
+  (cd build/device && find . -name '*.mpy') | while read -r module; do
+    rm -f "/mnt/${module%.mpy}.py"
+  done
+else
+  mount /dev/sda1
+  rsync --checksum --inplace --exclude '*README*' --exclude '*LICENSE' \
+        -r *.py asm_thumb third_party /mnt
+fi
 sync
 umount /mnt